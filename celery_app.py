@@ -13,6 +13,19 @@ celery_app = Celery(
     include=['tasks']
 )
 
+# Job kinds (as used by main.dispatch_job) -> Celery task names
+TASK_NAMES = {
+    "ai_images": "tasks.generate_ai_images",
+    "broll": "tasks.organize_broll",
+    "video_creation": "tasks.create_video",
+    "ingest": "tasks.ingest_video",
+}
+
+# FFmpeg work goes to a prefork pool sized to the cores ("render"); OpenAI calls, which
+# mostly wait on the network, go to a thread pool ("io"), so neither blocks the other
+RENDER_QUEUE = settings.CELERY_RENDER_QUEUE
+IO_QUEUE = settings.CELERY_IO_QUEUE
+
 # Configure Celery
 celery_app.conf.update(
     task_serializer='json',
@@ -24,6 +37,21 @@ celery_app.conf.update(
     task_time_limit=3600,  # 1 hour timeout
     task_soft_time_limit=3300,  # 55 minutes soft timeout
     result_expires=3600,  # Results expire after 1 hour
+    task_default_queue=IO_QUEUE,
+    task_routes={
+        'tasks.generate_ai_images': {'queue': IO_QUEUE},
+        'tasks.cleanup_old_files': {'queue': IO_QUEUE},
+        'tasks.organize_broll': {'queue': RENDER_QUEUE},
+        'tasks.create_video': {'queue': RENDER_QUEUE},
+        'tasks.ingest_video': {'queue': RENDER_QUEUE},
+    },
+    # Long jobs: take one at a time and acknowledge only when done, so a job held
+    # by a busy or crashed worker is not stuck behind it
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Must exceed the task time limit, or Redis redelivers jobs that are still running
+    broker_transport_options={'visibility_timeout': 7200},
 )
 
 if __name__ == '__main__':
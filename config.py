@@ -47,6 +47,54 @@ class Settings(BaseSettings):
     ALLOWED_AUDIO_EXTENSIONS: List[str] = [".mp3", ".wav", ".m4a"]
     ALLOWED_VIDEO_EXTENSIONS: List[str] = [".mp4", ".avi", ".mov", ".mkv"]
     
+    BLOB_DIR: str = "blobs"  # content-addressed upload store, inside UPLOAD_DIR
+    UPLOAD_SESSION_DIR: str = "sessions"  # resumable chunked uploads in progress, inside UPLOAD_DIR
+    UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # bytes per chunk of a resumable upload
+    UPLOAD_SESSION_TTL: int = 86400  # seconds an idle upload session is kept for resuming
+    
+    # Ingest normalization (mezzanine profile every B-roll clip is converted to once,
+    # so concatenation can always stream-copy)
+    INGEST_NORMALIZE_VIDEOS: bool = True
+    NORMALIZED_DIR: str = "normalized"  # inside UPLOAD_DIR
+    MEZZANINE_WIDTH: int = 1920
+    MEZZANINE_HEIGHT: int = 1080
+    MEZZANINE_FPS: int = 30
+    MEZZANINE_GOP: int = 60  # 2s closed GOP at 30fps
+    MEZZANINE_CRF: int = 20
+    MEZZANINE_PRESET: str = "veryfast"
+    MEZZANINE_AUDIO_RATE: int = 48000
+    MEZZANINE_AUDIO_BITRATE: str = "192k"
+    MEZZANINE_TIMESCALE: int = 90000
+    # Frame-accurate trims: re-encode only the partial GOP at the cut point
+    SMART_CUT_ENABLED: bool = True
+    
+    # FFmpeg scheduler: all encoder processes share this many cores (0 = all CPUs)
+    FFMPEG_CORE_BUDGET: int = 0
+    FFMPEG_THREADS_PER_JOB: int = 0  # 0 = half the budget, so two encodes can overlap
+    FFMPEG_NICE: int = 10  # keep encoders below the API process
+    FFMPEG_IONICE_CLASS: int = 2  # best-effort; 3 = idle, -1 = leave unchanged
+    FFMPEG_TIMEOUT: int = 3600  # wall-clock limit per FFmpeg run in seconds (0 = none)
+    FFMPEG_STALL_TIMEOUT: int = 120  # kill FFmpeg after this long without progress output (0 = never)
+    
+    # Blocking work in the API process runs in separate bounded thread pools, never on the event loop
+    BLOCKING_SUBPROCESS_WORKERS: int = 4  # FFprobe/analysis runs at once
+    BLOCKING_CPU_WORKERS: int = 0  # document parsing and hashing (0 = number of CPUs)
+    BLOCKING_IO_WORKERS: int = 16  # file reads/writes, directory scans, queue/broker calls
+    LOOP_LAG_INTERVAL: float = 0.5  # seconds between event-loop lag samples
+    LOOP_LAG_WARN: float = 0.1  # log a warning when the loop was blocked this long (seconds)
+    
+    # Job execution: "local" = worker processes fed from a SQLite queue (no Redis needed),
+    # "celery" = render/io Celery queues (see celery_app.py),
+    # "background" = FastAPI BackgroundTasks inside the API process.
+    # Run the API with a single uvicorn worker in local mode; each API process starts its own pool.
+    JOB_EXECUTOR: str = "local"
+    LOCAL_WORKERS: int = 2
+    JOB_SLOTS: int = 0  # jobs processed in parallel, for queue wait estimates (0 = LOCAL_WORKERS)
+    LOCAL_QUEUE_MAX: int = 50  # queued jobs beyond this are rejected with 503
+    LOCAL_MAX_ATTEMPTS: int = 3  # times a job is retried after its worker process died
+    CELERY_RENDER_QUEUE: str = "render"  # FFmpeg jobs (prefork pool)
+    CELERY_IO_QUEUE: str = "io"  # OpenAI jobs (thread pool)
+    
     # Processing limits
     MAX_IMAGES_PER_JOB: int = 20
     MAX_VIDEO_DURATION: int = 3600  # 60 minutes in seconds
@@ -70,6 +118,23 @@ class Settings(BaseSettings):
     
     # OpenAI settings
     OPENAI_API_KEY: str = ""  # Set via environment or API
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"  # point at a local stub server for testing
+    OPENAI_MAX_IN_FLIGHT: int = 4  # concurrent image requests per job
+    OPENAI_REQUESTS_PER_MINUTE: int = 50  # match your account's rate limits
+    OPENAI_IMAGES_PER_MINUTE: int = 15
+    OPENAI_MAX_RETRIES: int = 5  # retries on 429/5xx and network errors
+    OPENAI_RESPONSE_FORMAT: str = "url"  # or "b64_json": image inline in the response, no separate download
+    OPENAI_BREAKER_FAILURES: int = 5  # consecutive failures before a model is skipped
+    OPENAI_BREAKER_COOLDOWN: int = 60  # seconds before a skipped model is probed again
+    OPENAI_HEDGE_AFTER: int = 0  # seconds before also asking DALL-E 2 (0 = only after DALL-E 3 fails)
+    # Generated images are reused for identical (model, size, quality, prompt) requests
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_DIR: str = "cache/images"
+    IMAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB, least recently used images go first
+    # Encode each scene's clip as soon as its image lands (export_options "pipeline" overrides per job)
+    AI_PIPELINE_DEFAULT: bool = False
+    # Move scene changes into pauses of the voiceover (analysis is cached next to the audio file)
+    AUDIO_SNAP_TO_SILENCE: bool = True
     
     # AWS S3 settings (optional, for cloud storage)
     USE_S3: bool = False
@@ -103,6 +168,55 @@ class Settings(BaseSettings):
         path.mkdir(parents=True, exist_ok=True)
         return path
     
+    def get_mezzanine_profile(self) -> dict:
+        """Canonical H.264/AAC profile used for ingest normalization"""
+        return {
+            "width": self.MEZZANINE_WIDTH,
+            "height": self.MEZZANINE_HEIGHT,
+            "fps": self.MEZZANINE_FPS,
+            "gop": self.MEZZANINE_GOP,
+            "crf": self.MEZZANINE_CRF,
+            "preset": self.MEZZANINE_PRESET,
+            "audio_rate": self.MEZZANINE_AUDIO_RATE,
+            "audio_bitrate": self.MEZZANINE_AUDIO_BITRATE,
+            "timescale": self.MEZZANINE_TIMESCALE,
+        }
+    
+    def get_image_generator_options(self) -> dict:
+        """Keyword arguments for OpenAIImageGenerator (endpoint, concurrency, rate limits, cache, failover)"""
+        return {
+            "base_url": self.OPENAI_BASE_URL,
+            "max_in_flight": self.OPENAI_MAX_IN_FLIGHT,
+            "requests_per_minute": self.OPENAI_REQUESTS_PER_MINUTE,
+            "images_per_minute": self.OPENAI_IMAGES_PER_MINUTE,
+            "max_retries": self.OPENAI_MAX_RETRIES,
+            "response_format": self.OPENAI_RESPONSE_FORMAT,
+            "cache_dir": self.IMAGE_CACHE_DIR if self.IMAGE_CACHE_ENABLED else None,
+            "cache_max_bytes": self.IMAGE_CACHE_MAX_BYTES,
+            "breaker_failures": self.OPENAI_BREAKER_FAILURES,
+            "breaker_cooldown": self.OPENAI_BREAKER_COOLDOWN,
+            "hedge_after": self.OPENAI_HEDGE_AFTER,
+        }
+    
+    def get_ffmpeg_scheduler_options(self) -> dict:
+        """Keyword arguments for core.ffmpeg_scheduler.configure_scheduler"""
+        return {
+            "core_budget": self.FFMPEG_CORE_BUDGET or None,
+            "threads_per_job": self.FFMPEG_THREADS_PER_JOB or None,
+            "nice": self.FFMPEG_NICE,
+            "ionice_class": self.FFMPEG_IONICE_CLASS if self.FFMPEG_IONICE_CLASS >= 0 else None,
+            "timeout": self.FFMPEG_TIMEOUT or None,
+            "stall_timeout": self.FFMPEG_STALL_TIMEOUT or None,
+        }
+    
+    def get_blocking_pool_options(self) -> dict:
+        """Keyword arguments for core.event_loop.configure_pools"""
+        return {
+            "subprocess_workers": self.BLOCKING_SUBPROCESS_WORKERS,
+            "cpu_workers": self.BLOCKING_CPU_WORKERS or None,
+            "io_workers": self.BLOCKING_IO_WORKERS,
+        }
+    
     def get_temp_path(self) -> Path:
         """Get temporary directory path"""
         path = Path(self.TEMP_DIR)
@@ -0,0 +1,232 @@
+"""
+Audio analysis - one decode yields loudness (EBU R128), silences and a peak envelope, cached per file
+"""
+import os
+import re
+import json
+import base64
+import shutil
+import logging
+import tempfile
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+from .ffmpeg_utils import get_ffmpeg_path
+from .ffmpeg_scheduler import run_ffmpeg
+from .media_probe import probe_media, duration_from_metadata
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis record changes, so stale caches are recomputed
+ANALYSIS_VERSION = 1
+
+# Loudness target used for measurement and two-pass normalization
+LOUDNORM_TARGET = {"I": -16.0, "TP": -1.5, "LRA": 11.0}
+
+# Silence detection and envelope work on a downmixed low-rate copy of the signal
+ANALYSIS_SAMPLE_RATE = 8000
+SILENCE_THRESHOLD_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+PEAKS_PER_SECOND = 10
+
+def analysis_cache_path(audio_path: str) -> str:
+    """The analysis is cached alongside the audio file (content-addressed uploads share it)"""
+    return f"{audio_path}.analysis.json"
+
+def _filter_path(path: str) -> str:
+    """A file path usable as a filter option value inside a quoted filtergraph"""
+    return path.replace('\\', '/').replace(':', '\\:')
+
+def _parse_metadata_file(path: str, key: str) -> List[Tuple[float, str]]:
+    """(pts_time, value) pairs for `key` from an ametadata print file"""
+    pairs = []
+    pts_time = 0.0
+    prefix = f"{key}="
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('frame:'):
+                    match = re.search(r'pts_time:(\S+)', line)
+                    if match:
+                        try:
+                            pts_time = float(match.group(1))
+                        except ValueError:
+                            pass
+                elif line.startswith(prefix):
+                    pairs.append((pts_time, line[len(prefix):]))
+    except FileNotFoundError:
+        pass
+    return pairs
+
+def _parse_loudnorm(stderr: str) -> Optional[Dict[str, float]]:
+    """Measured values from loudnorm's print_format=json block"""
+    blocks = re.findall(r'\{[^{}]*"input_i"[^{}]*\}', stderr, re.DOTALL)
+    if not blocks:
+        return None
+    try:
+        data = json.loads(blocks[-1])
+        return {key: float(value) for key, value in data.items() if key != 'normalization_type'}
+    except (ValueError, TypeError):
+        return None
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float('-inf')
+
+def analyze_audio(audio_path: str) -> Dict[str, Any]:
+    """Decode the audio once and measure everything later steps need.
+
+    One FFmpeg run splits the decoded signal: the full-rate branch goes
+    through loudnorm in measurement mode, a mono 8kHz branch through
+    silencedetect and per-bucket peak levels (astats), both written as
+    metadata files. Duration comes from the container header.
+    """
+    work_dir = tempfile.mkdtemp(prefix="audio_analysis_")
+    silence_start_file = os.path.join(work_dir, "silence_start.txt")
+    silence_end_file = os.path.join(work_dir, "silence_end.txt")
+    peaks_file = os.path.join(work_dir, "peaks.txt")
+    bucket = ANALYSIS_SAMPLE_RATE // PEAKS_PER_SECOND
+    target = LOUDNORM_TARGET
+
+    graph = (
+        f"[0:a:0]asplit=2[full][low];"
+        f"[full]loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}:print_format=json[measured];"
+        f"[low]aresample={ANALYSIS_SAMPLE_RATE},aformat=channel_layouts=mono,"
+        f"silencedetect=n={SILENCE_THRESHOLD_DB}dB:d={SILENCE_MIN_SECONDS},"
+        f"ametadata=mode=print:key=lavfi.silence_start:file='{_filter_path(silence_start_file)}',"
+        f"ametadata=mode=print:key=lavfi.silence_end:file='{_filter_path(silence_end_file)}',"
+        f"asetnsamples=n={bucket}:p=1,"
+        f"astats=metadata=1:reset=1,"
+        f"ametadata=mode=print:key=lavfi.astats.Overall.Peak_level:file='{_filter_path(peaks_file)}'[envelope]"
+    )
+    cmd = [
+        get_ffmpeg_path(),
+        '-hide_banner',
+        '-i', audio_path,
+        '-filter_complex', graph,
+        '-map', '[measured]',
+        '-map', '[envelope]',
+        '-f', 'null',
+        '-'
+    ]
+
+    try:
+        duration = None
+        try:
+            duration = duration_from_metadata(probe_media(audio_path, scan_keyframes=False))
+        except Exception as e:
+            logger.warning(f"Could not read duration of {audio_path} from its header: {e}")
+
+        logger.info(f"Analyzing audio: {audio_path}")
+        result = run_ffmpeg(cmd, threads=1, duration=duration)
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg audio analysis failed: {result.stderr}")
+
+        # Peak level per bucket in dBFS -> 0-255 linear amplitude
+        peaks = array('B')
+        for _, value in _parse_metadata_file(peaks_file, 'lavfi.astats.Overall.Peak_level'):
+            level = _to_float(value)
+            amplitude = 0.0 if level == float('-inf') else min(1.0, 10 ** (level / 20))
+            peaks.append(int(round(amplitude * 255)))
+        if not duration:
+            duration = len(peaks) / PEAKS_PER_SECOND
+
+        starts = [_to_float(v) for _, v in _parse_metadata_file(silence_start_file, 'lavfi.silence_start')]
+        ends = [_to_float(v) for _, v in _parse_metadata_file(silence_end_file, 'lavfi.silence_end')]
+        silences = []
+        for i, start in enumerate(starts):
+            end = ends[i] if i < len(ends) else duration
+            silences.append([round(max(0.0, start), 3), round(min(end, duration), 3)])
+
+        loudness = _parse_loudnorm(result.stderr)
+        if not loudness:
+            logger.warning(f"No loudness measurement in FFmpeg output for {audio_path}")
+
+        analysis = {
+            "version": ANALYSIS_VERSION,
+            "duration": duration,
+            "loudness": loudness,
+            "silences": silences,
+            "peaks_per_second": PEAKS_PER_SECOND,
+            "peaks": peaks,
+        }
+        logger.info(f"Audio analysis of {os.path.basename(audio_path)}: {duration:.1f}s, "
+                    f"{len(silences)} pauses, integrated loudness "
+                    f"{loudness.get('input_i') if loudness else 'n/a'} LUFS")
+        return analysis
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def load_cached_analysis(audio_path: str) -> Optional[Dict[str, Any]]:
+    """Cached analysis if it is current for this file, else None (never decodes)"""
+    cache_path = analysis_cache_path(audio_path)
+    try:
+        if os.path.getmtime(cache_path) < os.path.getmtime(audio_path):
+            return None
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != ANALYSIS_VERSION:
+        return None
+    data['peaks'] = array('B', base64.b64decode(data.get('peaks') or ''))
+    return data
+
+def load_analysis(audio_path: str) -> Dict[str, Any]:
+    """Cached analysis, or analyze once and cache the result"""
+    analysis = load_cached_analysis(audio_path)
+    if analysis:
+        return analysis
+    analysis = analyze_audio(audio_path)
+    cache_path = analysis_cache_path(audio_path)
+    try:
+        record = dict(analysis, peaks=base64.b64encode(analysis['peaks'].tobytes()).decode('ascii'))
+        temp_path = f"{cache_path}.{os.getpid()}.part"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not cache audio analysis for {audio_path}: {e}")
+    return analysis
+
+def loudnorm_filter(loudness: Optional[Dict[str, float]]) -> str:
+    """loudnorm for the target; with measured values it is the accurate (linear) second pass"""
+    target = LOUDNORM_TARGET
+    base = f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}"
+    if not loudness:
+        return base
+    measured = [loudness.get(key) for key in ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')]
+    if any(value is None or value in (float('inf'), float('-inf')) for value in measured):
+        # Silent input has no usable measurement; fall back to dynamic one-pass mode
+        return base
+    input_i, input_tp, input_lra, input_thresh, offset = measured
+    return (f"{base}:measured_I={input_i}:measured_TP={input_tp}:measured_LRA={input_lra}"
+            f":measured_thresh={input_thresh}:offset={offset}:linear=true")
+
+def downsample_peaks(peaks: array, points: int) -> List[int]:
+    """Reduce the envelope to at most `points` values, keeping the maximum of each group"""
+    if points <= 0 or len(peaks) <= points:
+        return list(peaks)
+    step = len(peaks) / points
+    return [max(peaks[int(i * step):max(int((i + 1) * step), int(i * step) + 1)]) for i in range(points)]
+
+def snap_to_silences(boundaries: List[float], silences: List[List[float]],
+                     max_shift: float, min_gap: float = 0.5) -> List[float]:
+    """Move scene boundaries to the middle of the nearest pause within max_shift seconds.
+
+    The first boundary stays where it is; boundaries stay in order and at
+    least min_gap apart, otherwise they keep their original position.
+    """
+    if not silences or len(boundaries) < 2:
+        return list(boundaries)
+    pauses = [(start + end) / 2 for start, end in silences]
+    snapped = [boundaries[0]]
+    for boundary in boundaries[1:]:
+        nearest = min(pauses, key=lambda pause: abs(pause - boundary))
+        position = nearest if abs(nearest - boundary) <= max_shift else boundary
+        if position - snapped[-1] < min_gap:
+            position = max(boundary, snapped[-1] + min_gap)
+        snapped.append(round(position, 2))
+    return snapped
@@ -0,0 +1,140 @@
+"""
+Audio pipeline - chains normalize/fade/pad/convert lazily and renders them in a single FFmpeg pass
+"""
+import os
+import logging
+from typing import Any, List, Optional, Tuple
+from .ffmpeg_utils import get_ffmpeg_path
+from .ffmpeg_scheduler import run_ffmpeg
+from .media_probe import probe_media, duration_from_metadata
+from .audio_analysis import load_analysis, load_cached_analysis, loudnorm_filter
+
+logger = logging.getLogger(__name__)
+
+# Output codec and bitrate per format (None bitrate = lossless)
+AUDIO_CODECS = {
+    'mp3': ('libmp3lame', '192k'),
+    'aac': ('aac', '192k'),
+    'm4a': ('aac', '192k'),
+    'wav': ('pcm_s16le', None),
+}
+
+OUTPUT_SAMPLE_RATE = 44100
+OUTPUT_CHANNELS = 2
+
+class AudioPipeline:
+    """An audio file plus a chain of operations, evaluated only by render().
+
+    Every operation returns a new pipeline, so a common prefix can be
+    reused for several outputs:
+
+        voice = AudioPipeline(path).normalize()
+        voice.fade(0.5).pad(2).convert('aac').render(out_path)
+
+    render() compiles the chain into one -af filter graph and runs FFmpeg
+    once, instead of one decode and intermediate file per step.
+    """
+
+    def __init__(self, audio_path: str, steps: Tuple[Tuple[str, Any], ...] = ()):
+        self.audio_path = audio_path
+        self.steps = steps
+
+    def _then(self, op: str, value: Any = None) -> "AudioPipeline":
+        return AudioPipeline(self.audio_path, self.steps + ((op, value),))
+
+    def normalize(self) -> "AudioPipeline":
+        """EBU R128 loudness normalization to the analysis target"""
+        return self._then('normalize')
+
+    def fade(self, seconds: float) -> "AudioPipeline":
+        """Fade in at the start and out at the end of the audio so far"""
+        return self._then('fade', float(seconds))
+
+    def pad(self, seconds: float) -> "AudioPipeline":
+        """Append seconds of silence"""
+        return self._then('pad', float(seconds))
+
+    def convert(self, format: str) -> "AudioPipeline":
+        """Encode the output as format (mp3, aac, m4a or wav, else mp3); the last convert wins"""
+        format = format.lower()
+        return self._then('convert', format if format in AUDIO_CODECS else 'mp3')
+
+    def _input_duration(self) -> float:
+        analysis = load_cached_analysis(self.audio_path)
+        if analysis:
+            return analysis['duration']
+        duration = duration_from_metadata(probe_media(self.audio_path, scan_keyframes=False))
+        if not duration:
+            raise Exception(f"Could not determine duration of {self.audio_path}")
+        return duration
+
+    def compile(self) -> Tuple[List[str], Optional[str], Optional[float]]:
+        """(filters, output format, output duration) for the chain"""
+        filters = []
+        output_format = None
+        duration = None
+        level_changed = False
+        for op, value in self.steps:
+            if op == 'normalize':
+                # The cached measurement describes the input; after a fade it no longer
+                # matches the signal, so loudnorm measures on the fly (one-pass) instead
+                loudness = None
+                if not level_changed:
+                    analysis = load_analysis(self.audio_path)
+                    loudness = analysis.get('loudness')
+                    if duration is None:
+                        duration = analysis['duration']
+                filters.append(loudnorm_filter(loudness))
+            elif op == 'fade':
+                if duration is None:
+                    duration = self._input_duration()
+                fade = min(value, duration / 2)
+                filters.append(f"afade=t=in:st=0:d={fade:.3f}")
+                filters.append(f"afade=t=out:st={max(0.0, duration - fade):.3f}:d={fade:.3f}")
+                level_changed = True
+            elif op == 'pad':
+                if duration is None:
+                    duration = self._input_duration()
+                filters.append(f"apad=pad_dur={value:.3f}")
+                duration += value
+            elif op == 'convert':
+                output_format = value
+        return filters, output_format, duration
+
+    def render(self, output_path: str) -> str:
+        """Run the whole chain in one FFmpeg pass; returns output_path"""
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        filters, output_format, duration = self.compile()
+        output_format = output_format or os.path.splitext(output_path)[1].lstrip('.').lower()
+
+        cmd = [get_ffmpeg_path(), '-i', self.audio_path, '-vn']
+        if filters:
+            cmd.extend(['-af', ','.join(filters)])
+        if output_format in AUDIO_CODECS:
+            codec, bitrate = AUDIO_CODECS[output_format]
+            cmd.extend(['-c:a', codec])
+            if bitrate:
+                cmd.extend(['-b:a', bitrate])
+        cmd.extend([
+            '-ar', str(OUTPUT_SAMPLE_RATE),
+            '-ac', str(OUTPUT_CHANNELS),
+            '-y',
+            output_path
+        ])
+
+        steps = ' -> '.join(op for op, _ in self.steps) or 'copy'
+        logger.info(f"Rendering audio ({steps}): {' '.join(cmd)}")
+        result = run_ffmpeg(cmd, threads=1, duration=duration)
+        if result.returncode != 0:
+            logger.error(f"FFmpeg error: {result.stderr}")
+            raise Exception(f"FFmpeg audio pipeline failed: {result.stderr}")
+
+        logger.info(f"Successfully rendered audio: {output_path}")
+        return output_path
+
+    def __repr__(self) -> str:
+        steps = ', '.join(op if value is None else f"{op}({value})" for op, value in self.steps)
+        return f"AudioPipeline({self.audio_path!r}: {steps})"
@@ -5,9 +5,12 @@ import os
 import logging
 import subprocess
 import json
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from pathlib import Path
 from .ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path
+from .ffmpeg_scheduler import run_ffmpeg
+from .audio_analysis import load_analysis, snap_to_silences
+from .audio_pipeline import AudioPipeline
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,18 @@ class AudioProcessor:
             logger.error(f"Error getting audio duration: {e}")
             return 0.0
     
+    def analyze(self, audio_path: str) -> Dict[str, Any]:
+        """Duration, loudness, pauses and peak envelope from one decode (cached next to the file)"""
+        return load_analysis(audio_path)
+    
+    def pipeline(self, audio_path: str) -> AudioPipeline:
+        """Lazy chain of normalize/fade/pad/convert, rendered in one FFmpeg pass.
+        
+        Prefer this to calling the single-step methods one after another:
+        each of those decodes the input and writes an intermediate file.
+        """
+        return AudioPipeline(audio_path)
+    
     def extract_audio(self, video_path: str, output_path: str) -> str:
         """Extract audio from video file using FFmpeg"""
         logger.info(f"Extracting audio from {video_path}")
@@ -65,7 +80,7 @@ class AudioProcessor:
             ]
             
             logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, threads=1)
             
             if result.returncode != 0:
                 logger.error(f"FFmpeg error: {result.stderr}")
@@ -79,34 +94,11 @@ class AudioProcessor:
             raise
     
     def normalize_audio(self, audio_path: str, output_path: str) -> str:
-        """Normalize audio levels using FFmpeg"""
+        """Normalize audio levels using FFmpeg (two-pass loudnorm from the cached analysis)"""
         logger.info(f"Normalizing audio: {audio_path}")
         
         try:
-            # Create output directory
-            output_dir = os.path.dirname(output_path)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            cmd = [
-                get_ffmpeg_path(),
-                '-i', audio_path,
-                '-af', 'loudnorm=I=-16:TP=-1.5:LRA=11',  # EBU R128 loudness normalization
-                '-ar', '44100',  # 44.1kHz sample rate
-                '-ac', '2',  # Stereo
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg audio normalization failed: {result.stderr}")
-            
-            logger.info(f"Successfully normalized audio: {output_path}")
-            return output_path
-            
+            return self.pipeline(audio_path).normalize().render(output_path)
         except Exception as e:
             logger.error(f"Error normalizing audio: {e}")
             raise
@@ -140,7 +132,7 @@ class AudioProcessor:
             ]
             
             logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, threads=1)
             
             # Clean up file list
             if os.path.exists(file_list_path):
@@ -162,33 +154,7 @@ class AudioProcessor:
         logger.info(f"Adding {duration}s silence to {audio_path}")
         
         try:
-            # Create output directory
-            output_dir = os.path.dirname(output_path)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            cmd = [
-                get_ffmpeg_path(),
-                '-i', audio_path,
-                '-f', 'lavfi',
-                '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-                '-filter_complex', f'[0:a][1:a]concat=n=2:v=0:a=1[out]',
-                '-map', '[out]',
-                '-ar', '44100',
-                '-ac', '2',
-                '-y',
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg silence addition failed: {result.stderr}")
-            
-            logger.info(f"Successfully added silence: {output_path}")
-            return output_path
-            
+            return self.pipeline(audio_path).pad(duration).render(output_path)
         except Exception as e:
             logger.error(f"Error adding silence: {e}")
             raise
@@ -198,54 +164,32 @@ class AudioProcessor:
         logger.info(f"Adding fade in/out to {audio_path}")
         
         try:
-            # Create output directory
-            output_dir = os.path.dirname(output_path)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Get audio duration
-            duration = self.get_duration(audio_path)
-            
-            cmd = [
-                get_ffmpeg_path(),
-                '-i', audio_path,
-                '-af', f'afade=t=in:st=0:d={fade_duration},afade=t=out:st={duration-fade_duration}:d={fade_duration}',
-                '-ar', '44100',
-                '-ac', '2',
-                '-y',
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg fade effects failed: {result.stderr}")
-            
-            logger.info(f"Successfully added fade effects: {output_path}")
-            return output_path
-            
+            return self.pipeline(audio_path).fade(fade_duration).render(output_path)
         except Exception as e:
             logger.error(f"Error adding fade effects: {e}")
             raise
     
-    def generate_timestamps(self, duration: float, count: int) -> List[float]:
-        """Generate evenly spaced timestamps for images based on audio duration"""
+    def generate_timestamps(self, duration: float, count: int,
+                            silences: Optional[List[List[float]]] = None) -> List[float]:
+        """Start times of evenly spaced scenes over the audio duration.
+        
+        The first scene starts at 0 and the last runs to the end of the audio,
+        so scene i lasts timestamps[i+1] - timestamps[i] (the last one
+        duration - timestamps[-1]). With silences (pause intervals from
+        analyze()), each scene change moves to the nearest pause within a
+        third of a scene, so cuts land between sentences.
+        """
         logger.info(f"Generating {count} timestamps for {duration}s duration")
         
         if count <= 0:
             return []
         
-        if count == 1:
-            return [duration / 2]  # Single image at middle
-        
-        # Generate evenly spaced timestamps
+        # Scene boundaries, evenly spaced
         interval = duration / count
-        timestamps = []
+        timestamps = [round(i * interval, 2) for i in range(count)]
         
-        for i in range(count):
-            timestamp = (i + 0.5) * interval  # Center of each segment
-            timestamps.append(round(timestamp, 2))
+        if silences:
+            timestamps = snap_to_silences(timestamps, silences, max_shift=interval / 3)
         
         logger.info(f"Generated timestamps: {timestamps}")
         return timestamps
@@ -255,50 +199,7 @@ class AudioProcessor:
         logger.info(f"Converting audio format: {audio_path} to {format}")
         
         try:
-            # Create output directory
-            output_dir = os.path.dirname(output_path)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Set codec based on format
-            if format.lower() == 'mp3':
-                codec = 'libmp3lame'
-                bitrate = '192k'
-            elif format.lower() == 'aac':
-                codec = 'aac'
-                bitrate = '192k'
-            elif format.lower() == 'wav':
-                codec = 'pcm_s16le'
-                bitrate = None
-            else:
-                codec = 'libmp3lame'
-                bitrate = '192k'
-            
-            cmd = [
-                get_ffmpeg_path(),
-                '-i', audio_path,
-                '-c:a', codec
-            ]
-            
-            if bitrate:
-                cmd.extend(['-b:a', bitrate])
-            
-            cmd.extend([
-                '-ar', '44100',
-                '-ac', '2',
-                '-y',
-                output_path
-            ])
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg format conversion failed: {result.stderr}")
-            
-            logger.info(f"Successfully converted audio format: {output_path}")
-            return output_path
-            
+            return self.pipeline(audio_path).convert(format).render(output_path)
         except Exception as e:
             logger.error(f"Error converting audio format: {e}")
-            raise 
\ No newline at end of file
+            raise
\ No newline at end of file
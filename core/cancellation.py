@@ -0,0 +1,132 @@
+"""
+Job cancellation - per-job tokens checked between work items, with child process termination
+"""
+import os
+import time
+import signal
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled"""
+
+def terminate_process(process) -> None:
+    """Kill a child process and everything it started.
+
+    FFmpeg is launched in its own session (process group), so nice/ionice
+    wrappers and any helpers it spawns go down together.
+    """
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+class CancellationToken:
+    """Cancellation state of one job.
+
+    cancel() is immediate for work in this process. For jobs running in
+    another process (Celery workers), `poll` is called at most every
+    poll_interval seconds to see whether the job was cancelled elsewhere.
+    """
+
+    def __init__(self, job_id: str, poll: Optional[Callable[[str], bool]] = None,
+                 poll_interval: float = 1.0):
+        self.job_id = job_id
+        self._event = threading.Event()
+        self._poll = poll
+        self._poll_interval = poll_interval
+        self._last_poll = 0.0
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        if self._event.is_set():
+            return
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            terminate_process(process)
+        logger.info(f"Job {self.job_id} cancelled, terminated {len(processes)} process(es)")
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._poll:
+            now = time.monotonic()
+            if now - self._last_poll >= self._poll_interval:
+                self._last_poll = now
+                try:
+                    if self._poll(self.job_id):
+                        self.cancel()
+                except Exception as e:
+                    logger.warning(f"Cancellation poll for job {self.job_id} failed: {e}")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to timeout seconds, waking early on a local cancel; returns is_cancelled()"""
+        self._event.wait(timeout)
+        return self.is_cancelled()
+
+    def attach_process(self, process) -> None:
+        with self._lock:
+            self._processes.add(process)
+        if self._event.is_set():
+            terminate_process(process)
+
+    def detach_process(self, process) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+_current_token = contextvars.ContextVar('cancellation_token', default=None)
+_tokens: Dict[str, CancellationToken] = {}
+_tokens_lock = threading.Lock()
+
+def current_token() -> Optional[CancellationToken]:
+    """Token of the job running in this context (None outside a job)"""
+    return _current_token.get()
+
+def check_cancelled() -> None:
+    """Raise JobCancelled if the job running in this context has been cancelled"""
+    token = _current_token.get()
+    if token:
+        token.raise_if_cancelled()
+
+def get_token(job_id: str) -> Optional[CancellationToken]:
+    with _tokens_lock:
+        return _tokens.get(job_id)
+
+def request_cancel(job_id: str) -> bool:
+    """Cancel a job running in this process; returns False if it is not running here"""
+    token = get_token(job_id)
+    if not token:
+        return False
+    token.cancel()
+    return True
+
+@contextmanager
+def cancellation_scope(job_id: str, poll: Optional[Callable[[str], bool]] = None):
+    """Register a token for job_id and make it current for the block (and FFmpeg runs inside it)"""
+    token = CancellationToken(job_id, poll)
+    with _tokens_lock:
+        _tokens[job_id] = token
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+        with _tokens_lock:
+            if _tokens.get(job_id) is token:
+                del _tokens[job_id]
@@ -0,0 +1,161 @@
+"""
+Resumable chunked uploads - numbered chunks arrive in any order (and in parallel), assembled on commit
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+def chunk_length(session: Dict[str, Any], index: int) -> int:
+    """Bytes in chunk `index`; every chunk is chunk_size long except the last"""
+    start = index * session['chunk_size']
+    return max(0, min(session['chunk_size'], session['size'] - start))
+
+def _copy_range(src, dst, length: int) -> None:
+    """Append length bytes of src to dst; in-kernel (and reflinked where supported) on Linux"""
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    remaining = length
+    if copy_file_range:
+        try:
+            while remaining:
+                copied = copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError as e:
+            # Not supported for these files (older kernels across filesystems, some FUSE mounts)
+            logger.debug(f"copy_file_range unavailable, copying in user space: {e}")
+    if remaining:
+        src.seek(length - remaining)
+        dst.seek(0, os.SEEK_END)
+        shutil.copyfileobj(src, dst, HASH_BLOCK_SIZE)
+
+def hash_file(path: str) -> str:
+    """sha256 of a file, read in large blocks"""
+    hasher = hashlib.sha256()
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+class ChunkedUploads:
+    """Upload sessions on disk, so any worker process can take any chunk.
+
+    <root>/<upload_id>/session.json describes the upload; each received
+    chunk is <index>.chunk, written under a temporary name and renamed
+    once complete. While a session is being committed its directory is
+    renamed to <upload_id>.committing, so it is assembled only once.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> Path:
+        # upload ids are generated here; anything else cannot name a session
+        if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+            raise KeyError(upload_id)
+        return self.root / upload_id
+
+    def create(self, filename: str, size: int, chunk_size: int,
+               fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "size": size,
+            "chunk_size": chunk_size,
+            "chunk_count": max(1, -(-size // chunk_size)),
+            "fields": fields or {},
+            "created": time.time(),
+        }
+        session_dir = self._dir(upload_id)
+        session_dir.mkdir()
+        with open(session_dir / "session.json", 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        logger.info(f"Upload session {upload_id} for {filename}: {size} bytes in {session['chunk_count']} chunks")
+        return session
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._dir(upload_id) / "session.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def chunk_temp_path(self, upload_id: str, index: int) -> Path:
+        return self._dir(upload_id) / f"{index}.{uuid.uuid4().hex[:8]}.part"
+
+    def store_chunk(self, upload_id: str, index: int, temp_path: Path) -> None:
+        """Publish a fully received chunk (replacing an earlier copy of it)"""
+        os.replace(temp_path, self._dir(upload_id) / f"{index}.chunk")
+
+    def missing(self, session: Dict[str, Any], session_dir: Optional[Path] = None) -> List[int]:
+        """Indexes of chunks not (completely) received yet"""
+        session_dir = session_dir or self._dir(session['upload_id'])
+        missing = []
+        for index in range(session['chunk_count']):
+            try:
+                complete = (session_dir / f"{index}.chunk").stat().st_size == chunk_length(session, index)
+            except FileNotFoundError:
+                complete = False
+            if not complete:
+                missing.append(index)
+        return missing
+
+    def claim(self, upload_id: str) -> Optional[Path]:
+        """Take a session for commit; None if it does not exist or is already being committed"""
+        committing = self.root / f"{upload_id}.committing"
+        try:
+            os.rename(self._dir(upload_id), committing)
+        except (KeyError, OSError):
+            return None
+        return committing
+
+    def release(self, upload_id: str, claimed_dir: Path) -> None:
+        """Give a claimed session back (the commit failed and may be retried)"""
+        os.rename(claimed_dir, self._dir(upload_id))
+
+    def assemble(self, session: Dict[str, Any], claimed_dir: Path, output_path: str) -> int:
+        """Concatenate the chunks of a claimed session into output_path; returns its size"""
+        # Unbuffered: copy_file_range moves the OS file offsets, not Python's buffers
+        with open(output_path, 'wb', buffering=0) as out:
+            for index in range(session['chunk_count']):
+                with open(claimed_dir / f"{index}.chunk", 'rb', buffering=0) as chunk:
+                    _copy_range(chunk, out, chunk_length(session, index))
+            size = out.seek(0, os.SEEK_END)
+        if size != session['size']:
+            raise Exception(f"Assembled {size} bytes, expected {session['size']}")
+        return size
+
+    def discard(self, session_dir: Path) -> None:
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    def cleanup(self, max_age: float) -> int:
+        """Remove sessions (abandoned uploads) older than max_age seconds"""
+        removed = 0
+        now = time.time()
+        for session_dir in self.root.iterdir():
+            try:
+                if session_dir.is_dir() and now - session_dir.stat().st_mtime > max_age:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"Removed {removed} expired upload session(s)")
+        return removed
@@ -0,0 +1,106 @@
+"""
+Circuit breakers for outbound APIs - stop calling a model that keeps failing, probe it again after a cooldown
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Consecutive-failure breaker.
+
+    Closed: calls go through. After failure_threshold failures in a row it
+    opens and allow() refuses calls for `cooldown` seconds. Then it is half
+    open: up to half_open_probes calls are let through; a success closes it,
+    a failure opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 60.0,
+                 half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.half_open_probes = max(1, half_open_probes)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit {self.name} half open, probing")
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now (counts as a probe when half open)"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """A call allowed by allow() ended without a verdict (e.g. the job was cancelled).
+
+        When half open this hands its probe slot back, so the next call can
+        probe instead of the breaker staying half open with no probes left.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit {self.name} open after {self._failures} failure(s), "
+                                   f"retrying in {self.cooldown:.0f}s")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self._current_state(time.monotonic()), "consecutive_failures": self._failures}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str, failure_threshold: int = 5, cooldown: float = 60.0) -> CircuitBreaker:
+    """Process-wide breaker for a named dependency (e.g. one model at one endpoint)"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, failure_threshold, cooldown)
+            _breakers[name] = breaker
+        breaker.failure_threshold = max(1, failure_threshold)
+        breaker.cooldown = cooldown
+        return breaker
@@ -0,0 +1,132 @@
+"""
+Content-addressed blob store for uploads - identical content is stored once
+"""
+import os
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class BlobWriter:
+    """Writes an upload to a staging file while hashing it on the fly"""
+
+    def __init__(self, store: "ContentStore"):
+        self.store = store
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.temp_path = store.staging_path()
+        self._file = open(self.temp_path, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> Tuple[str, str, bool]:
+        """Move the staged data into the store; returns (path, content_hash, deduplicated)"""
+        self._file.close()
+        return self.store.adopt(self.temp_path, self.hasher.hexdigest(), self.size)
+
+    def abort(self) -> None:
+        """Discard the staged data"""
+        try:
+            self._file.close()
+        finally:
+            if self.temp_path.exists():
+                self.temp_path.unlink()
+
+class ContentStore:
+    """Blobs live at <root>/<hash[:2]>/<hash>; file records reference them by path and hash.
+
+    The name carries no extension, so identical bytes uploaded under any
+    file name share one blob; the original name stays in the file record.
+
+    Every adopt() holds a reference on the hash until release() (the file
+    record is inserted) or discard() (the upload is rejected), so a blob
+    is never deleted under an upload that deduplicated against it but has
+    not inserted its record yet.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.staging_dir = self.root / ".staging"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # hash -> [uploads holding it, uploads that adopted it while any was held]
+        self._pending: Dict[str, List[int]] = {}
+
+    def blob_path(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash
+
+    def new_writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def staging_path(self) -> Path:
+        """A fresh file name in the staging area (same filesystem as the blobs)"""
+        return self.staging_dir / f"{uuid.uuid4().hex}.part"
+
+    def adopt(self, temp_path: Path, content_hash: str, size: int) -> Tuple[str, str, bool]:
+        """Move a staged file with known hash into the store; returns (path, content_hash, deduplicated).
+
+        The caller holds a reference on the hash afterwards and must
+        release() or discard() it.
+        """
+        blob_path = self.blob_path(content_hash)
+
+        with self._lock:
+            pending = self._pending.setdefault(content_hash, [0, 0])
+            pending[0] += 1
+            pending[1] += 1
+            try:
+                if blob_path.exists() and blob_path.stat().st_size == size:
+                    # Same content already stored - drop the new copy
+                    Path(temp_path).unlink()
+                    logger.info(f"Deduplicated upload {content_hash[:12]} ({size} bytes)")
+                    return str(blob_path), content_hash, True
+
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, blob_path)
+            except Exception:
+                self._release(content_hash)
+                raise
+        logger.info(f"Stored new blob {content_hash[:12]} ({size} bytes)")
+        return str(blob_path), content_hash, False
+
+    def _release(self, content_hash: str) -> None:
+        pending = self._pending.get(content_hash)
+        if pending:
+            pending[0] -= 1
+            if pending[0] <= 0:
+                del self._pending[content_hash]
+
+    def release(self, content_hash: str) -> None:
+        """Drop the reference taken by adopt() once the file record exists"""
+        with self._lock:
+            self._release(content_hash)
+
+    def discard(self, content_hash: str, blob_path: str) -> bool:
+        """Drop the reference of a rejected upload and delete its blob, unless another
+        upload adopted the same content meanwhile; returns whether it was deleted.
+
+        Callers must check first that no file record references the blob.
+        """
+        with self._lock:
+            pending = self._pending.get(content_hash)
+            shared = bool(pending) and (pending[0] > 1 or pending[1] > 1)
+            self._release(content_hash)
+            if shared:
+                return False
+            try:
+                os.remove(blob_path)
+                logger.info(f"Removed blob {blob_path}")
+            except FileNotFoundError:
+                pass
+            return True
+
+    def find_blob(self, content_hash: str) -> Optional[str]:
+        path = self.blob_path(content_hash)
+        return str(path) if path.exists() else None
@@ -26,15 +26,19 @@ class DocumentProcessor:
             '.markdown': self._read_text,
         }
     
-    def extract_text(self, file_path: str) -> str:
-        """Extract text from various document formats"""
+    def extract_text(self, file_path: str, extension: Optional[str] = None) -> str:
+        """Extract text from various document formats.
+        
+        extension overrides the file's own suffix, for uploads stored
+        content-addressed (without one); pass the original filename's suffix.
+        """
         file_path = Path(file_path)
         
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
         
         # Get file extension
-        extension = file_path.suffix.lower()
+        extension = (extension or file_path.suffix).lower()
         
         # Try to process based on extension
         if extension in self.supported_formats:
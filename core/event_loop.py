@@ -0,0 +1,194 @@
+"""
+Event-loop hygiene - bounded thread pools for blocking work and a monitor for how long the loop stalls
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class BlockingPool:
+    """A fixed-size thread pool for one kind of blocking work.
+
+    Kinds are kept apart so a burst of one cannot starve the others: many
+    ffprobe runs waiting on child processes do not delay a file write, and
+    a long document parse does not hold up probes. Work beyond max_workers
+    queues; the stats show how long it waited.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix=f"blocking-{name}")
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "queued": 0,
+            "running": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "total_run": 0.0,
+            "max_run": 0.0,
+        }
+
+    def _call(self, queued_at: float, func: Callable, args: tuple, kwargs: dict) -> Any:
+        started = time.monotonic()
+        wait = started - queued_at
+        with self._lock:
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+            self._stats["total_wait"] += wait
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["total_run"] += elapsed
+                self._stats["max_run"] = max(self._stats["max_run"], elapsed)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool and await its result.
+
+        Like asyncio.to_thread, the caller's context is copied, so the job's
+        cancellation token follows the call.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["queued"] += 1
+        context = contextvars.copy_context()
+        call = partial(context.run, self._call, time.monotonic(), func, args, kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        started = stats["calls"] - stats["queued"]
+        done = started - stats["running"]
+        stats.update({
+            "max_workers": self.max_workers,
+            "avg_wait": stats["total_wait"] / started if started else 0.0,
+            "avg_run": stats["total_run"] / done if done else 0.0,
+        })
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+# subprocess: FFprobe/FFmpeg runs and other calls that wait on a child process
+# cpu: document parsing and hashing, sized to the cores
+# io: file reads/writes, directory scans and queue/broker calls
+_pools: Dict[str, BlockingPool] = {}
+
+def configure_pools(subprocess_workers: int = 4, cpu_workers: Optional[int] = None,
+                    io_workers: int = 16) -> None:
+    """(Re)create the process-wide pools; pools being replaced finish their queued work"""
+    sizes = {
+        "subprocess": subprocess_workers,
+        "cpu": cpu_workers or os.cpu_count() or 1,
+        "io": io_workers,
+    }
+    for name, size in sizes.items():
+        old = _pools.get(name)
+        _pools[name] = BlockingPool(name, size)
+        if old:
+            old.shutdown(wait=False)
+    logger.info(f"Blocking pools: {', '.join(f'{name}={pool.max_workers}' for name, pool in _pools.items())}")
+
+def get_pool(name: str) -> BlockingPool:
+    if not _pools:
+        configure_pools()
+    return _pools[name]
+
+async def run_subprocess(func: Callable, *args, **kwargs) -> Any:
+    """Run a call that waits on a child process (probe, analysis) off the event loop"""
+    return await get_pool("subprocess").run(func, *args, **kwargs)
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound parsing or hashing off the event loop"""
+    return await get_pool("cpu").run(func, *args, **kwargs)
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking file or network I/O off the event loop"""
+    return await get_pool("io").run(func, *args, **kwargs)
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+def shutdown_pools(wait: bool = True) -> None:
+    for pool in _pools.values():
+        pool.shutdown(wait=wait)
+    _pools.clear()
+
+class LoopLagMonitor:
+    """Measures how long the event loop was blocked.
+
+    A task sleeps for `interval` and compares when it woke with when it
+    asked to: the overshoot is time the loop spent running something that
+    did not yield. Stalls over warn_threshold are logged, so a blocking
+    call that slipped into a handler shows up in the logs and in /health.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "samples": 0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+            "total_lag": 0.0,
+            "stalls": 0,
+            "last_stall_at": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, lag: float) -> None:
+        stats = self._stats
+        stats["samples"] += 1
+        stats["last_lag"] = lag
+        stats["max_lag"] = max(stats["max_lag"], lag)
+        stats["total_lag"] += lag
+        if lag >= self.warn_threshold:
+            stats["stalls"] += 1
+            stats["last_stall_at"] = time.time()
+            logger.warning(f"Event loop was blocked for {lag * 1000:.0f}ms")
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.monotonic() - expected))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({
+            "interval": self.interval,
+            "warn_threshold": self.warn_threshold,
+            "avg_lag": stats["total_lag"] / stats["samples"] if stats["samples"] else 0.0,
+        })
+        return stats
@@ -0,0 +1,200 @@
+"""
+Streaming FFmpeg runner - live progress from `-progress pipe:1`, timeouts and a bounded stderr tail
+"""
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import subprocess
+from collections import deque
+from typing import List, Optional, Callable
+from .cancellation import JobCancelled, current_token, terminate_process
+
+logger = logging.getLogger(__name__)
+
+# Lines of stderr kept for error messages
+STDERR_TAIL_LINES = 200
+
+class FFmpegError(Exception):
+    """FFmpeg could not be run to completion"""
+
+    def __init__(self, message: str, stderr: str = ""):
+        super().__init__(f"{message}: {stderr}" if stderr else message)
+        self.stderr = stderr
+
+class FFmpegTimeout(FFmpegError):
+    """FFmpeg exceeded its wall-clock limit or stopped reporting progress"""
+
+def with_progress_output(cmd: List[str]) -> List[str]:
+    """Add machine-readable progress on stdout (global options, placed before the output path)"""
+    cmd = list(cmd)
+    if '-progress' not in cmd and len(cmd) > 1:
+        cmd[-1:-1] = ['-progress', 'pipe:1', '-nostats']
+    return cmd
+
+class ProgressParser:
+    """Turns `key=value` lines from `-progress` into a 0-100 percentage"""
+
+    def __init__(self, duration: Optional[float] = None,
+                 progress_callback: Optional[Callable] = None):
+        self.duration = duration if duration and duration > 0 else None
+        self.progress_callback = progress_callback
+        self.out_time = 0.0
+        self.finished = False
+        self._last_percent = -1
+
+    def feed(self, line: str) -> None:
+        key, _, value = line.strip().partition('=')
+        if key in ('out_time_us', 'out_time_ms'):
+            # Both keys are in microseconds
+            try:
+                self.out_time = max(self.out_time, int(value) / 1_000_000)
+            except ValueError:
+                return
+        elif key == 'progress':
+            self.finished = value == 'end'
+            self._report()
+
+    def _report(self) -> None:
+        if not self.progress_callback or not self.duration:
+            return
+        percent = 100 if self.finished else min(99, int(self.out_time / self.duration * 100))
+        if percent != self._last_percent:
+            self._last_percent = percent
+            try:
+                self.progress_callback(percent)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+def _pump(stream, put: Callable) -> None:
+    """Hand lines from a pipe to `put` until EOF"""
+    try:
+        for line in iter(stream.readline, ''):
+            put(line.rstrip('\n'))
+    finally:
+        stream.close()
+
+def run_process(cmd: List[str], duration: Optional[float] = None,
+                progress_callback: Optional[Callable] = None,
+                timeout: Optional[float] = None,
+                stall_timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Run an FFmpeg command with `-progress` already applied and watch it.
+
+    duration is the expected output length in seconds, used to turn out_time
+    into a percentage. The process is killed when it runs longer than timeout
+    or produces no progress for stall_timeout seconds. Only the last
+    STDERR_TAIL_LINES of stderr are kept; they are returned as `stderr`.
+    """
+    token = current_token()
+    if token:
+        token.raise_if_cancelled()
+
+    # Own process group, so cancellation can kill FFmpeg together with its wrappers
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors='replace',
+                               start_new_session=os.name == 'posix')
+    if token:
+        token.attach_process(process)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    progress_lines = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, progress_lines.put), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr_tail.append), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    parser = ProgressParser(duration, progress_callback)
+    started = last_activity = time.monotonic()
+    try:
+        while True:
+            try:
+                parser.feed(progress_lines.get(timeout=0.5))
+                last_activity = time.monotonic()
+            except queue.Empty:
+                if process.poll() is not None and not readers[0].is_alive():
+                    break
+
+            if token and token.is_cancelled():
+                raise JobCancelled(f"Job {token.job_id} was cancelled")
+            now = time.monotonic()
+            if timeout and now - started > timeout:
+                raise FFmpegTimeout(f"FFmpeg exceeded {timeout:.0f}s", "\n".join(stderr_tail))
+            if stall_timeout and now - last_activity > stall_timeout:
+                raise FFmpegTimeout(f"FFmpeg made no progress for {stall_timeout:.0f}s",
+                                    "\n".join(stderr_tail))
+    finally:
+        if process.poll() is None:
+            terminate_process(process)
+        process.wait()
+        if token:
+            token.detach_process(process)
+        for reader in readers:
+            reader.join(timeout=5)
+
+    if token and token.is_cancelled():
+        # Killed by cancel() rather than finished
+        raise JobCancelled(f"Job {token.job_id} was cancelled")
+    return subprocess.CompletedProcess(cmd, process.returncode, "", "\n".join(stderr_tail))
+
+async def run_process_async(cmd: List[str], duration: Optional[float] = None,
+                            progress_callback: Optional[Callable] = None,
+                            timeout: Optional[float] = None,
+                            stall_timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """asyncio variant of run_process for use inside the API event loop"""
+    token = current_token()
+    if token:
+        token.raise_if_cancelled()
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        start_new_session=os.name == 'posix'
+    )
+    if token:
+        token.attach_process(process)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def read_stderr():
+        async for line in process.stderr:
+            stderr_tail.append(line.decode(errors='replace').rstrip('\n'))
+
+    parser = ProgressParser(duration, progress_callback)
+    stderr_task = asyncio.create_task(read_stderr())
+    started = last_activity = time.monotonic()
+    try:
+        while True:
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), 0.5)
+                if not line:
+                    break
+                parser.feed(line.decode(errors='replace'))
+                last_activity = time.monotonic()
+            except asyncio.TimeoutError:
+                pass
+
+            if token and token.is_cancelled():
+                raise JobCancelled(f"Job {token.job_id} was cancelled")
+            now = time.monotonic()
+            if timeout and now - started > timeout:
+                raise FFmpegTimeout(f"FFmpeg exceeded {timeout:.0f}s", "\n".join(stderr_tail))
+            if stall_timeout and now - last_activity > stall_timeout:
+                raise FFmpegTimeout(f"FFmpeg made no progress for {stall_timeout:.0f}s",
+                                    "\n".join(stderr_tail))
+        await process.wait()
+        await stderr_task
+    finally:
+        if process.returncode is None:
+            terminate_process(process)
+            await process.wait()
+        if token:
+            token.detach_process(process)
+        if not stderr_task.done():
+            stderr_task.cancel()
+
+    if token and token.is_cancelled():
+        # Killed by cancel() rather than finished
+        raise JobCancelled(f"Job {token.job_id} was cancelled")
+    return subprocess.CompletedProcess(cmd, process.returncode, "", "\n".join(stderr_tail))
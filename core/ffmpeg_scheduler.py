@@ -0,0 +1,176 @@
+"""
+Process-wide FFmpeg scheduler - shares a CPU-core budget between all encoder processes
+"""
+import os
+import time
+import asyncio
+import shutil
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Callable
+from .ffmpeg_runner import run_process, run_process_async, with_progress_output
+from .cancellation import current_token
+
+logger = logging.getLogger(__name__)
+
+class FFmpegScheduler:
+    """Hands out CPU tokens to FFmpeg invocations.
+
+    Every invocation asks for a number of threads, waits until that many tokens
+    of the core budget are free, runs with `-threads` set to the grant and a
+    lowered CPU/IO priority, and returns the tokens when it exits. This keeps
+    overlapping jobs (BackgroundTasks, Celery, thread pools) from
+    oversubscribing the machine and leaves headroom for the API event loop.
+    """
+
+    def __init__(self, core_budget: Optional[int] = None, threads_per_job: Optional[int] = None,
+                 nice: int = 10, ionice_class: Optional[int] = 2, ionice_level: int = 7,
+                 timeout: Optional[float] = None, stall_timeout: Optional[float] = None):
+        self._cond = threading.Condition()
+        self._stats = {
+            "runs": 0,
+            "waiting": 0,
+            "running": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "last_wait": 0.0,
+        }
+        self.configure(core_budget, threads_per_job, nice, ionice_class, ionice_level,
+                       timeout, stall_timeout)
+
+    def configure(self, core_budget: Optional[int] = None, threads_per_job: Optional[int] = None,
+                  nice: int = 10, ionice_class: Optional[int] = 2, ionice_level: int = 7,
+                  timeout: Optional[float] = None, stall_timeout: Optional[float] = None) -> None:
+        # Default limits for every run; a hung encoder must not hold its cores forever
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        with self._cond:
+            in_use = getattr(self, 'core_budget', 0) - getattr(self, '_available', 0)
+            self.core_budget = max(1, core_budget or os.cpu_count() or 1)
+            self.threads_per_job = max(1, min(threads_per_job or max(1, self.core_budget // 2), self.core_budget))
+            self._available = self.core_budget - in_use
+            self._cond.notify_all()
+
+        self._prefix = []
+        if os.name == 'posix':
+            if nice and shutil.which('nice'):
+                self._prefix.extend(['nice', '-n', str(nice)])
+            if ionice_class is not None and shutil.which('ionice'):
+                self._prefix.extend(['ionice', '-c', str(ionice_class)])
+                if ionice_class == 2:
+                    self._prefix.extend(['-n', str(ionice_level)])
+
+    @property
+    def max_concurrency(self) -> int:
+        """How many default-sized FFmpeg jobs fit in the budget at once"""
+        return max(1, self.core_budget // self.threads_per_job)
+
+    def acquire(self, threads: Optional[int] = None) -> int:
+        """Block until `threads` tokens are free; returns the granted thread count"""
+        granted = max(1, min(threads or self.threads_per_job, self.core_budget))
+        token = current_token()
+        queued_at = time.monotonic()
+        with self._cond:
+            self._stats["waiting"] += 1
+            try:
+                while self._available < granted:
+                    # A cancelled job leaves the queue instead of waiting for cores
+                    if token:
+                        token.raise_if_cancelled()
+                    self._cond.wait(timeout=0.5)
+            finally:
+                self._stats["waiting"] -= 1
+            self._available -= granted
+            self._stats["running"] += 1
+
+            wait = time.monotonic() - queued_at
+            self._stats["runs"] += 1
+            self._stats["total_wait"] += wait
+            self._stats["last_wait"] = wait
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+        if wait > 1.0:
+            logger.info(f"FFmpeg job waited {wait:.1f}s for {granted} core(s)")
+        return granted
+
+    def release(self, granted: int) -> None:
+        with self._cond:
+            self._available += granted
+            self._stats["running"] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, threads: Optional[int] = None):
+        """Hold `threads` tokens for the duration of the block"""
+        granted = self.acquire(threads)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+    def build_command(self, cmd: List[str], threads: int) -> List[str]:
+        """Apply the thread grant (as an output option, just before the output path) and priority"""
+        cmd = list(cmd)
+        if '-threads' not in cmd and len(cmd) > 1:
+            cmd[-1:-1] = ['-threads', str(threads)]
+        return self._prefix + cmd
+
+    def run(self, cmd: List[str], threads: Optional[int] = None,
+            duration: Optional[float] = None,
+            progress_callback: Optional[Callable] = None) -> subprocess.CompletedProcess:
+        """Run an FFmpeg command (ending with its output path) inside a scheduler slot.
+
+        duration is the expected output length; with it progress_callback
+        receives a real 0-100 percentage parsed from FFmpeg's progress output.
+        """
+        with self.slot(threads) as granted:
+            return run_process(self.build_command(with_progress_output(cmd), granted),
+                               duration, progress_callback, self.timeout, self.stall_timeout)
+
+    async def run_async(self, cmd: List[str], threads: Optional[int] = None,
+                        duration: Optional[float] = None,
+                        progress_callback: Optional[Callable] = None) -> subprocess.CompletedProcess:
+        """run() for the event loop: waits for a slot in a worker thread, streams with asyncio"""
+        # to_thread copies the context, so the job's cancellation token follows
+        granted = await asyncio.to_thread(self.acquire, threads)
+        try:
+            return await run_process_async(self.build_command(with_progress_output(cmd), granted),
+                                           duration, progress_callback,
+                                           self.timeout, self.stall_timeout)
+        finally:
+            self.release(granted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "core_budget": self.core_budget,
+                "threads_per_job": self.threads_per_job,
+                "available_cores": self._available,
+                "avg_wait": stats["total_wait"] / stats["runs"] if stats["runs"] else 0.0,
+            })
+        return stats
+
+_scheduler = FFmpegScheduler()
+
+def get_scheduler() -> FFmpegScheduler:
+    return _scheduler
+
+def configure_scheduler(**kwargs) -> FFmpegScheduler:
+    """Apply settings (core budget, threads per job, nice/ionice) to the process-wide scheduler"""
+    _scheduler.configure(**kwargs)
+    logger.info(f"FFmpeg scheduler: {_scheduler.core_budget} cores, "
+                f"{_scheduler.threads_per_job} threads per job")
+    return _scheduler
+
+def run_ffmpeg(cmd: List[str], threads: Optional[int] = None, duration: Optional[float] = None,
+               progress_callback: Optional[Callable] = None) -> subprocess.CompletedProcess:
+    """Run an FFmpeg command through the process-wide scheduler"""
+    return _scheduler.run(cmd, threads, duration, progress_callback)
+
+async def run_ffmpeg_async(cmd: List[str], threads: Optional[int] = None,
+                           duration: Optional[float] = None,
+                           progress_callback: Optional[Callable] = None) -> subprocess.CompletedProcess:
+    """Async run_ffmpeg for request handlers in main.py"""
+    return await _scheduler.run_async(cmd, threads, duration, progress_callback)
@@ -0,0 +1,70 @@
+"""
+Shared HTTP client - one keep-alive connection pool per process for all outbound API traffic
+"""
+import os
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB per read/write step
+
+_client: Optional[httpx.Client] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401 - httpx needs it for HTTP/2
+        return True
+    except ImportError:
+        return False
+
+def get_http_client() -> httpx.Client:
+    """Process-wide client; connections (and TLS sessions) are reused across scenes and jobs.
+
+    Created lazily and again after a fork, so prefork workers never share sockets.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            http2 = _http2_available()
+            _client = httpx.Client(
+                http2=http2,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0),
+                follow_redirects=True,
+            )
+            _client_pid = os.getpid()
+            logger.info(f"HTTP client created ({'HTTP/2' if http2 else 'HTTP/1.1'} keep-alive pool)")
+        return _client
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+
+def stream_to_file(url: str, output_path: str, timeout: float = 30.0) -> int:
+    """Download url straight to disk in chunks; returns the number of bytes written.
+
+    Data goes to a temporary file that is renamed into place only when complete.
+    """
+    temp_path = f"{output_path}.part"
+    written = 0
+    try:
+        with get_http_client().stream("GET", url, timeout=timeout) as response:
+            response.raise_for_status()
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return written
@@ -0,0 +1,202 @@
+"""
+Generated-image cache - identical prompts are paid for once, concurrent identical requests share one call
+"""
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from .cancellation import check_cancelled, current_token
+
+logger = logging.getLogger(__name__)
+
+def cache_key(model: str, size: str, quality: str, prompt: str) -> str:
+    """Key of a generated image: the request parameters that change the result"""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{model}|{size}|{quality}|{prompt_hash}".encode('utf-8')).hexdigest()
+
+def _link_or_copy(src, dst) -> None:
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Different filesystem (or no hard links): copy instead
+        shutil.copyfile(src, dst)
+
+def _wait(seconds: float) -> None:
+    """Sleep that ends early (with JobCancelled) when the current job is cancelled"""
+    token = current_token()
+    if token:
+        if token.wait(seconds):
+            token.raise_if_cancelled()
+    else:
+        time.sleep(seconds)
+
+class ImageCache:
+    """Images on disk at <root>/<key[:2]>/<key>.png, evicted least recently used first.
+
+    A file's mtime is its last use, so recency is shared by every process
+    using the same directory. fetch() coalesces identical requests: threads
+    in this process wait on the one in flight, other processes (local
+    workers, Celery) wait on a file lock and then read the cached result.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.lock_dir = self.root / ".locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._size: Optional[int] = None  # bytes in the cache, counted on first store
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def fetch(self, key: str, output_path: str, produce: Callable[[str], bool]) -> Tuple[bool, bool]:
+        """Put the image for key at output_path, calling produce(output_path) on a miss.
+
+        Returns (ok, hit). Only successful results are cached.
+        """
+        if self._copy_out(key, output_path):
+            return True, True
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = threading.Event()
+
+        if not leader:
+            while not flight.wait(0.2):
+                check_cancelled()
+            if self._copy_out(key, output_path):
+                return True, True
+            # The shared request failed; try on our own
+            return produce(output_path), False
+
+        try:
+            with self._key_lock(key):
+                # Another process may have produced it while we waited for the lock
+                if self._copy_out(key, output_path):
+                    return True, True
+                ok = produce(output_path)
+                if ok:
+                    self._store(key, output_path)
+                return ok, False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"bytes": self._size or 0, "max_bytes": self.max_bytes, "in_flight": len(self._in_flight)}
+
+    def _copy_out(self, key: str, output_path: str) -> bool:
+        entry = self.entry_path(key)
+        temp_path = f"{output_path}.part"
+        try:
+            os.utime(entry)  # mark as recently used
+            _link_or_copy(entry, temp_path)
+            os.replace(temp_path, output_path)
+        except FileNotFoundError:
+            # Not cached, or evicted just now
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        logger.info(f"Image cache hit {key[:12]} -> {output_path}")
+        return True
+
+    def _store(self, key: str, output_path: str) -> None:
+        entry = self.entry_path(key)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = f"{entry}.{os.getpid()}.part"
+            _link_or_copy(output_path, temp_path)
+            os.replace(temp_path, entry)
+            size = entry.stat().st_size
+        except OSError as e:
+            # A cache that cannot be written must not fail the job
+            logger.warning(f"Could not cache image {key[:12]}: {e}")
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _entries(self):
+        for path in self.root.glob("??/*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache is back to 90% of its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._size = total
+        logger.info(f"Image cache evicted {removed} image(s), {total} bytes remain")
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """Exclusive lock across processes for the stripe the key falls in"""
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows): coalesce within this process only
+            yield
+            return
+        # Striped by key prefix: 256 lock files rather than one per image
+        lock_path = self.lock_dir / f"{key[:2]}.lock"
+        with open(lock_path, 'a') as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    _wait(0.2)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+_caches: Dict[str, ImageCache] = {}
+_caches_lock = threading.Lock()
+
+def get_image_cache(root: str, max_bytes: int) -> ImageCache:
+    """Shared cache for a directory, so in-flight coalescing spans every generator in the process"""
+    key = os.path.abspath(root)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ImageCache(root, max_bytes)
+            _caches[key] = cache
+        cache.max_bytes = max_bytes
+        return cache
@@ -0,0 +1,185 @@
+"""
+Media probing utilities - one FFprobe pass per file, stored with the upload
+"""
+import os
+import uuid
+import logging
+import subprocess
+import json
+from array import array
+from bisect import bisect_right
+from typing import Optional, Dict, Any, List
+from .ffmpeg_utils import get_ffprobe_path
+
+logger = logging.getLogger(__name__)
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Convert an FFprobe rational like '30000/1001' to a float"""
+    if not rate or rate in ("0/0", "N/A"):
+        return None
+    try:
+        if '/' in rate:
+            num, den = rate.split('/', 1)
+            return float(num) / float(den) if float(den) else None
+        return float(rate)
+    except (TypeError, ValueError):
+        return None
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def probe_keyframes(media_path: str) -> List[float]:
+    """Return the presentation times of all video keyframes (demux only, no decode)"""
+    cmd = [
+        get_ffprobe_path(),
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        media_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.error(f"FFprobe keyframe scan error: {result.stderr}")
+        return []
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        pts = _to_float(parts[0])
+        if pts is not None:
+            keyframes.append(pts)
+    keyframes.sort()
+    return keyframes
+
+def keyframe_index_path(media_path: str) -> str:
+    """The keyframe index is cached alongside the media file"""
+    return f"{media_path}.kfi"
+
+def load_keyframe_index(media_path: str) -> array:
+    """Sorted keyframe PTS (float64 array), read from the .kfi cache or built with one scan"""
+    index_path = keyframe_index_path(media_path)
+    try:
+        if os.path.getmtime(index_path) >= os.path.getmtime(media_path):
+            index = array('d')
+            with open(index_path, 'rb') as f:
+                index.frombytes(f.read())
+            return index
+    except (OSError, ValueError):
+        # Missing, stale or unreadable (not a whole number of entries): rebuild it
+        pass
+
+    index = array('d', probe_keyframes(media_path))
+    # Written under a temporary name and renamed, so readers never see a partial index
+    temp_path = f"{index_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            index.tofile(f)
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        logger.warning(f"Could not cache keyframe index for {media_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return index
+
+def previous_keyframe(index: array, position: float) -> float:
+    """Last keyframe at or before position (0.0 if the index is empty)"""
+    i = bisect_right(index, position + 1e-6)
+    return index[i - 1] if i else 0.0
+
+def probe_media(media_path: str, scan_keyframes: bool = True) -> Dict[str, Any]:
+    """Probe a media file once and return a flat metadata record"""
+    logger.info(f"Probing media: {media_path}")
+
+    cmd = [
+        get_ffprobe_path(),
+        '-v', 'error',
+        '-show_format',
+        '-show_streams',
+        '-show_data_hash', 'sha256',  # extradata_hash: SPS/PPS, to tell if clips can be concatenated
+        '-of', 'json',
+        media_path
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"FFprobe failed: {result.stderr}")
+
+    data = json.loads(result.stdout or '{}')
+    fmt = data.get('format', {})
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'
+                  and not s.get('disposition', {}).get('attached_pic')), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    metadata = {
+        "duration": _to_float(fmt.get('duration')),
+        "format_name": fmt.get('format_name'),
+        "bit_rate": _to_int(fmt.get('bit_rate')),
+        "size": _to_int(fmt.get('size')),
+        "video_codec": None,
+        "video_profile": None,
+        "width": None,
+        "height": None,
+        "fps": None,
+        "video_level": None,
+        "video_refs": None,
+        "extradata_hash": None,
+        "pix_fmt": None,
+        "time_base": None,
+        "audio_codec": None,
+        "sample_rate": None,
+        "channels": None,
+        "channel_layout": None,
+        "keyframe_count": None,
+    }
+
+    if video:
+        metadata.update({
+            "video_codec": video.get('codec_name'),
+            "video_profile": video.get('profile'),
+            "width": _to_int(video.get('width')),
+            "height": _to_int(video.get('height')),
+            "fps": _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate')),
+            "video_level": _to_int(video.get('level')),
+            "video_refs": _to_int(video.get('refs')),
+            "extradata_hash": video.get('extradata_hash'),
+            "pix_fmt": video.get('pix_fmt'),
+            "time_base": video.get('time_base'),
+        })
+        if metadata["duration"] is None:
+            metadata["duration"] = _to_float(video.get('duration'))
+        if scan_keyframes:
+            metadata["keyframe_count"] = len(load_keyframe_index(media_path))
+
+    if audio:
+        metadata.update({
+            "audio_codec": audio.get('codec_name'),
+            "sample_rate": _to_int(audio.get('sample_rate')),
+            "channels": _to_int(audio.get('channels')),
+            "channel_layout": audio.get('channel_layout'),
+        })
+        if metadata["duration"] is None:
+            metadata["duration"] = _to_float(audio.get('duration'))
+
+    logger.info(f"Probe result for {os.path.basename(media_path)}: "
+                f"{metadata['duration']}s, video={metadata['video_codec']}, audio={metadata['audio_codec']}")
+    return metadata
+
+def duration_from_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Read a positive duration from a stored probe record"""
+    if not metadata:
+        return None
+    duration = _to_float(metadata.get('duration'))
+    return duration if duration and duration > 0 else None
@@ -0,0 +1,110 @@
+"""
+Incremental multipart/form-data parser - file parts are handed out as they arrive, never buffered whole
+"""
+import re
+import logging
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Events produced by MultipartParser.feed()
+PART = "part"  # value: the part's headers (lower-case names)
+DATA = "data"  # value: a piece of the current part's body
+END = "end"    # value: None, the current part is complete
+
+MAX_HEADER_BYTES = 16 * 1024
+
+class MultipartError(ValueError):
+    """The request body is not valid multipart/form-data"""
+
+def parse_options_header(value: str) -> Tuple[str, Dict[str, str]]:
+    """'form-data; name="file"; filename="a.mp4"' -> ('form-data', {'name': 'file', 'filename': 'a.mp4'})"""
+    main, _, rest = value.partition(';')
+    options = {}
+    for match in re.finditer(r'\s*([^\s=;]+)\s*=\s*("(?:\\.|[^"\\])*"|[^;]*)', rest):
+        key, raw = match.group(1).lower(), match.group(2).strip()
+        if raw.startswith('"'):
+            raw = re.sub(r'\\(.)', r'\1', raw[1:-1])
+        options[key] = raw
+    return main.strip().lower(), options
+
+def get_boundary(content_type: Optional[str]) -> bytes:
+    kind, options = parse_options_header(content_type or "")
+    if kind != "multipart/form-data" or not options.get("boundary"):
+        raise MultipartError("Expected a multipart/form-data body with a boundary")
+    return options["boundary"].encode('latin-1')
+
+class MultipartParser:
+    """Push parser: feed() body chunks in order, iterate the events each call returns.
+
+    Body data is split only where a boundary could start, so DATA events
+    are about as large as the chunks fed in; nothing beyond one boundary
+    length is kept between calls.
+    """
+
+    def __init__(self, boundary: bytes):
+        # The first boundary has no leading CRLF; pretend it does
+        self._delimiter = b"\r\n--" + boundary
+        self._buffer = bytearray(b"\r\n")
+        self._state = "preamble"
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[str, object]]:
+        if self._state != "done":
+            self._buffer += chunk
+        return self._events()
+
+    def _events(self) -> Iterator[Tuple[str, object]]:
+        if self._state == "done":
+            return
+        buffer = self._buffer
+        delimiter = self._delimiter
+        while True:
+            if self._state in ("preamble", "body"):
+                index = buffer.find(delimiter)
+                if index < 0:
+                    # Keep what could be the start of a delimiter split across chunks
+                    keep = len(delimiter) - 1
+                    if self._state == "body" and len(buffer) > keep:
+                        yield DATA, bytes(buffer[:-keep])
+                        del buffer[:-keep]
+                    elif self._state == "preamble" and len(buffer) > keep:
+                        del buffer[:-keep]
+                    return
+                after = index + len(delimiter)
+                if len(buffer) < after + 2:
+                    # Need the two bytes after the delimiter to know if this is the last one
+                    if self._state == "body" and index:
+                        yield DATA, bytes(buffer[:index])
+                        del buffer[:index]
+                    return
+                if self._state == "body":
+                    if index:
+                        yield DATA, bytes(buffer[:index])
+                    yield END, None
+                marker = bytes(buffer[after:after + 2])
+                del buffer[:after + 2]
+                if marker == b"--":
+                    self._state = "done"
+                    buffer.clear()
+                    return
+                if marker != b"\r\n":
+                    raise MultipartError("Malformed multipart boundary")
+                self._state = "headers"
+            elif self._state == "headers":
+                index = buffer.find(b"\r\n\r\n")
+                if index < 0:
+                    if len(buffer) > MAX_HEADER_BYTES:
+                        raise MultipartError("Multipart part headers too large")
+                    return
+                headers = {}
+                for line in bytes(buffer[:index]).decode('utf-8', errors='replace').split("\r\n"):
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                del buffer[:index + 4]
+                self._state = "body"
+                yield PART, headers
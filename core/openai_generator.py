@@ -4,21 +4,65 @@ OpenAI Image Generator using DALL-E API
 import os
 import logging
 import base64
-import requests
-from typing import Optional, Dict, Any
+import random
+import threading
+import contextvars
+import httpx
+from typing import Optional, Dict, Any, List, Callable
 from pathlib import Path
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 import time
+from .cancellation import JobCancelled, check_cancelled, current_token
+from .rate_limiter import get_bucket
+from .http_client import get_http_client, stream_to_file
+from .image_cache import cache_key, get_image_cache
+from .circuit_breaker import get_breaker
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# Responses worth retrying: rate limited or a transient server error
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 2.0  # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 60.0
+
+# "url": download the image from the returned link; "b64_json": image comes inline, no second request
+RESPONSE_FORMATS = ("url", "b64_json")
+
 class OpenAIImageGenerator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None, max_in_flight: int = 4,
+                 requests_per_minute: float = 50, images_per_minute: float = 15,
+                 max_retries: int = 5, response_format: str = "url",
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = 2 * 1024 ** 3,
+                 breaker_failures: int = 5, breaker_cooldown: float = 60.0,
+                 hedge_after: float = 0):
         self.api_key = api_key
-        self.base_url = "https://api.openai.com/v1"
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Unsupported response format: {response_format}")
+        self.response_format = response_format
+        # Process-wide keep-alive pool, so scenes and jobs reuse connections
+        self.client = get_http_client()
+        # Identical prompts are served from disk; None disables the cache
+        self.cache = get_image_cache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache_hits = set()  # output paths served from the cache
+        self._cache_hits_lock = threading.Lock()
+        # Shared by every generator in the process: the limits belong to the account, not the job
+        self.request_bucket = get_bucket(f"{self.base_url}:requests", requests_per_minute)
+        self.image_bucket = get_bucket(f"{self.base_url}:images", images_per_minute)
+        # Per model and endpoint, also shared process-wide: an outage is not specific to one job
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        # Start the DALL-E 2 request too when DALL-E 3 has not answered after this many seconds (0 = off)
+        self.hedge_after = hedge_after
         logger.info("OpenAI Image Generator initialized")
     
     def create_scene_prompt(self, script_segment: str, character_description: str, 
@@ -56,99 +100,267 @@ class OpenAIImageGenerator:
             # Create output directory
             os.makedirs(output_dir, exist_ok=True)
             
-            # Generate image using DALL-E 3
-            image_data = self._generate_image_dalle3(prompt)
+            output_path = os.path.join(output_dir, f"{filename}.png")
             
-            if not image_data:
-                # Fallback to DALL-E 2
-                logger.warning("DALL-E 3 failed, trying DALL-E 2...")
-                image_data = self._generate_image_dalle2(prompt)
+            # DALL-E 3, falling back to DALL-E 2 (models with an open circuit are skipped at once)
+            if self.hedge_after > 0:
+                generated = self._generate_hedged(prompt, output_path)
+            else:
+                generated = self._generate_image_dalle3(prompt, output_path)
+                if not generated:
+                    # Fallback to DALL-E 2 (unless the job was cancelled meanwhile)
+                    check_cancelled()
+                    logger.warning("DALL-E 3 failed, trying DALL-E 2...")
+                    generated = self._generate_image_dalle2(prompt, output_path)
             
-            if not image_data:
+            if not generated:
                 raise Exception("Failed to generate image with both DALL-E 3 and DALL-E 2")
             
-            # Save the image
-            output_path = os.path.join(output_dir, f"{filename}.png")
-            self._save_image_from_data(image_data, output_path)
-            
             logger.info(f"Successfully generated and saved image: {output_path}")
             return output_path
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error generating image: {str(e)}")
             # Create a placeholder image as fallback
             return self._create_placeholder_image(output_dir, filename, str(e))
     
-    def _generate_image_dalle3(self, prompt: str) -> Optional[bytes]:
-        """Generate image using DALL-E 3"""
-        try:
-            url = f"{self.base_url}/images/generations"
-            data = {
-                "model": "dall-e-3",
-                "prompt": prompt,
-                "size": "1024x1024",
-                "quality": "standard",
-                "n": 1
+    def generate_images(self, scenes: List[Dict[str, str]], output_dir: str, style: str,
+                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                        on_image: Optional[Callable[[int, Optional[str]], None]] = None) -> List[Optional[str]]:
+        """Generate several scenes concurrently, at most max_in_flight requests at a time.
+        
+        scenes are dicts with 'prompt' and 'filename'. Paths are returned in scene
+        order (None for a scene that could not be produced at all);
+        progress_callback(done, total) is called as images finish, and
+        on_image(index, path) as soon as each scene's image is on disk.
+        """
+        results: List[Optional[str]] = [None] * len(scenes)
+        if not scenes:
+            return results
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(scenes))) as executor:
+            # Each request runs in a copy of this context, so job cancellation reaches it
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.generate_and_save_image,
+                                scene['prompt'], output_dir, scene['filename'], style): index
+                for index, scene in enumerate(scenes)
             }
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                    except JobCancelled:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Scene {index + 1} failed: {e}")
+                    if on_image:
+                        on_image(index, results[index])
+                    if progress_callback:
+                        progress_callback(done, len(scenes))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
+    
+    def _generate_hedged(self, prompt: str, output_path: str) -> bool:
+        """DALL-E 3 with a DALL-E 2 request started once it is hedge_after seconds late; first image wins"""
+        paths = {"DALL-E 3": f"{output_path}.dalle3.png", "DALL-E 2": f"{output_path}.dalle2.png"}
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-hedge")
+        try:
+            primary = executor.submit(contextvars.copy_context().run, self._generate_image_dalle3,
+                                      prompt, paths["DALL-E 3"])
+            futures = {primary: "DALL-E 3"}
+            try:
+                primary.result(timeout=self.hedge_after)
+            except FuturesTimeout:
+                logger.warning(f"DALL-E 3 slower than {self.hedge_after:.0f}s, hedging with DALL-E 2")
+            if not primary.done() or not primary.result():
+                check_cancelled()
+                futures[executor.submit(contextvars.copy_context().run, self._generate_image_dalle2,
+                                        prompt, paths["DALL-E 2"])] = "DALL-E 2"
             
-            response = requests.post(url, headers=self.headers, json=data, timeout=60)
+            for future in as_completed(futures):
+                if future.result():
+                    winner = paths[futures[future]]
+                    os.replace(winner, output_path)
+                    with self._cache_hits_lock:
+                        if winner in self.cache_hits:
+                            self.cache_hits.add(output_path)
+                    # The other request may still finish; drop whatever it writes
+                    for other in futures:
+                        if other is not future:
+                            other.add_done_callback(lambda _, path=paths[futures[other]]: self._discard(path))
+                    return True
+            return False
+        finally:
+            executor.shutdown(wait=False)
+    
+    def _discard(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def _breaker(self, model: str):
+        return get_breaker(f"{self.base_url}:{model}", self.breaker_failures, self.breaker_cooldown)
+    
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        """Server-provided Retry-After if any, else exponential backoff with jitter"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        return delay * random.uniform(0.75, 1.25)
+    
+    def _post_generation(self, payload: Dict[str, Any]) -> Optional[httpx.Response]:
+        """POST to the images endpoint within the rate limits, retrying 429/5xx and network errors.
+        
+        Every attempt gives the model's breaker a verdict, so a hanging or failing
+        model opens it after breaker_failures attempts, not after that many
+        requests have each used up their retries. A 429 is no verdict: rate
+        limits are per account and hold for every model alike.
+        """
+        url = f"{self.base_url}/images/generations"
+        breaker = self._breaker(payload['model'])
+        response = None
+        for attempt in range(self.max_retries + 1):
+            check_cancelled()
+            self.request_bucket.acquire()
+            self.image_bucket.acquire(payload.get('n', 1))
             
-            if response.status_code == 200:
-                result = response.json()
-                image_url = result['data'][0]['url']
-                
-                # Download the image
-                img_response = requests.get(image_url, timeout=30)
-                if img_response.status_code == 200:
-                    return img_response.content
-                else:
-                    logger.error(f"Failed to download image: {img_response.status_code}")
-                    return None
+            try:
+                response = self.client.post(url, headers=self.headers, json=payload, timeout=60)
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                response, error = None, str(e)
+            
+            if response is None or response.status_code >= 500:
+                breaker.record_failure()
+            elif response.status_code != 429:
+                # Answered (a 4xx such as a rejected prompt means the model itself is up)
+                breaker.record_success()
+            
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                return response
+            if response is not None and response.status_code == 429 and 'insufficient_quota' in response.text:
+                # Out of credit: retrying cannot help
+                return response
+            if attempt == self.max_retries:
+                break
+            if breaker.is_open:
+                # Other requests have already given up on this model
+                break
+            
+            delay = self._retry_delay(response, attempt)
+            if response is not None and response.status_code == 429:
+                # Rate limits are per account, so hold back every request sharing them
+                self.request_bucket.pause(delay)
+            logger.warning(f"{payload['model']} request failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            token = current_token()
+            if token:
+                if token.wait(delay):
+                    token.raise_if_cancelled()
             else:
-                logger.error(f"DALL-E 3 API error: {response.status_code} - {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"DALL-E 3 generation error: {str(e)}")
-            return None
+                time.sleep(delay)
+        return response
+    
+    def _generate_image_dalle3(self, prompt: str, output_path: str) -> bool:
+        """Generate image using DALL-E 3 and write it to output_path"""
+        data = {
+            "model": "dall-e-3",
+            "prompt": prompt,
+            "size": "1024x1024",
+            "quality": "standard",
+            "n": 1,
+            "response_format": self.response_format
+        }
+        return self._generate(data, output_path, "DALL-E 3")
+    
+    def _generate_image_dalle2(self, prompt: str, output_path: str) -> bool:
+        """Generate image using DALL-E 2 (fallback) and write it to output_path"""
+        data = {
+            "model": "dall-e-2",
+            "prompt": prompt,
+            "size": "1024x1024",
+            "n": 1,
+            "response_format": self.response_format
+        }
+        return self._generate(data, output_path, "DALL-E 2")
+    
+    def _generate(self, data: Dict[str, Any], output_path: str, label: str) -> bool:
+        """Serve the request from the image cache, or call the API (once for identical concurrent requests)"""
+        if not self.cache:
+            return self._request_image(data, output_path, label)
+        
+        key = cache_key(data['model'], data['size'], data.get('quality', ''), data['prompt'])
+        ok, hit = self.cache.fetch(key, output_path,
+                                   lambda path: self._request_image(data, path, label))
+        if hit:
+            with self._cache_hits_lock:
+                self.cache_hits.add(output_path)
+        return ok
     
-    def _generate_image_dalle2(self, prompt: str) -> Optional[bytes]:
-        """Generate image using DALL-E 2 (fallback)"""
+    def _request_image(self, data: Dict[str, Any], output_path: str, label: str) -> bool:
+        """Call the images API and write the result to output_path"""
+        breaker = self._breaker(data['model'])
+        if not breaker.allow():
+            logger.warning(f"{label} circuit open, skipping request")
+            return False
         try:
-            url = f"{self.base_url}/images/generations"
-            data = {
-                "model": "dall-e-2",
-                "prompt": prompt,
-                "size": "1024x1024",
-                "n": 1
-            }
-            
-            response = requests.post(url, headers=self.headers, json=data, timeout=60)
+            # _post_generation records each attempt on the breaker
+            response = self._post_generation(data)
+            if response is None:
+                logger.error(f"{label} API unreachable")
+                return False
             
             if response.status_code == 200:
-                result = response.json()
-                image_url = result['data'][0]['url']
-                
-                # Download the image
-                img_response = requests.get(image_url, timeout=30)
-                if img_response.status_code == 200:
-                    return img_response.content
-                else:
-                    logger.error(f"Failed to download image: {img_response.status_code}")
-                    return None
+                return self._store_result(response.json()['data'][0], output_path)
             else:
-                logger.error(f"DALL-E 2 API error: {response.status_code} - {response.text}")
-                return None
+                logger.error(f"{label} API error: {response.status_code} - {response.text}")
+                return False
                 
+        except JobCancelled:
+            raise
         except Exception as e:
-            logger.error(f"DALL-E 2 generation error: {str(e)}")
-            return None
+            logger.error(f"{label} generation error: {str(e)}")
+            return False
+        finally:
+            # Still half open means this probe got no verdict (cancelled, only 429s,
+            # or failed locally): hand its slot back
+            breaker.release()
+    
+    def _store_result(self, item: Dict[str, Any], output_path: str) -> bool:
+        """Write one generated image to disk, inline (b64_json) or downloaded from its URL"""
+        if item.get('b64_json'):
+            self._save_image_from_data(base64.b64decode(item['b64_json']), output_path)
+            return True
+        
+        # Stream the download straight to disk instead of buffering it
+        try:
+            size = stream_to_file(item['url'], output_path)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Failed to download image: {e.response.status_code}")
+            return False
+        logger.info(f"Image downloaded to: {output_path} ({size} bytes)")
+        return True
     
     def _save_image_from_data(self, image_data: bytes, output_path: str):
-        """Save image data to file"""
+        """Save image data to file (via a temporary file, so readers never see a partial image)"""
         try:
-            with open(output_path, 'wb') as f:
+            temp_path = f"{output_path}.part"
+            with open(temp_path, 'wb') as f:
                 f.write(image_data)
+            os.replace(temp_path, output_path)
             logger.info(f"Image saved to: {output_path}")
         except Exception as e:
             logger.error(f"Error saving image: {str(e)}")
@@ -203,7 +415,7 @@ class OpenAIImageGenerator:
         try:
             # Test with a simple API call
             url = f"{self.base_url}/models"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.client.get(url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 logger.info("OpenAI API connection successful")
@@ -220,7 +432,7 @@ class OpenAIImageGenerator:
         """Get list of available OpenAI models"""
         try:
             url = f"{self.base_url}/models"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.client.get(url, headers=self.headers, timeout=10)
             
             if response.status_code == 200:
                 models = response.json()
@@ -0,0 +1,71 @@
+"""
+Result publishing - atomic rename, hardlink or reflink instead of copying video files
+"""
+import os
+import sys
+import uuid
+import shutil
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Linux FICLONE ioctl (btrfs, XFS with reflink=1, bcachefs, ...)
+FICLONE = 0x40049409
+
+def _reflink(src: str, dest: str) -> bool:
+    """Try a copy-on-write clone of src into dest; returns False if unsupported"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except (OSError, ImportError):
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+def publish_file(src: str, dest: str, move: bool = False) -> str:
+    """Make src available at dest in O(1) I/O where the filesystem allows it.
+
+    move=True renames a scratch file into place. Otherwise a hardlink is tried
+    first, then a reflink, and only then a full copy. dest is always replaced
+    atomically, so readers never see a partially written file.
+    Returns the method used.
+    """
+    dest_path = Path(dest)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if move:
+        try:
+            os.replace(src, dest)
+            logger.info(f"Published {dest} (rename)")
+            return "rename"
+        except OSError as e:
+            # Cross-device: fall through to link/copy, then drop the source
+            logger.info(f"Rename to {dest} not possible ({e}), linking instead")
+
+    temp_path = str(dest_path.parent / f".{dest_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    method = None
+    try:
+        try:
+            os.link(src, temp_path)
+            method = "hardlink"
+        except OSError:
+            if _reflink(src, temp_path):
+                method = "reflink"
+            else:
+                shutil.copy2(src, temp_path)
+                method = "copy"
+        os.replace(temp_path, dest)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    if move and os.path.exists(src):
+        os.remove(src)
+
+    logger.info(f"Published {dest} ({method})")
+    return method
@@ -0,0 +1,73 @@
+"""
+Process-wide token buckets for API rate limits (requests and images per minute)
+"""
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from .cancellation import current_token
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute.
+
+    acquire() blocks until enough tokens are available. pause() stops all
+    callers until a point in time, which is how a 429 Retry-After from the
+    API is applied to every request sharing the limit, not just the one
+    that received it.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = max(rate_per_minute, 0.001) / 60.0  # tokens per second
+        self.capacity = burst if burst else max(1.0, rate_per_minute / 6.0)  # ~10s of traffic
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, sleeping as needed; returns the seconds waited"""
+        tokens = min(tokens, self.capacity)
+        token = current_token()
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            delay = min(delay, 1.0)
+            if token:
+                # Wake up early when the job is cancelled
+                if token.wait(delay):
+                    token.raise_if_cancelled()
+            else:
+                time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for the given time (e.g. a server-sent Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Restart slowly after the pause instead of bursting
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name: str, rate_per_minute: float) -> TokenBucket:
+    """Shared bucket for a named limit (recreated if the configured rate changes)"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None or abs(bucket.rate * 60.0 - rate_per_minute) > 1e-6:
+            bucket = TokenBucket(rate_per_minute)
+            _buckets[name] = bucket
+        return bucket
@@ -0,0 +1,118 @@
+"""
+Scene pipeline - encodes each scene's clip as soon as its image exists, while later images are still generating
+"""
+import os
+import logging
+import threading
+import contextvars
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+from .video_processor import VideoProcessor
+from .ffmpeg_scheduler import get_scheduler
+from .cancellation import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+class ScenePipeline:
+    """Turns scene images into still clips as they arrive.
+
+    add_image() queues the encode of one scene right away; finish() fills
+    scenes that never got an image, or whose clip failed to encode (a
+    corrupt download, a placeholder that is not an image), with a
+    neighbouring scene's image, waits for the remaining encodes and
+    returns the clips in scene order.
+    on_clip(ready) is called with {scene index: clip path} of every clip
+    finished so far, each time one completes.
+    """
+
+    def __init__(self, video_proc: VideoProcessor, clips_dir: str, durations: List[float],
+                 on_clip: Optional[Callable[[Dict[int, str]], None]] = None):
+        self.video_proc = video_proc
+        self.clips_dir = clips_dir
+        # Boundaries on the frame grid, so the clips add up to the exact total
+        self.durations = video_proc.frame_exact_durations(durations)
+        self.on_clip = on_clip
+        self.images: Dict[int, str] = {}
+        self.ready: Dict[int, str] = {}
+        self._sources: Dict[int, str] = {}
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        os.makedirs(clips_dir, exist_ok=True)
+        # Each clip encode takes one core from the FFmpeg scheduler budget
+        workers = max(1, min(get_scheduler().core_budget, len(self.durations)))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scene-encode")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
+
+    def clip_path(self, index: int) -> str:
+        return os.path.join(self.clips_dir, f"clip_{index+1:03d}.mp4")
+
+    def add_image(self, index: int, image_path: Optional[str]) -> None:
+        """Start encoding scene `index` (no-op for a scene without an image)"""
+        if not image_path or not os.path.exists(image_path):
+            logger.warning(f"Scene {index + 1} has no image yet")
+            return
+        self.images[index] = image_path
+        self._submit(index, image_path)
+
+    def _submit(self, index: int, image_path: str) -> None:
+        self._sources[index] = image_path
+        # Run in a copy of this context, so job cancellation reaches the encode
+        self._futures[index] = self._executor.submit(
+            contextvars.copy_context().run, self._encode, index, image_path)
+
+    def _neighbour(self, index: int, sources: Dict[int, str]) -> str:
+        """Image of the nearest earlier scene in sources (or the first one)"""
+        earlier = [i for i in sources if i < index]
+        return sources[max(earlier)] if earlier else sources[min(sources)]
+
+    def finish(self) -> List[str]:
+        """Wait for every scene's clip; returns clip paths in scene order"""
+        if not self.images:
+            raise Exception("No scene images to encode")
+        for index in range(len(self.durations)):
+            if index not in self.images:
+                # Hold the nearest earlier scene (or the first one) for this scene's time
+                logger.warning(f"Scene {index + 1} reuses the image of a neighbouring scene")
+                self._submit(index, self._neighbour(index, self.images))
+
+        clips = {index: self._futures[index].result() for index in range(len(self.durations))}
+        encoded = {index: self._sources[index] for index, clip in clips.items() if clip}
+        if not encoded:
+            raise Exception("No scene clip could be encoded")
+        failed = [index for index, clip in clips.items() if not clip]
+        for index in failed:
+            logger.warning(f"Scene {index + 1} reuses the image of a neighbouring scene after its encode failed")
+            self._submit(index, self._neighbour(index, encoded))
+        for index in failed:
+            clips[index] = self._futures[index].result()
+            if not clips[index]:
+                raise Exception(f"Could not encode clip {index + 1}")
+        return [clips[index] for index in range(len(self.durations))]
+
+    def close(self, cancel: bool = False) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def _encode(self, index: int, image_path: str) -> Optional[str]:
+        """Encode one scene's clip; None if it failed (finish() fills it from a neighbour)"""
+        clip_path = self.clip_path(index)
+        try:
+            self.video_proc.encode_still_clip(image_path, clip_path, self.durations[index])
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating clip {index + 1}: {e}")
+            return None
+        with self._lock:
+            self.ready[index] = clip_path
+            ready = dict(self.ready)
+            if self.on_clip:
+                try:
+                    self.on_clip(ready)
+                except Exception as e:
+                    logger.warning(f"Clip callback failed: {e}")
+        return clip_path
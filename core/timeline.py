@@ -0,0 +1,350 @@
+"""
+Timeline - clips, stills, audio and overlays on tracks, compiled into a single FFmpeg invocation
+"""
+import os
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+from .ffmpeg_utils import get_ffmpeg_path
+
+logger = logging.getLogger(__name__)
+
+VIDEO = "video"
+IMAGE = "image"
+AUDIO = "audio"
+
+# Output format of timelines that have to be decoded and re-encoded
+DEFAULT_WIDTH = 1920
+DEFAULT_HEIGHT = 1080
+DEFAULT_FPS = 30
+ENCODE_PRESET = "ultrafast"
+ENCODE_CRF = 23
+
+# Render modes, cheapest first
+COPY = "copy"            # concat demuxer, video stream-copied
+SLIDESHOW = "slideshow"  # concat demuxer of stills, one encode
+FILTER = "filter"        # one filter_complex graph, one encode
+
+class Segment:
+    """One use of a source on a track: the source from in_point, placed at `start`.
+
+    out_point is an explicit trim (None plays the source to its end);
+    length is the known duration of the used part, when there is one.
+    """
+    __slots__ = ('source', 'kind', 'start', 'in_point', 'out_point', 'length',
+                 'fade_in', 'fade_out', 'volume', 'position')
+
+    def __init__(self, source: str, kind: str = VIDEO, start: Optional[float] = 0.0,
+                 in_point: float = 0.0, out_point: Optional[float] = None,
+                 length: Optional[float] = None, fade_in: float = 0.0, fade_out: float = 0.0,
+                 volume: float = 1.0, position: Optional[str] = None):
+        self.source = source
+        self.kind = kind
+        self.start = start
+        self.in_point = in_point
+        self.out_point = out_point
+        self.length = length
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.volume = volume
+        self.position = position  # overlay x:y expression
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.out_point is not None:
+            return self.out_point - self.in_point
+        return self.length
+
+    @property
+    def end(self) -> Optional[float]:
+        duration = self.duration
+        if self.start is None or duration is None:
+            return None
+        return self.start + duration
+
+    def __repr__(self) -> str:
+        return (f"Segment({self.kind} {os.path.basename(self.source)!r} "
+                f"@{self.start} in={self.in_point} dur={self.duration})")
+
+class Track:
+    """A layer of segments of one kind; video track 0 is the base sequence"""
+    __slots__ = ('kind', 'segments')
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.segments: List[Segment] = []
+
+class IntervalIndex:
+    """What covers a time: segments sorted by start plus the running maximum of their ends.
+
+    The running maximum is non-decreasing, so a binary search finds the
+    first segment that can still be playing at a time and another the
+    last one that has started; only that window is scanned.
+    Segments with an unknown position or length are not indexed.
+    """
+
+    def __init__(self, segments: List[Segment]):
+        self._segments = sorted((s for s in segments if s.end is not None), key=lambda s: s.start)
+        self._starts = [s.start for s in self._segments]
+        self._max_ends = []
+        running = float('-inf')
+        for segment in self._segments:
+            running = max(running, segment.end)
+            self._max_ends.append(running)
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def at(self, time: float) -> List[Segment]:
+        """Segments playing at `time` (start <= time < end)"""
+        lo = bisect_right(self._max_ends, time)
+        hi = bisect_right(self._starts, time)
+        return [s for s in self._segments[lo:hi] if s.end > time]
+
+    def overlapping(self, start: float, end: float) -> List[Segment]:
+        """Segments playing at some point in [start, end)"""
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self._starts, end)
+        return [s for s in self._segments[lo:hi] if s.end > start]
+
+class Timeline:
+    """An edit decision list: a base video sequence, overlay layers and audio tracks.
+
+    duration trims the output; without one the output runs to the end of
+    the video, or to the end of the shortest stream when shortest is set.
+    uniform says every base clip shares codec parameters (mezzanine copies,
+    clips from one encoder), which makes a stream-copy render possible.
+    """
+
+    def __init__(self, width: int = DEFAULT_WIDTH, height: int = DEFAULT_HEIGHT, fps: int = DEFAULT_FPS,
+                 duration: Optional[float] = None, shortest: bool = False, uniform: bool = False):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.duration = duration
+        self.shortest = shortest
+        self.uniform = uniform
+        self.video = Track(VIDEO)
+        self.overlays: List[Track] = []
+        self.audio: List[Track] = []
+        self._index: Optional[IntervalIndex] = None
+
+    def append(self, source: str, duration: Optional[float] = None, kind: str = VIDEO,
+               in_point: float = 0.0, out_point: Optional[float] = None,
+               fade_in: float = 0.0, fade_out: float = 0.0) -> Segment:
+        """Add a clip (or a still, for `duration` seconds) at the end of the base sequence"""
+        start = self.video.segments[-1].end if self.video.segments else 0.0
+        segment = Segment(source, kind, start, in_point, out_point, duration, fade_in, fade_out)
+        self.video.segments.append(segment)
+        self._index = None
+        return segment
+
+    def add_audio(self, source: str, start: float = 0.0, in_point: float = 0.0,
+                  out_point: Optional[float] = None, fade_in: float = 0.0, fade_out: float = 0.0,
+                  volume: float = 1.0, length: Optional[float] = None, track: int = 0) -> Segment:
+        """Place audio on an audio track; all audio tracks are mixed"""
+        while len(self.audio) <= track:
+            self.audio.append(Track(AUDIO))
+        segment = Segment(source, AUDIO, start, in_point, out_point, length, fade_in, fade_out, volume)
+        self.audio[track].segments.append(segment)
+        self._index = None
+        return segment
+
+    def add_overlay(self, source: str, start: float, end: float,
+                    position: str = "W-w-20:H-h-20", track: int = 0) -> Segment:
+        """Show an image (logo, watermark, lower third) over the video between start and end"""
+        while len(self.overlays) <= track:
+            self.overlays.append(Track(IMAGE))
+        segment = Segment(source, IMAGE, start, length=end - start, position=position)
+        self.overlays[track].segments.append(segment)
+        self._index = None
+        return segment
+
+    def tracks(self) -> List[Track]:
+        return [self.video] + self.overlays + self.audio
+
+    def index(self) -> IntervalIndex:
+        if self._index is None:
+            self._index = IntervalIndex([s for track in self.tracks() for s in track.segments])
+        return self._index
+
+    def at(self, time: float) -> List[Segment]:
+        """Everything playing at `time`, on any track"""
+        return self.index().at(time)
+
+    @property
+    def content_duration(self) -> Optional[float]:
+        """Length of the base sequence, if every clip length is known"""
+        if not self.video.segments:
+            return 0.0
+        return self.video.segments[-1].end
+
+    @property
+    def output_duration(self) -> Optional[float]:
+        return self.duration or self.content_duration
+
+    def render_mode(self) -> str:
+        """The cheapest way to render this timeline in one pass"""
+        base = self.video.segments
+        if not base:
+            raise ValueError("Timeline has no video")
+        plain = not self.overlays and all(s.fade_in == 0 and s.fade_out == 0 for s in base)
+        if plain and all(s.kind == VIDEO and s.in_point == 0 for s in base) and (self.uniform or len(base) == 1):
+            return COPY
+        if plain and all(s.kind == IMAGE and s.in_point == 0 and s.duration for s in base):
+            return SLIDESHOW
+        return FILTER
+
+def _quote(path: str) -> str:
+    """A path inside a single-quoted concat script entry"""
+    return os.path.abspath(path).replace("'", "'\\''")
+
+def _concat_script(segments: List[Segment], with_durations: bool) -> str:
+    lines = []
+    for segment in segments:
+        lines.append(f"file '{_quote(segment.source)}'")
+        if with_durations:
+            lines.append(f"duration {segment.duration:.6f}")
+        elif segment.out_point is not None:
+            lines.append(f"outpoint {segment.out_point:.6f}")
+    if with_durations:
+        # The last entry's duration only applies when the file is listed once more
+        lines.append(f"file '{_quote(segments[-1].source)}'")
+    return "\n".join(lines) + "\n"
+
+def _input_args(segment: Segment) -> List[str]:
+    args = []
+    if segment.kind == IMAGE:
+        args.extend(['-loop', '1'])
+    if segment.in_point:
+        args.extend(['-ss', f"{segment.in_point:.6f}"])
+    if segment.duration is not None:
+        args.extend(['-t', f"{segment.duration:.6f}"])
+    args.extend(['-i', segment.source])
+    return args
+
+def _audio_graph(segments: List[Segment], first_input: int) -> str:
+    """Filters placing each audio segment at its start with fades and gain, mixed into [aout]"""
+    parts = []
+    labels = []
+    for offset, segment in enumerate(segments):
+        chain = ["asetpts=PTS-STARTPTS"]
+        duration = segment.duration
+        if segment.fade_in:
+            chain.append(f"afade=t=in:st=0:d={segment.fade_in:.3f}")
+        if segment.fade_out and duration:
+            chain.append(f"afade=t=out:st={max(0.0, duration - segment.fade_out):.3f}:d={segment.fade_out:.3f}")
+        if segment.volume != 1.0:
+            chain.append(f"volume={segment.volume:.3f}")
+        if segment.start:
+            chain.append(f"adelay={int(round(segment.start * 1000))}:all=1")
+        label = f"a{offset}"
+        parts.append(f"[{first_input + offset}:a:0]{','.join(chain)}[{label}]")
+        labels.append(f"[{label}]")
+    if len(labels) == 1:
+        parts[-1] = parts[-1][:-len(labels[0])] + "[aout]"
+    else:
+        parts.append(f"{''.join(labels)}amix=inputs={len(labels)}:duration=longest:normalize=0[aout]")
+    return ";".join(parts)
+
+def _simple_audio(segments: List[Segment]) -> bool:
+    """A single untouched audio file from the start, which can be mapped as is"""
+    if len(segments) != 1:
+        return False
+    s = segments[0]
+    return (not s.start and not s.in_point and s.out_point is None
+            and not s.fade_in and not s.fade_out and s.volume == 1.0)
+
+def compile_timeline(timeline: Timeline, output_path: str, script_path: str,
+                     copy_audio: bool = False) -> Dict[str, Any]:
+    """Turn a timeline into one FFmpeg command.
+
+    Returns {"mode", "cmd", "script", "duration"}: when script is not None
+    it must be written to script_path before running cmd. copy_audio lets
+    a single untouched audio track (already AAC) be stream-copied.
+    Source audio of base clips is only kept by stream-copy renders without
+    audio tracks; otherwise the audio tracks are the soundtrack.
+    """
+    mode = timeline.render_mode()
+    base = timeline.video.segments
+    audio_segments = [s for track in timeline.audio for s in track.segments]
+    cmd = [get_ffmpeg_path()]
+    script = None
+    filters = []
+    video_label = None
+
+    if mode in (COPY, SLIDESHOW):
+        if mode == COPY and len(base) == 1 and base[0].out_point is None:
+            # A single file needs no concat list
+            cmd.extend(['-i', base[0].source])
+        else:
+            script = _concat_script(base, with_durations=(mode == SLIDESHOW))
+            cmd.extend(['-f', 'concat', '-safe', '0', '-i', script_path])
+        next_input = 1
+    else:
+        w, h, fps = timeline.width, timeline.height, timeline.fps
+        for i, segment in enumerate(base):
+            if segment.kind == IMAGE:
+                cmd.extend(['-framerate', str(fps)])
+            cmd.extend(_input_args(segment))
+            chain = [f"scale={w}:{h}:force_original_aspect_ratio=decrease",
+                     f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2", "setsar=1", f"fps={fps}", "format=yuv420p",
+                     "setpts=PTS-STARTPTS"]
+            if segment.fade_in:
+                chain.append(f"fade=t=in:st=0:d={segment.fade_in:.3f}")
+            if segment.fade_out and segment.duration:
+                chain.append(f"fade=t=out:st={max(0.0, segment.duration - segment.fade_out):.3f}"
+                             f":d={segment.fade_out:.3f}")
+            filters.append(f"[{i}:v:0]{','.join(chain)}[v{i}]")
+        video_label = "base"
+        filters.append(f"{''.join(f'[v{i}]' for i in range(len(base)))}concat=n={len(base)}:v=1:a=0[{video_label}]")
+        next_input = len(base)
+        overlays = [s for track in timeline.overlays for s in track.segments]
+        for k, segment in enumerate(overlays):
+            cmd.extend(['-loop', '1', '-t', f"{segment.end:.6f}", '-i', segment.source])
+            label = f"ov{k}"
+            filters.append(f"[{video_label}][{next_input}:v:0]overlay={segment.position}:eof_action=pass"
+                           f":enable='between(t,{segment.start:.3f},{segment.end:.3f})'[{label}]")
+            video_label = label
+            next_input += 1
+
+    audio_mapped = None
+    if audio_segments:
+        if _simple_audio(audio_segments):
+            cmd.extend(['-i', audio_segments[0].source])
+            audio_mapped = f"{next_input}:a:0"
+        else:
+            for segment in audio_segments:
+                cmd.extend(_input_args(segment))
+            filters.append(_audio_graph(audio_segments, next_input))
+            audio_mapped = "[aout]"
+
+    if filters:
+        cmd.extend(['-filter_complex', ';'.join(filters)])
+
+    cmd.extend(['-map', f"[{video_label}]" if video_label else '0:v:0'])
+    if audio_mapped:
+        cmd.extend(['-map', audio_mapped])
+    elif mode == COPY:
+        cmd.extend(['-map', '0:a?'])
+
+    if mode == COPY:
+        cmd.extend(['-c:v', 'copy'])
+    else:
+        if mode == SLIDESHOW:
+            cmd.extend(['-vsync', 'vfr'])
+        cmd.extend(['-pix_fmt', 'yuv420p', '-c:v', 'libx264', '-preset', ENCODE_PRESET,
+                    '-crf', str(ENCODE_CRF)])
+    if audio_mapped:
+        copyable = copy_audio and audio_mapped != "[aout]"
+        cmd.extend(['-c:a', 'copy' if copyable else 'aac'])
+    elif mode == COPY:
+        cmd.extend(['-c:a', 'copy'])
+
+    if timeline.duration:
+        cmd.extend(['-t', str(timeline.duration)])
+    elif timeline.shortest and audio_mapped:
+        cmd.append('-shortest')
+    cmd.extend(['-movflags', '+faststart', '-y', output_path])
+
+    return {"mode": mode, "cmd": cmd, "script": script, "duration": timeline.output_duration}
@@ -0,0 +1,177 @@
+"""
+Job time estimates - per-stage durations recorded by the tasks, fitted with a small linear model
+"""
+import math
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Input size features recorded for each job type (missing values count as 0)
+FEATURES = {
+    "ai_images": ["scene_count", "voiceover_seconds", "script_bytes", "pipeline", "full_video"],
+    "video_creation": ["scene_count", "clip_seconds", "create_clips", "create_full_video"],
+    "broll": ["clip_count", "clip_seconds", "voiceover_seconds", "input_bytes"],
+}
+
+# Used until a stage has history: (intercept, {feature: seconds per unit})
+DEFAULT_STAGE_MODELS = {
+    "ai_images": {
+        "prepare": (2.0, {}),
+        "images": (5.0, {"scene_count": 12.0}),
+    },
+    "video_creation": {
+        "clips": (1.0, {"scene_count": 1.5}),
+        "video": (2.0, {"clip_seconds": 0.05}),
+    },
+    "broll": {
+        "normalize": (1.0, {"clip_seconds": 0.3}),
+        "render": (2.0, {"clip_seconds": 0.02}),
+    },
+}
+
+# Ridge penalty on standardized features; keeps fits stable with few samples
+RIDGE_LAMBDA = 1.0
+
+class StageTimer:
+    """Collects stage durations of one job; save() records them once the job has succeeded.
+
+    The clock starts when the timer is created and lap(stage) closes the
+    current stage, so the stages of a task cover it end to end. Features
+    can be filled in while the job runs, since sizes such as the voiceover
+    length are only known after the first stage.
+    """
+
+    def __init__(self, job_id: str, job_type: str, record: Callable[..., None],
+                 features: Optional[Dict[str, float]] = None):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.record = record
+        self.features = dict(features or {})
+        self.durations: Dict[str, float] = {}
+        self._lap_started = time.monotonic()
+
+    def lap(self, stage: str) -> float:
+        """End `stage` now; returns its seconds"""
+        now = time.monotonic()
+        seconds = now - self._lap_started
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        self._lap_started = now
+        return seconds
+
+    def save(self) -> None:
+        features = {name: float(self.features.get(name, 0) or 0) for name in FEATURES[self.job_type]}
+        for stage, seconds in self.durations.items():
+            try:
+                self.record(self.job_id, self.job_type, stage, seconds, features)
+            except Exception as e:
+                # Timing history is advisory; never fail a finished job over it
+                logger.warning(f"Could not record {stage} timing for job {self.job_id}: {e}")
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Gaussian elimination with partial pivoting (matrix is small and positive definite)"""
+    n = len(vector)
+    rows = [matrix[i][:] + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for i in reversed(range(n)):
+        if abs(rows[i][i]) < 1e-12:
+            continue
+        solution[i] = (rows[i][n] - sum(rows[i][j] * solution[j] for j in range(i + 1, n))) / rows[i][i]
+    return solution
+
+class LinearModel:
+    """Ordinary least squares with a light ridge penalty, on standardized features"""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.intercept = 0.0
+        self.coefficients = [0.0] * len(names)
+        self.means = [0.0] * len(names)
+        self.scales = [1.0] * len(names)
+        self.rmse = 0.0
+        self.samples = 0
+
+    def fit(self, rows: List[Dict[str, float]], targets: List[float]) -> "LinearModel":
+        n, k = len(rows), len(self.names)
+        self.samples = n
+        if not n:
+            return self
+        X = [[float(row.get(name, 0) or 0) for name in self.names] for row in rows]
+        for j in range(k):
+            column = [x[j] for x in X]
+            mean = sum(column) / n
+            variance = sum((v - mean) ** 2 for v in column) / n
+            self.means[j] = mean
+            self.scales[j] = math.sqrt(variance) or 1.0
+        Z = [[(x[j] - self.means[j]) / self.scales[j] for j in range(k)] for x in X]
+        y_mean = sum(targets) / n
+        centered = [y - y_mean for y in targets]
+
+        gram = [[sum(z[a] * z[b] for z in Z) + (RIDGE_LAMBDA if a == b else 0.0) for b in range(k)]
+                for a in range(k)]
+        moments = [sum(z[a] * t for z, t in zip(Z, centered)) for a in range(k)]
+        self.coefficients = _solve(gram, moments) if k else []
+        self.intercept = y_mean
+
+        residuals = [t - self._predict_standardized(z) for z, t in zip(Z, targets)]
+        self.rmse = math.sqrt(sum(r * r for r in residuals) / n)
+        return self
+
+    def _predict_standardized(self, z: List[float]) -> float:
+        return self.intercept + sum(c * v for c, v in zip(self.coefficients, z))
+
+    def predict(self, features: Dict[str, float]) -> float:
+        z = [(float(features.get(name, 0) or 0) - self.means[j]) / self.scales[j]
+             for j, name in enumerate(self.names)]
+        return max(0.0, self._predict_standardized(z))
+
+def _default_prediction(job_type: str, stage: str, features: Dict[str, float]) -> float:
+    intercept, slopes = DEFAULT_STAGE_MODELS[job_type].get(stage, (0.0, {}))
+    return intercept + sum(rate * float(features.get(name, 0) or 0) for name, rate in slopes.items())
+
+def estimate_processing(job_type: str, features: Dict[str, float],
+                        history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Predict each stage's seconds for a proposed job.
+
+    history holds recorded rows (stage, seconds, features) of this job type.
+    Stages with history use a fitted model; the others use the defaults.
+    """
+    if job_type not in FEATURES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    names = FEATURES[job_type]
+    by_stage: Dict[str, List[Dict[str, Any]]] = {}
+    for row in history:
+        by_stage.setdefault(row['stage'], []).append(row)
+
+    stages = {}
+    for stage in sorted(set(DEFAULT_STAGE_MODELS[job_type]) | set(by_stage)):
+        rows = by_stage.get(stage, [])
+        if rows:
+            model = LinearModel(names).fit([row['features'] for row in rows],
+                                           [row['seconds'] for row in rows])
+            stages[stage] = {"seconds": round(model.predict(features), 1),
+                             "error_seconds": round(model.rmse, 1), "samples": model.samples}
+        else:
+            stages[stage] = {"seconds": round(_default_prediction(job_type, stage, features), 1),
+                             "error_seconds": None, "samples": 0}
+    return {
+        "stages": stages,
+        "processing_seconds": round(sum(s["seconds"] for s in stages.values()), 1),
+    }
+
+def estimate_queue_wait(queued: int, running: int, average_job_seconds: float, slots: int) -> float:
+    """Seconds before a new job starts: queued jobs run in full, running ones are half done on average"""
+    slots = max(1, slots)
+    if queued + running < slots:
+        return 0.0
+    return round((queued + running * 0.5) * average_job_seconds / slots, 1)
@@ -2,18 +2,30 @@
 Enhanced video processor for B-Roll organization
 """
 import os
+import uuid
 import logging
 import random
 import subprocess
 import json
+import threading
+import contextvars
 from typing import List, Optional, Callable, Dict
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import multiprocessing
 from .ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path
+from .ffmpeg_scheduler import get_scheduler, run_ffmpeg
+from .cancellation import JobCancelled
+from .timeline import Timeline, IMAGE, compile_timeline
 
 logger = logging.getLogger(__name__)
 
+# Frame rate of clips generated from still images
+STILL_CLIP_FPS = 30
+
+# Stream parameters of the profile's own encoder output, per mezzanine profile key
+_mezzanine_references: Dict[str, Dict] = {}
+_mezzanine_references_lock = threading.Lock()
+
 class VideoProcessor:
     def __init__(self):
         self.output_dir = "processed"
@@ -26,11 +38,100 @@ class VideoProcessor:
         # In a full implementation, this would add effects and overlays
         return input_path
     
+    def render_timeline(self, timeline: Timeline, output_path: str, copy_audio: bool = False,
+                        progress_callback: Optional[Callable[[float], None]] = None) -> str:
+        """Render a timeline in one FFmpeg invocation (stream copy whenever it allows)"""
+        output_dir = Path(output_path).parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        script_path = output_dir / f"{Path(output_path).stem}.concat.txt"
+        
+        plan = compile_timeline(timeline, str(output_path), str(script_path), copy_audio=copy_audio)
+        try:
+            if plan['script'] is not None:
+                with open(script_path, 'w', encoding='utf-8') as f:
+                    f.write(plan['script'])
+            
+            logger.info(f"Running FFmpeg command ({plan['mode']}): {' '.join(plan['cmd'])}")
+            # A stream copy needs one core; an encode takes the scheduler default
+            result = run_ffmpeg(plan['cmd'], threads=1 if plan['mode'] == 'copy' else None,
+                                duration=plan['duration'], progress_callback=progress_callback)
+            if result.returncode != 0:
+                logger.error(f"FFmpeg error: {result.stderr}")
+                raise Exception(f"FFmpeg render failed: {result.stderr}")
+            return output_path
+        finally:
+            if script_path.exists():
+                script_path.unlink()
+    
+    def _encode_segment(self, input_path: str, output_path: str, start: float,
+                        duration: float, profile: Dict) -> str:
+        """Re-encode a short span of a mezzanine clip with identical stream parameters"""
+        cmd = [
+            get_ffmpeg_path(),
+            '-ss', f"{start:.6f}",  # start is a keyframe, so input seeking is exact
+            '-i', input_path,
+            '-t', f"{duration:.6f}",
+            '-map', '0:v:0',
+            '-map', '0:a?',
+            *self.mezzanine_video_args(profile),
+            '-c:a', 'aac',
+            '-b:a', profile['audio_bitrate'],
+            '-ar', str(profile['audio_rate']),
+            '-ac', '2',
+            '-video_track_timescale', str(profile['timescale']),
+            '-y',
+            output_path
+        ]
+        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
+        result = run_ffmpeg(cmd, duration=duration)
+        if result.returncode != 0:
+            logger.error(f"FFmpeg error: {result.stderr}")
+            raise Exception(f"FFmpeg segment encode failed: {result.stderr}")
+        return output_path
+    
+    def plan_smart_cut(self, clip_paths: List[str], clip_durations: List[float],
+                       target_duration: float, fps: float) -> Optional[Dict]:
+        """Locate the cut point: which clip it falls in, and the keyframe before it.
+        Returns None when the timeline is not longer than the target."""
+        from .media_probe import load_keyframe_index, previous_keyframe
+        
+        elapsed = 0.0
+        for index, clip_duration in enumerate(clip_durations):
+            if elapsed + clip_duration > target_duration:
+                local_cut = target_duration - elapsed
+                keyframe = previous_keyframe(load_keyframe_index(clip_paths[index]), local_cut)
+                return {
+                    "index": index,
+                    "local_cut": local_cut,
+                    "keyframe": keyframe,
+                    # Less than half a frame after a keyframe: a pure copy is already exact
+                    "needs_encode": local_cut - keyframe >= 0.5 / fps,
+                }
+            elapsed += clip_duration
+        return None
+    
     def concatenate_clips(self, clip_paths: List[str], output_path: str, 
                          target_duration: Optional[float] = None,
                          progress_callback: Optional[Callable] = None) -> str:
         """Concatenate multiple video clips using FFmpeg"""
-        logger.info(f"Concatenating {len(clip_paths)} clips to {output_path}")
+        return self.render_broll(clip_paths, output_path, target_duration=target_duration,
+                                 progress_callback=progress_callback)
+    
+    def render_broll(self, clip_paths: List[str], output_path: str,
+                     audio_path: Optional[str] = None,
+                     target_duration: Optional[float] = None,
+                     copy_audio: bool = False,
+                     clip_durations: Optional[List[float]] = None,
+                     smart_cut_profile: Optional[Dict] = None,
+                     progress_callback: Optional[Callable] = None) -> str:
+        """Concatenate clips, trim and mux the voiceover in a single FFmpeg invocation.
+        
+        With clip_durations and smart_cut_profile (all clips in that mezzanine profile),
+        the target_duration cut is frame accurate: the clip it falls in is stream-copied
+        up to its last keyframe and only the partial GOP after it is re-encoded.
+        """
+        logger.info(f"Rendering {len(clip_paths)} clips to {output_path}"
+                    f"{' with voiceover' if audio_path else ''}")
         
         if not clip_paths:
             raise ValueError("No clips provided")
@@ -39,94 +140,72 @@ class VideoProcessor:
         output_dir = Path(output_path).parent
         output_dir.mkdir(parents=True, exist_ok=True)
         
+        tail_path = output_dir / "smart_cut_tail.mp4"
         try:
-            # Create a file list for FFmpeg
-            file_list_path = output_dir / "clips_list.txt"
-            with open(file_list_path, 'w', encoding='utf-8') as f:
-                for clip_path in clip_paths:
-                    # Convert to absolute path to avoid relative path issues
-                    abs_clip_path = os.path.abspath(clip_path)
-                    if os.path.exists(abs_clip_path):
-                        f.write(f"file '{abs_clip_path}'\n")
-                    else:
-                        logger.warning(f"Clip not found: {abs_clip_path}")
+            # Missing clips are left out of the timeline
+            present = [i for i, clip_path in enumerate(clip_paths) if os.path.exists(clip_path)]
+            for i in range(len(clip_paths)):
+                if i not in present:
+                    logger.warning(f"Clip not found: {os.path.abspath(clip_paths[i])}")
+            if clip_durations and len(clip_durations) == len(clip_paths):
+                clip_durations = [clip_durations[i] for i in present]
+            else:
+                clip_durations = None
+            clip_paths = [clip_paths[i] for i in present]
+            if not clip_paths:
+                raise ValueError("None of the clips exist")
+            
+            # Clips from one mezzanine profile or one generator can be stream-copied together
+            timeline = Timeline(duration=target_duration, shortest=not target_duration, uniform=True)
+            lengths = clip_durations or [None] * len(clip_paths)
+            cut = None
+            if target_duration and clip_durations and smart_cut_profile:
+                cut = self.plan_smart_cut(clip_paths, clip_durations, target_duration,
+                                          smart_cut_profile['fps'])
+            if cut:
+                index, keyframe = cut['index'], cut['keyframe']
+                logger.info(f"Smart cut in clip {index + 1} at {cut['local_cut']:.3f}s "
+                            f"(keyframe {keyframe:.3f}s)")
+                # Clips after the cut point never reach the output
+                for clip_path, length in zip(clip_paths[:index], lengths):
+                    timeline.append(clip_path, length)
+                cut_clip = clip_paths[index]
+                if keyframe > 0:
+                    # Stream-copy the cut clip up to its last keyframe before the cut
+                    timeline.append(cut_clip, out_point=keyframe)
+                if cut['needs_encode']:
+                    # Re-encode only the partial GOP between that keyframe and the cut
+                    tail_length = cut['local_cut'] - keyframe
+                    self._encode_segment(cut_clip, str(tail_path), keyframe, tail_length, smart_cut_profile)
+                    timeline.append(str(tail_path), tail_length)
+                if not timeline.video.segments:
+                    raise ValueError("Target duration is shorter than one frame")
+            else:
+                for clip_path, length in zip(clip_paths, lengths):
+                    timeline.append(clip_path, length)
+            if audio_path:
+                timeline.add_audio(audio_path)
             
             if progress_callback:
                 progress_callback(25)
             
-            # Build FFmpeg command with optimizations
-            cmd = [
-                get_ffmpeg_path(),
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', str(file_list_path),
-                '-c:v', 'copy',  # Copy video stream without re-encoding
-                '-c:a', 'copy',  # Copy audio stream if present
-                '-movflags', '+faststart',  # Optimize for streaming
-                '-y',  # Overwrite output file
-                str(output_path)
-            ]
-            
-            # If target duration is specified, we'll need to process differently
-            if target_duration:
-                # First concatenate, then trim to target duration
-                temp_output = output_dir / "temp_concatenated.mp4"
-                temp_cmd = cmd.copy()
-                temp_cmd[6] = str(temp_output)  # Change output to temp file
-                
-                # Run concatenation
-                logger.info(f"Running FFmpeg command: {' '.join(temp_cmd)}")
-                result = subprocess.run(temp_cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    logger.error(f"FFmpeg error: {result.stderr}")
-                    raise Exception(f"FFmpeg concatenation failed: {result.stderr}")
-                
-                if progress_callback:
-                    progress_callback(50)
-                
-                # Now trim to target duration
-                trim_cmd = [
-                    get_ffmpeg_path(),
-                    '-i', str(temp_output),
-                    '-t', str(target_duration),
-                    '-c', 'copy',
-                    '-y',
-                    str(output_path)
-                ]
-                
-                logger.info(f"Running FFmpeg trim command: {' '.join(trim_cmd)}")
-                result = subprocess.run(trim_cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    logger.error(f"FFmpeg trim error: {result.stderr}")
-                    raise Exception(f"FFmpeg trim failed: {result.stderr}")
-                
-                # Clean up temp file
-                if temp_output.exists():
-                    temp_output.unlink()
-            else:
-                # Just concatenate without duration constraint
-                logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    logger.error(f"FFmpeg error: {result.stderr}")
-                    raise Exception(f"FFmpeg concatenation failed: {result.stderr}")
-            
-            # Clean up file list
-            if file_list_path.exists():
-                file_list_path.unlink()
+            render_progress = (lambda p: progress_callback(25 + int(p * 0.75))) if progress_callback else None
+            self.render_timeline(timeline, output_path, copy_audio=copy_audio,
+                                 progress_callback=render_progress)
             
             if progress_callback:
                 progress_callback(100)
             
-            logger.info(f"Successfully created concatenated video: {output_path}")
+            logger.info(f"Successfully rendered video: {output_path}")
             return output_path
             
         except Exception as e:
-            logger.error(f"Error concatenating clips: {e}")
+            logger.error(f"Error rendering clips: {e}")
             raise
+        finally:
+            # Clean up smart-cut tail
+            if tail_path.exists():
+                tail_path.unlink()
     
     def image_to_video(self, image_path: str, output_path: str, duration: float = 5.0) -> str:
         """Convert a single image to a video clip with specified duration"""
@@ -137,28 +216,10 @@ class VideoProcessor:
             output_dir = Path(output_path).parent
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            # Build FFmpeg command with optimizations
-            cmd = [
-                get_ffmpeg_path(),
-                '-loop', '1',  # Loop the image
-                '-i', image_path,
-                '-c:v', 'libx264',
-                '-preset', 'ultrafast',  # Fastest encoding
-                '-crf', '23',  # Good quality
-                '-t', str(duration),  # Duration in seconds
-                '-pix_fmt', 'yuv420p',
-                '-vf', 'scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2',
-                '-movflags', '+faststart',  # Optimize for streaming
-                '-y',
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg image to video failed: {result.stderr}")
+            self.encode_still_clip(
+                image_path, output_path, duration,
+                video_filter='scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2'
+            )
             
             logger.info(f"Successfully created video from image: {output_path}")
             return output_path
@@ -167,6 +228,62 @@ class VideoProcessor:
             logger.error(f"Error converting image to video: {e}")
             raise
     
+    def encode_still_clip(self, image_path: str, output_path: str, duration: float,
+                          video_filter: Optional[str] = None) -> str:
+        """Create a still-image clip whose encode cost does not grow with its duration.
+        
+        One short closed GOP of the image is encoded, then looped with stream copy
+        up to the requested duration - identical frames are never encoded twice.
+        """
+        fps = STILL_CLIP_FPS
+        unit_path = str(Path(output_path).with_suffix('.unit.mp4'))
+        
+        # 1) Encode a single one-second closed GOP of the still image
+        encode_cmd = [
+            get_ffmpeg_path(),
+            '-loop', '1',
+            '-framerate', str(fps),
+            '-i', image_path,
+        ]
+        if video_filter:
+            encode_cmd.extend(['-vf', video_filter])
+        encode_cmd.extend([
+            '-frames:v', str(fps),
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',  # Fastest encoding preset
+            '-crf', '23',  # Constant rate factor for good quality
+            '-tune', 'stillimage',
+            '-g', str(fps),
+            '-flags', '+cgop',
+            '-pix_fmt', 'yuv420p',
+            '-y',
+            unit_path
+        ])
+        
+        # 2) Extend it to the scene duration by looping the packets (no decode/encode)
+        extend_cmd = [
+            get_ffmpeg_path(),
+            '-stream_loop', '-1',
+            '-i', unit_path,
+            '-t', f"{duration:.3f}",
+            '-c', 'copy',
+            '-movflags', '+faststart',  # Optimize for streaming
+            '-y',
+            output_path
+        ]
+        
+        try:
+            # The one-second unit is tiny; the loop is a pure copy
+            for cmd in (encode_cmd, extend_cmd):
+                result = run_ffmpeg(cmd, threads=1)
+                if result.returncode != 0:
+                    logger.error(f"FFmpeg error: {result.stderr}")
+                    raise Exception(f"FFmpeg still clip creation failed: {result.stderr}")
+        finally:
+            if os.path.exists(unit_path):
+                os.remove(unit_path)
+        return output_path
+    
     def add_audio_to_video(self, video_path: str, audio_path: str, output_path: str) -> str:
         """Add audio track to video using FFmpeg"""
         logger.info(f"Adding audio {audio_path} to video {video_path}")
@@ -176,24 +293,11 @@ class VideoProcessor:
             output_dir = Path(output_path).parent
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            # Build FFmpeg command to overlay audio
-            cmd = [
-                get_ffmpeg_path(),
-                '-i', video_path,
-                '-i', audio_path,
-                '-c:v', 'copy',  # Copy video stream without re-encoding
-                '-c:a', 'aac',   # Use AAC codec for audio
-                '-shortest',     # End when shortest input ends
-                '-y',            # Overwrite output file
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                raise Exception(f"FFmpeg audio overlay failed: {result.stderr}")
+            # Video is stream-copied, audio encoded; ends with the shorter of the two
+            timeline = Timeline(shortest=True)
+            timeline.append(video_path)
+            timeline.add_audio(audio_path)
+            self.render_timeline(timeline, output_path)
             
             logger.info(f"Successfully added audio to video: {output_path}")
             return output_path
@@ -214,85 +318,74 @@ class VideoProcessor:
         clip_path = os.path.join(output_dir, f"clip_{i+1:03d}.mp4")
         duration = image_info.get('duration', 3.0)
         
-        # Use faster encoding settings
-        cmd = [
-            get_ffmpeg_path(),
-            '-loop', '1',
-            '-i', image_path,
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',  # Fastest encoding preset
-            '-crf', '23',  # Constant rate factor for good quality
-            '-t', str(duration),
-            '-pix_fmt', 'yuv420p',
-            '-movflags', '+faststart',  # Optimize for streaming
-            '-y',
-            clip_path
-        ]
-        
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                return clip_path
-            else:
-                logger.error(f"FFmpeg error creating clip {i+1}: {result.stderr}")
-                return None
+            return self.encode_still_clip(image_path, clip_path, duration)
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error creating clip {i+1}: {e}")
             return None
     
-    def images_to_clips_fast(self, image_data: List[dict], output_dir: str) -> Optional[str]:
-        """Fast method to create a single video from all images if they have the same duration"""
+    def frame_exact_durations(self, durations: List[Optional[float]], fps: int = STILL_CLIP_FPS) -> List[float]:
+        """Snap scene boundaries (not individual durations) to the frame grid.
+        
+        Rounding the cumulative end times keeps the total exact and stops error
+        from piling up; scenes within half a frame of each other end up identical,
+        and every scene keeps at least one frame.
+        """
+        frame_exact = []
+        elapsed = 0.0
+        previous_frame = 0
+        for duration in durations:
+            if duration is None or duration <= 0:
+                duration = 1.0 / fps
+            elapsed += duration
+            end_frame = max(int(round(elapsed * fps)), previous_frame + 1)
+            frame_exact.append((end_frame - previous_frame) / fps)
+            previous_frame = end_frame
+        return frame_exact
+    
+    def images_to_clips_fast(self, image_data: List[dict], output_dir: str,
+                             audio_path: Optional[str] = None,
+                             output_path: Optional[str] = None) -> Optional[str]:
+        """Create a single video from all images in one encoder pass (concat demuxer slideshow).
+        
+        Each image keeps its own duration, rounded to the frame grid. A scene whose image
+        is missing extends the previous one so the timeline stays in sync. With
+        audio_path the voiceover is muxed in the same invocation.
+        """
         if not image_data:
             return None
-            
-        # Check if all images have the same duration
-        durations = [img.get('duration', 3.0) for img in image_data]
-        if len(set(durations)) != 1:
-            # Different durations, can't use fast method
-            return None
-            
-        duration = durations[0]
-        logger.info(f"All images have same duration ({duration}s), using fast concatenation")
         
-        # Create a file list for FFmpeg
-        output_path = os.path.join(output_dir, "all_clips.mp4")
-        file_list_path = os.path.join(output_dir, "images_list.txt")
+        durations = self.frame_exact_durations([img.get('duration', 3.0) for img in image_data])
         
-        with open(file_list_path, 'w') as f:
-            for img in image_data:
-                if img.get('path') and os.path.exists(img['path']):
-                    f.write(f"file '{os.path.abspath(img['path'])}'\n")
-                    f.write(f"duration {duration}\n")
-            # Add the last image again (FFmpeg requirement)
-            if image_data and image_data[-1].get('path'):
-                f.write(f"file '{os.path.abspath(image_data[-1]['path'])}'\n")
+        # Fold scenes without an image into the preceding one
+        entries = []
+        for img, duration in zip(image_data, durations):
+            if img.get('path') and os.path.exists(img['path']):
+                entries.append([os.path.abspath(img['path']), duration])
+            elif entries:
+                entries[-1][1] += duration
+            else:
+                logger.warning(f"Image not found: {img.get('path')}")
+        if not entries:
+            return None
         
-        # Single FFmpeg command to create video from all images
-        cmd = [
-            get_ffmpeg_path(),
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', file_list_path,
-            '-vsync', 'vfr',
-            '-pix_fmt', 'yuv420p',
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',
-            '-crf', '23',
-            '-movflags', '+faststart',
-            '-y',
-            output_path
-        ]
+        logger.info(f"Creating slideshow from {len(entries)} images with per-image durations")
+        
+        output_path = output_path or os.path.join(output_dir, "all_clips.mp4")
+        timeline = Timeline()
+        for path, duration in entries:
+            timeline.append(path, duration, kind=IMAGE)
+        if audio_path:
+            timeline.add_audio(audio_path)
         
         try:
+            # Single FFmpeg command to create video from all images
             logger.info("Creating video from all images in single pass")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                # Clean up temp file
-                os.remove(file_list_path)
-                return output_path
-            else:
-                logger.error(f"FFmpeg error: {result.stderr}")
-                return None
+            return self.render_timeline(timeline, output_path)
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error in fast image concatenation: {e}")
             return None
@@ -305,15 +398,15 @@ class VideoProcessor:
         args_list = [(i, image_info, output_dir) for i, image_info in enumerate(image_data)]
         
         # Use ThreadPoolExecutor for parallel processing
-        # Limit workers to CPU count for optimal performance
-        max_workers = min(multiprocessing.cpu_count(), len(image_data))
+        # Each clip encode takes one core from the FFmpeg scheduler budget
+        max_workers = max(1, min(get_scheduler().core_budget, len(image_data)))
         logger.info(f"Using {max_workers} parallel workers")
         
         clip_paths = []
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
+            # Submit all tasks (each in a copy of this context, so job cancellation reaches them)
             future_to_index = {
-                executor.submit(self._create_single_clip, args): args[0] 
+                executor.submit(contextvars.copy_context().run, self._create_single_clip, args): args[0] 
                 for args in args_list
             }
             
@@ -324,6 +417,8 @@ class VideoProcessor:
                     clip_path = future.result()
                     if clip_path:
                         clip_paths.append((index, clip_path))
+                except JobCancelled:
+                    raise
                 except Exception as e:
                     logger.error(f"Exception creating clip {index+1}: {e}")
         
@@ -343,17 +438,12 @@ class VideoProcessor:
             output_dir = Path(output_path).parent
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            # Try fast method first if all images have same duration
-            fast_video = self.images_to_clips_fast(image_data, str(output_dir))
+            # Single pass: slideshow encode and voiceover mux in one invocation
+            fast_video = self.images_to_clips_fast(image_data, str(output_dir),
+                                                   audio_path=audio_path, output_path=output_path)
             
             if fast_video:
-                # Fast method succeeded, just add audio
-                logger.info("Using fast video creation method")
-                self.add_audio_to_video(fast_video, audio_path, output_path)
-                
-                # Clean up temp file
-                if os.path.exists(fast_video):
-                    os.remove(fast_video)
+                logger.info("Used single-pass video creation method")
             else:
                 # Fall back to parallel clip creation
                 logger.info("Using parallel clip creation method")
@@ -362,19 +452,13 @@ class VideoProcessor:
                 if not clips:
                     raise Exception("No valid clips created from images")
                 
-                # Then concatenate clips
-                temp_video = output_dir / "temp_video.mp4"
-                self.concatenate_clips(clips, str(temp_video))
-                
-                # Finally add audio
-                self.add_audio_to_video(str(temp_video), audio_path, output_path)
+                # Then concatenate clips and add audio in one pass
+                self.render_broll(clips, output_path, audio_path=audio_path)
                 
                 # Clean up temp files
                 for clip in clips:
                     if os.path.exists(clip):
                         os.remove(clip)
-                if temp_video.exists():
-                    temp_video.unlink()
             
             logger.info(f"Successfully created full video: {output_path}")
             return output_path
@@ -383,6 +467,200 @@ class VideoProcessor:
             logger.error(f"Error creating full video: {e}")
             raise
     
+    @staticmethod
+    def mezzanine_profile_key(profile: Dict) -> str:
+        """Short identifier of a mezzanine profile and its encoder settings, stored with each
+        normalized file; clips normalized under another key are normalized again"""
+        return (f"h264-{profile['width']}x{profile['height']}@{profile['fps']}"
+                f"-g{profile['gop']}-{profile['preset']}-crf{profile['crf']}"
+                f"-aac{profile['audio_rate']}-ts{profile['timescale']}-v2")
+
+    @staticmethod
+    def mezzanine_video_args(profile: Dict) -> List[str]:
+        """x264 options of every mezzanine encode (the same options give the same SPS/PPS)"""
+        return [
+            '-c:v', 'libx264',
+            '-preset', profile['preset'],
+            '-crf', str(profile['crf']),
+            '-profile:v', 'high',
+            '-pix_fmt', 'yuv420p',
+            '-g', str(profile['gop']),
+            '-keyint_min', str(profile['gop']),
+            '-sc_threshold', '0',
+            '-flags', '+cgop',
+        ]
+
+    def mezzanine_reference(self, profile: Dict) -> Dict:
+        """Stream parameters (SPS/PPS hash, level, refs) of a clip encoded with the profile.
+
+        Encoded once per process from a generated source; empty if that
+        fails, so nothing can be proven to match and every clip is encoded.
+        """
+        from .media_probe import probe_media
+
+        key = self.mezzanine_profile_key(profile)
+        with _mezzanine_references_lock:
+            if key in _mezzanine_references:
+                return _mezzanine_references[key]
+
+        reference = {}
+        reference_path = Path(self.output_dir) / f".mezzanine_reference.{uuid.uuid4().hex[:8]}.mp4"
+        cmd = [
+            get_ffmpeg_path(),
+            '-f', 'lavfi',
+            '-i', (f"color=c=black:s={profile['width']}x{profile['height']}:r={profile['fps']}"
+                   f":d={2 * profile['gop'] / profile['fps']:.3f}"),
+            *self.mezzanine_video_args(profile),
+            '-video_track_timescale', str(profile['timescale']),
+            '-y',
+            str(reference_path)
+        ]
+        try:
+            result = run_ffmpeg(cmd, threads=1)
+            if result.returncode != 0:
+                raise Exception(result.stderr)
+            probed = probe_media(str(reference_path), scan_keyframes=False)
+            if probed.get('extradata_hash'):
+                reference = {name: probed.get(name)
+                             for name in ('extradata_hash', 'video_level', 'video_refs', 'time_base')}
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not encode mezzanine reference, all clips will be re-encoded: {e}")
+        finally:
+            if reference_path.exists():
+                reference_path.unlink()
+
+        with _mezzanine_references_lock:
+            _mezzanine_references[key] = reference
+        return reference
+
+    @staticmethod
+    def has_fixed_gop(keyframes, profile: Dict) -> bool:
+        """Whether keyframes start at 0 and repeat exactly every profile['gop'] frames"""
+        if not keyframes or abs(keyframes[0]) > 0.5 / profile['fps']:
+            return False
+        interval = profile['gop'] / profile['fps']
+        return all(abs((b - a) - interval) < 0.5 / profile['fps'] for a, b in zip(keyframes, keyframes[1:]))
+
+    def plan_normalization(self, metadata: Dict, profile: Dict,
+                           input_path: Optional[str] = None) -> Dict[str, str]:
+        """Decide per stream whether a clip can be stream-copied into the mezzanine profile.
+
+        Remuxed video keeps its own SPS/PPS and GOP structure, and concatenating it
+        by stream copy next to encoded mezzanine clips only works if those are
+        identical. So video is copied only when it provably matches: same codec
+        parameters (SPS/PPS hash, level, refs) as the profile's own encoder output
+        and keyframes exactly every GOP. Anything else, or without input_path to
+        check the keyframes, is encoded.
+        """
+        from .media_probe import load_keyframe_index
+
+        fps = metadata.get('fps') or 0
+        video_ok = (
+            metadata.get('video_codec') == 'h264'
+            and (metadata.get('video_profile') or '').lower() == 'high'
+            and metadata.get('pix_fmt') == 'yuv420p'
+            and metadata.get('width') == profile['width']
+            and metadata.get('height') == profile['height']
+            and abs(fps - profile['fps']) < 0.01
+            and bool(metadata.get('extradata_hash'))
+            and input_path is not None
+        )
+        if video_ok:
+            reference = self.mezzanine_reference(profile)
+            video_ok = (
+                bool(reference)
+                and metadata.get('extradata_hash') == reference['extradata_hash']
+                and metadata.get('video_level') == reference['video_level']
+                and metadata.get('video_refs') == reference['video_refs']
+                and self.has_fixed_gop(load_keyframe_index(input_path), profile)
+            )
+
+        if not metadata.get('audio_codec'):
+            audio = 'silence'
+        elif (metadata.get('audio_codec') == 'aac'
+              and metadata.get('sample_rate') == profile['audio_rate']
+              and metadata.get('channels') == 2):
+            audio = 'copy'
+        else:
+            audio = 'encode'
+
+        return {"video": "copy" if video_ok else "encode", "audio": audio}
+
+    def normalize_clip(self, input_path: str, output_path: str, profile: Dict,
+                       metadata: Optional[Dict] = None) -> Dict[str, str]:
+        """Remux or transcode a clip once into the mezzanine profile"""
+        logger.info(f"Normalizing clip {input_path} -> {output_path}")
+
+        if metadata is None:
+            from .media_probe import probe_media
+            metadata = probe_media(input_path, scan_keyframes=False)
+        if not metadata.get('video_codec'):
+            raise ValueError(f"No video stream found in {input_path}")
+
+        plan = self.plan_normalization(metadata, profile, input_path)
+        logger.info(f"Normalization plan: video={plan['video']}, audio={plan['audio']}")
+
+        output_dir = Path(output_path).parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # Write next to the target and rename, so a half-written file is never picked up.
+        # The name is unique per run: a background ingest and a job may normalize the
+        # same clip at once, and each publishes its own complete copy.
+        temp_output = output_dir / f".{Path(output_path).stem}.{uuid.uuid4().hex[:8]}.tmp.mp4"
+
+        cmd = [get_ffmpeg_path(), '-i', input_path]
+        if plan['audio'] == 'silence':
+            cmd.extend([
+                '-f', 'lavfi',
+                '-i', f"anullsrc=channel_layout=stereo:sample_rate={profile['audio_rate']}"
+            ])
+        cmd.extend(['-map', '0:v:0', '-map', '1:a:0' if plan['audio'] == 'silence' else '0:a:0'])
+
+        if plan['video'] == 'copy':
+            cmd.extend(['-c:v', 'copy'])
+        else:
+            width, height = profile['width'], profile['height']
+            cmd.extend([
+                '-vf', (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={profile['fps']}"),
+                *self.mezzanine_video_args(profile),
+            ])
+
+        if plan['audio'] == 'copy':
+            cmd.extend(['-c:a', 'copy'])
+        else:
+            # Pad audio to the video length so every clip keeps A/V aligned after concat
+            cmd.extend([
+                '-af', 'apad',
+                '-c:a', 'aac',
+                '-b:a', profile['audio_bitrate'],
+                '-ar', str(profile['audio_rate']),
+                '-ac', '2',
+                '-shortest',
+            ])
+
+        cmd.extend([
+            '-video_track_timescale', str(profile['timescale']),
+            '-movflags', '+faststart',
+            '-y',
+            str(temp_output)
+        ])
+
+        logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
+        try:
+            result = run_ffmpeg(cmd, threads=1 if plan['video'] == 'copy' else None,
+                                duration=metadata.get('duration'))
+            if result.returncode != 0:
+                logger.error(f"FFmpeg error: {result.stderr}")
+                raise Exception(f"FFmpeg normalization failed: {result.stderr}")
+            os.replace(temp_output, output_path)
+        finally:
+            if temp_output.exists():
+                temp_output.unlink()
+        logger.info(f"Successfully normalized clip: {output_path}")
+        return plan
+
     def get_video_duration(self, video_path: str) -> float:
         """Get duration of a video file using FFmpeg"""
         logger.info(f"Getting duration for video: {video_path}")
@@ -430,7 +708,7 @@ class VideoProcessor:
                 str(thumbnail_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, threads=1)
             
             if result.returncode == 0:
                 logger.info(f"Thumbnail extracted: {thumbnail_path}")
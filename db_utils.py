@@ -25,8 +25,13 @@ async def init_db():
             file_type TEXT,
             file_path TEXT,
             size INTEGER,
-            upload_time TEXT
+            upload_time TEXT,
+            metadata TEXT,
+            normalized_path TEXT,
+            content_hash TEXT
         )""")
+        await _ensure_columns(db, "files", {"metadata": "TEXT", "normalized_path": "TEXT", "content_hash": "TEXT"})
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files (content_hash)")
         
         # Create jobs table without user_id
         await db.execute("""
@@ -41,8 +46,67 @@ async def init_db():
             job_type TEXT,
             result TEXT
         )""")
+        
+        # "latest" result pointers (one row per name instead of duplicated video files)
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS latest_results (
+            name TEXT PRIMARY KEY,
+            result_path TEXT,
+            job_id TEXT,
+            updated_at TEXT
+        )""")
+        
+        # Persistent queue of the local job executor (see local_executor.py)
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS job_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT,
+            task TEXT,
+            args TEXT,
+            status TEXT,
+            worker_pid INTEGER,
+            attempts INTEGER DEFAULT 0,
+            error TEXT,
+            enqueued_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )""")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_job_queue_status ON job_queue (status, id)")
+        
+        # Per-stage durations of finished jobs, with the input sizes they were measured at
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS stage_timings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT,
+            job_type TEXT,
+            stage TEXT,
+            seconds REAL,
+            features TEXT,
+            recorded_at TEXT
+        )""")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_stage_timings_type ON stage_timings (job_type, id)")
         await db.commit()
 
+async def _ensure_columns(db, table: str, columns: Dict[str, str]) -> None:
+    """Add columns introduced after a table was first created"""
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    for name, column_type in columns.items():
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+def _decode_file_row(row) -> Optional[Dict[str, Any]]:
+    """Convert a files row to a dict with the probe metadata decoded"""
+    if not row:
+        return None
+    record = dict(row)
+    if record.get('metadata'):
+        try:
+            record['metadata'] = json.loads(record['metadata'])
+        except (TypeError, ValueError):
+            record['metadata'] = None
+    return record
+
 # Settings CRUD (for API key storage)
 async def get_settings() -> Optional[Dict[str, Any]]:
     """Get the single settings record"""
@@ -67,13 +131,14 @@ async def update_api_key(encrypted_api_key: str) -> bool:
         return True
 
 # FILE CRUD
-async def create_file(file_id: str, filename: str, file_type: str, file_path: str, size: int, upload_time: str = None, file_metadata: Dict[str, Any] = None) -> int:
+async def create_file(file_id: str, filename: str, file_type: str, file_path: str, size: int, upload_time: str = None, file_metadata: Dict[str, Any] = None, content_hash: str = None, normalized_path: str = None) -> int:
     async with aiosqlite.connect(DB_PATH) as db:
         if upload_time is None:
             upload_time = datetime.now().isoformat()
+        metadata_json = json.dumps(file_metadata) if file_metadata else None
         await db.execute(
-            "INSERT INTO files (file_id, filename, file_type, file_path, size, upload_time) VALUES (?, ?, ?, ?, ?, ?)",
-            (file_id, filename, file_type, file_path, size, upload_time)
+            "INSERT INTO files (file_id, filename, file_type, file_path, size, upload_time, metadata, content_hash, normalized_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_id, filename, file_type, file_path, size, upload_time, metadata_json, content_hash, normalized_path)
         )
         await db.commit()
         async with db.execute("SELECT last_insert_rowid()") as cursor:
@@ -85,7 +150,26 @@ async def get_file_by_id(file_id: str) -> Optional[Dict[str, Any]]:
         db.row_factory = aiosqlite.Row
         async with db.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)) as cursor:
             row = await cursor.fetchone()
-            return dict(row) if row else None
+            return _decode_file_row(row)
+
+async def get_file_by_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """Most complete existing record for a blob (prefers rows that already carry ingest artifacts)"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            """SELECT * FROM files WHERE content_hash = ?
+               ORDER BY normalized_path IS NULL, metadata IS NULL, upload_time DESC LIMIT 1""",
+            (content_hash,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return _decode_file_row(row)
+
+async def count_files_by_hash(content_hash: str) -> int:
+    """Reference count of a blob: number of file records pointing at it"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT COUNT(*) FROM files WHERE content_hash = ?", (content_hash,)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
 
 async def get_all_files(skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
     """Get all files with pagination"""
@@ -96,7 +180,7 @@ async def get_all_files(skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
             (limit, skip)
         ) as cursor:
             rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [_decode_file_row(row) for row in rows]
 
 # JOB CRUD
 async def create_job(job_id: str, status: str, message: str, created_at: str, progress: int, result_path: str = None, job_type: str = None) -> int:
@@ -152,6 +236,51 @@ async def get_all_jobs(skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+# STAGE TIMINGS (job time estimates)
+async def get_stage_timings(job_type: str, limit: int = 500) -> List[Dict[str, Any]]:
+    """Most recent stage timings of a job type, features decoded"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(
+            "SELECT stage, seconds, features FROM stage_timings WHERE job_type = ? ORDER BY id DESC LIMIT ?",
+            (job_type, limit)
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [{"stage": row["stage"], "seconds": row["seconds"], "features": json.loads(row["features"] or "{}")}
+                    for row in rows]
+
+async def get_average_job_seconds(limit: int = 200) -> Optional[float]:
+    """Mean processing time of recently finished jobs (all types)"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute(
+            "SELECT AVG(total) FROM (SELECT SUM(seconds) AS total FROM stage_timings "
+            "GROUP BY job_id ORDER BY MAX(id) DESC LIMIT ?)",
+            (limit,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row and row[0] is not None else None
+
+async def count_jobs_by_status() -> Dict[str, int]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        async with db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status") as cursor:
+            return {status: count for status, count in await cursor.fetchall()}
+
+# LATEST RESULT POINTERS
+async def get_latest_results() -> List[Dict[str, Any]]:
+    """All "latest" result pointers"""
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute("SELECT * FROM latest_results ORDER BY updated_at DESC") as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+async def get_latest_result(name: str) -> Optional[Dict[str, Any]]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute("SELECT * FROM latest_results WHERE name = ?", (name,)) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
 # Clean up old user-related functions (kept for backward compatibility, but simplified)
 async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
     """Deprecated - returns None since we don't have users anymore"""
@@ -20,7 +20,55 @@ def get_file_by_id_sync(file_id: str) -> Optional[Dict[str, Any]]:
         conn.row_factory = dict_factory
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM files WHERE file_id = ?", (file_id,))
-        return cursor.fetchone()
+        record = cursor.fetchone()
+    if record and record.get('metadata'):
+        try:
+            record['metadata'] = json.loads(record['metadata'])
+        except (TypeError, ValueError):
+            record['metadata'] = None
+    return record
+
+def get_file_by_hash_sync(content_hash: str) -> Optional[Dict[str, Any]]:
+    """Synchronous version of get_file_by_hash"""
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = dict_factory
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT * FROM files WHERE content_hash = ?
+               ORDER BY normalized_path IS NULL, metadata IS NULL, upload_time DESC LIMIT 1""",
+            (content_hash,)
+        )
+        record = cursor.fetchone()
+    if record and record.get('metadata'):
+        try:
+            record['metadata'] = json.loads(record['metadata'])
+        except (TypeError, ValueError):
+            record['metadata'] = None
+    return record
+
+def update_file_metadata_sync(file_id: str, metadata: Dict[str, Any]) -> None:
+    """Store the probe record for a file (used to backfill rows created before probing)"""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE files SET metadata = ? WHERE file_id = ?", (json.dumps(metadata), file_id))
+        conn.commit()
+
+def update_file_normalized_sync(file_id: str, normalized_path: str, metadata: Dict[str, Any], content_hash: str = None) -> None:
+    """Record the mezzanine copy of an uploaded clip together with its updated metadata.
+    With a content hash, every record sharing the blob gets the artifact."""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        if content_hash:
+            cursor.execute(
+                "UPDATE files SET normalized_path = ?, metadata = ? WHERE content_hash = ?",
+                (normalized_path, json.dumps(metadata), content_hash)
+            )
+        else:
+            cursor.execute(
+                "UPDATE files SET normalized_path = ?, metadata = ? WHERE file_id = ?",
+                (normalized_path, json.dumps(metadata), file_id)
+            )
+        conn.commit()
 
 def get_job_by_id_sync(job_id: str) -> Optional[Dict[str, Any]]:
     """Synchronous version of get_job_by_id"""
@@ -31,17 +79,26 @@ def get_job_by_id_sync(job_id: str) -> Optional[Dict[str, Any]]:
         return cursor.fetchone()
 
 def update_job_status_sync(job_id: str, status: str, message: str = None, progress: int = None, result_path: str = None, result: Dict[str, Any] = None):
-    """Synchronous version of update_job_status"""
+    """Synchronous version of update_job_status. A cancelled job keeps its status:
+    workers still finishing their current step must not overwrite it."""
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         if result:
-            query = "UPDATE jobs SET status = ?, message = COALESCE(?, message), progress = COALESCE(?, progress), result_path = COALESCE(?, result_path), result = ? WHERE job_id = ?"
+            query = "UPDATE jobs SET status = ?, message = COALESCE(?, message), progress = COALESCE(?, progress), result_path = COALESCE(?, result_path), result = ? WHERE job_id = ? AND status != 'cancelled'"
             cursor.execute(query, (status, message, progress, result_path, json.dumps(result), job_id))
         else:
-            query = "UPDATE jobs SET status = ?, message = COALESCE(?, message), progress = COALESCE(?, progress), result_path = COALESCE(?, result_path) WHERE job_id = ?"
+            query = "UPDATE jobs SET status = ?, message = COALESCE(?, message), progress = COALESCE(?, progress), result_path = COALESCE(?, result_path) WHERE job_id = ? AND status != 'cancelled'"
             cursor.execute(query, (status, message, progress, result_path, job_id))
         conn.commit()
 
+def is_job_cancelled_sync(job_id: str) -> bool:
+    """Whether a job has been cancelled (polled by workers running it)"""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,))
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'cancelled'
+
 def create_job_sync(job_id: str, status: str, message: str, created_at: str, progress: int, result_path: str = None, job_type: str = None) -> int:
     """Synchronous version of create_job"""
     with sqlite3.connect(DB_PATH) as conn:
@@ -51,4 +108,104 @@ def create_job_sync(job_id: str, status: str, message: str, created_at: str, pro
             (job_id, status, message, created_at, progress, result_path, job_type)
         )
         conn.commit()
-        return cursor.lastrowid
\ No newline at end of file
+        return cursor.lastrowid
+
+def set_latest_result_sync(name: str, result_path: str, job_id: str = None) -> None:
+    """Point the "latest" result of a kind at a published file"""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO latest_results (name, result_path, job_id, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET
+                   result_path = excluded.result_path,
+                   job_id = excluded.job_id,
+                   updated_at = excluded.updated_at""",
+            (name, result_path, job_id, datetime.now().isoformat())
+        )
+        conn.commit()
+
+
+# Local executor queue. Connections wait for locks because API and worker processes share the file.
+QUEUE_DB_TIMEOUT = 30
+
+def enqueue_task_sync(task: str, args: List[Any], job_id: str = None, max_queued: int = 0) -> Optional[int]:
+    """Add a task to the job queue; returns its id, or None when max_queued tasks are already waiting"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        if max_queued:
+            cursor.execute("SELECT COUNT(*) FROM job_queue WHERE status = 'queued'")
+            if cursor.fetchone()[0] >= max_queued:
+                conn.rollback()
+                return None
+        cursor.execute(
+            "INSERT INTO job_queue (job_id, task, args, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, task, json.dumps(args), datetime.now().isoformat())
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+def claim_task_sync(worker_pid: int) -> Optional[Dict[str, Any]]:
+    """Atomically take the oldest queued task for a worker process"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        conn.row_factory = dict_factory
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT * FROM job_queue WHERE status = 'queued' ORDER BY id LIMIT 1")
+        task = cursor.fetchone()
+        if not task:
+            conn.rollback()
+            return None
+        cursor.execute(
+            "UPDATE job_queue SET status = 'running', worker_pid = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+            (worker_pid, datetime.now().isoformat(), task['id'])
+        )
+        conn.commit()
+    task['args'] = json.loads(task['args'] or '[]')
+    task['attempts'] += 1
+    return task
+
+def finish_task_sync(task_id: int, status: str, error: str = None) -> None:
+    """Mark a queued task done or failed"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE job_queue SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, error, datetime.now().isoformat(), task_id)
+        )
+        conn.commit()
+
+def get_running_tasks_sync() -> List[Dict[str, Any]]:
+    """Tasks a worker has claimed but not finished"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        conn.row_factory = dict_factory
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM job_queue WHERE status = 'running'")
+        return cursor.fetchall()
+
+def requeue_task_sync(task_id: int) -> None:
+    """Put a task whose worker died back at the front of the queue"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE job_queue SET status = 'queued', worker_pid = NULL, started_at = NULL WHERE id = ?",
+            (task_id,)
+        )
+        conn.commit()
+
+def get_queue_counts_sync() -> Dict[str, int]:
+    """Number of queue entries per status"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM job_queue GROUP BY status")
+        return {status: count for status, count in cursor.fetchall()}
+
+def record_stage_timing_sync(job_id: str, job_type: str, stage: str, seconds: float, features: Dict[str, float]) -> None:
+    """Store how long one stage of a finished job took, with the job's size features"""
+    with sqlite3.connect(DB_PATH, timeout=QUEUE_DB_TIMEOUT) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO stage_timings (job_id, job_type, stage, seconds, features, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, job_type, stage, seconds, json.dumps(features), datetime.now().isoformat())
+        )
+        conn.commit()
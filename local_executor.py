@@ -0,0 +1,189 @@
+"""
+Local job executor - persistent SQLite queue served by worker processes (no Redis/Celery needed)
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from db_utils_sync import (
+    enqueue_task_sync, claim_task_sync, finish_task_sync, get_running_tasks_sync,
+    requeue_task_sync, get_queue_counts_sync, update_job_status_sync, is_job_cancelled_sync
+)
+
+logger = logging.getLogger(__name__)
+
+# Queue task name -> function in tasks.py
+TASKS = {
+    "ai_images": "run_ai_images_task_sync",
+    "video_creation": "run_video_creation_task_sync",
+    "broll": "run_broll_task_sync",
+    "ingest": "run_ingest_task_sync",
+}
+
+# Seconds an idle worker waits before looking at the queue again
+POLL_INTERVAL = 0.5
+
+class QueueFull(Exception):
+    """The job queue is at its configured limit"""
+
+def resolve_task(task: str):
+    """Function in tasks.py that runs a queued task"""
+    import tasks
+    return getattr(tasks, TASKS[task])
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if os.name != 'posix':
+        # os.kill would terminate the process on Windows; treat it as gone
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def _worker_main(index: int, parent_pid: int) -> None:
+    """Worker process: claim tasks one at a time until the API process goes away"""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [worker {index}] %(levelname)s %(name)s: %(message)s")
+    # SIGTERM unwinds the running job, so its FFmpeg process group gets killed too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    pid = os.getpid()
+    logger.info(f"Local worker {index} started (pid {pid})")
+    while os.getppid() == parent_pid:
+        try:
+            task = claim_task_sync(pid)
+        except Exception as e:
+            logger.error(f"Could not claim a task: {e}")
+            task = None
+        if not task:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        if task['job_id'] and is_job_cancelled_sync(task['job_id']):
+            finish_task_sync(task['id'], "cancelled")
+            continue
+
+        logger.info(f"Running {task['task']} (queue id {task['id']}, job {task['job_id']}, attempt {task['attempts']})")
+        try:
+            resolve_task(task['task'])(*task['args'])
+            finish_task_sync(task['id'], "done")
+        except Exception as e:
+            # The task function has already marked its job failed
+            logger.error(f"Task {task['id']} failed: {e}")
+            finish_task_sync(task['id'], "failed", str(e))
+    logger.info(f"Local worker {index} exiting, API process is gone")
+
+class LocalExecutor:
+    """Runs queued jobs in a pool of worker processes, isolated from the API server.
+
+    Jobs are rows in the job_queue table, so they survive restarts: a task whose
+    worker died (crash, kill, shutdown) is put back in the queue, up to
+    max_attempts claims. enqueue() refuses new work beyond max_queued.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 50, max_attempts: int = 3):
+        self.worker_count = max(1, workers)
+        self.max_queued = max_queued
+        self.max_attempts = max(1, max_attempts)
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[Any] = []
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    @property
+    def running(self) -> bool:
+        return self._supervisor is not None and self._supervisor.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._recover()
+        self._workers = [self._spawn(i) for i in range(self.worker_count)]
+        self._supervisor = threading.Thread(target=self._supervise, name="local-executor", daemon=True)
+        self._supervisor.start()
+        logger.info(f"Local executor started with {self.worker_count} worker process(es)")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the workers; jobs they were running are resumed on the next start"""
+        self._stop.set()
+        if self._supervisor:
+            self._supervisor.join(timeout=5)
+            self._supervisor = None
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(timeout=max(0.1, deadline - time.monotonic()))
+            if worker.is_alive():
+                worker.kill()
+                worker.join()
+        self._workers = []
+        logger.info("Local executor stopped")
+
+    def enqueue(self, task: str, args: List[Any], job_id: str = None) -> int:
+        if task not in TASKS:
+            raise ValueError(f"Unknown task: {task}")
+        queue_id = enqueue_task_sync(task, args, job_id, self.max_queued)
+        if queue_id is None:
+            raise QueueFull(f"Job queue is full ({self.max_queued} jobs waiting), try again later")
+        logger.info(f"Queued {task} for job {job_id} (queue id {queue_id})")
+        return queue_id
+
+    def stats(self) -> Dict[str, Any]:
+        counts = get_queue_counts_sync()
+        return {
+            "workers": self.worker_count,
+            "workers_alive": sum(1 for w in self._workers if w.is_alive()),
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "max_queued": self.max_queued,
+        }
+
+    def _spawn(self, index: int):
+        worker = self._context.Process(target=_worker_main, args=(index, os.getpid()),
+                                       name=f"local-worker-{index}", daemon=True)
+        worker.start()
+        return worker
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(2.0):
+            for index, worker in enumerate(self._workers):
+                if not worker.is_alive() and not self._stop.is_set():
+                    logger.error(f"Local worker {index} (pid {worker.pid}) died with exit code {worker.exitcode}, restarting")
+                    self._recover()
+                    self._workers[index] = self._spawn(index)
+
+    def _recover(self) -> None:
+        """Requeue tasks claimed by processes that no longer exist"""
+        live_pids = {w.pid for w in self._workers if w.is_alive()}
+        try:
+            running = get_running_tasks_sync()
+        except Exception as e:
+            logger.error(f"Could not read job queue: {e}")
+            return
+        for task in running:
+            pid = task['worker_pid']
+            if pid in live_pids or (pid not in {w.pid for w in self._workers} and _pid_alive(pid)):
+                # Still running here, or in a worker left over from a previous API process
+                continue
+            if task['attempts'] >= self.max_attempts:
+                logger.error(f"Task {task['id']} ({task['task']}) lost its worker {task['attempts']} times, giving up")
+                finish_task_sync(task['id'], "failed", "Worker process died")
+                if task['job_id']:
+                    update_job_status_sync(task['job_id'], "failed", "Job failed: worker process died", 0)
+            else:
+                logger.warning(f"Requeueing task {task['id']} ({task['task']}) after its worker (pid {pid}) died")
+                requeue_task_sync(task['id'])
+                if task['job_id']:
+                    update_job_status_sync(task['job_id'], "pending", "Requeued after a worker restart", 0)
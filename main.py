@@ -11,7 +11,7 @@ import shutil
 import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Tuple, Union
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request, Form, Depends, status
@@ -34,12 +34,25 @@ from core.audio_processor import AudioProcessor
 from core.api_manager import APIKeyManager
 from core.openai_generator import OpenAIImageGenerator
 from core.document_processor import DocumentProcessor
+from core.media_probe import probe_media, duration_from_metadata
+from core.content_store import ContentStore
+from core.chunked_upload import ChunkedUploads, chunk_length, hash_file
+from core.multipart import MultipartParser, MultipartError, PART, DATA, END, get_boundary, parse_options_header
+from core.ffmpeg_scheduler import get_scheduler
+from core.event_loop import LoopLagMonitor, configure_pools, pool_stats, shutdown_pools, run_subprocess, run_cpu, run_io
+from core.cancellation import request_cancel
+from core.http_client import close_http_client
+from core.timing_model import FEATURES as TIMING_FEATURES, estimate_processing, estimate_queue_wait
+from core.audio_analysis import load_analysis, load_cached_analysis, downsample_peaks
 
 # Import new modules for web app
 from db_utils import init_db, create_file, get_file_by_id, create_job, get_job_by_id, update_job_status
+from db_utils import get_file_by_hash, count_files_by_hash, get_latest_results
 from db_utils import get_user_by_id
+from db_utils import get_stage_timings, get_average_job_seconds, count_jobs_by_status
 import tasks
-from celery_app import celery_app
+from celery_app import celery_app, TASK_NAMES as CELERY_TASK_NAMES
+from local_executor import LocalExecutor, QueueFull, TASKS
 
 # WebSocket for real-time job updates
 from fastapi import WebSocket, WebSocketDisconnect
@@ -63,9 +76,16 @@ async def lifespan(app: FastAPI):
     for dir_path in [settings.UPLOAD_DIR, settings.OUTPUT_DIR, settings.TEMP_DIR]:
         Path(dir_path).mkdir(parents=True, exist_ok=True)
     
+    # Report how long handlers block the event loop
+    loop_monitor.start()
+    
     # Initialize database
     await init_db()
     
+    # Worker processes for jobs (the API process only enqueues)
+    if settings.JOB_EXECUTOR == "local":
+        local_executor.start()
+    
     # Check FFmpeg installation
     from core.ffmpeg_utils import check_ffmpeg_installed, check_ffprobe_installed
     if check_ffmpeg_installed():
@@ -79,22 +99,25 @@ async def lifespan(app: FastAPI):
         logger.warning("⚠ FFprobe not found! Audio duration detection may not work")
     
     # Load API key if stored
-    api_key_file = Path("api_key.txt")
-    if api_key_file.exists():
-        try:
-            stored_key = api_key_file.read_text().strip()
-            if stored_key:
-                os.environ['OPENAI_API_KEY'] = stored_key
-                logger.info("API key loaded from file")
-        except Exception as e:
-            logger.error(f"Error loading API key: {e}")
+    try:
+        stored_key = await run_io(read_stored_api_key)
+        if stored_key:
+            os.environ['OPENAI_API_KEY'] = stored_key
+            logger.info("API key loaded from file")
+    except Exception as e:
+        logger.error(f"Error loading API key: {e}")
     
     yield
     
     # Shutdown
     logger.info("Shutting down AI Video Tool API...")
+    if local_executor.running:
+        await run_subprocess(local_executor.stop)
+    close_http_client()
     # Cleanup temp files older than 24 hours
-    cleanup_old_files()
+    await run_io(cleanup_old_files)
+    await loop_monitor.stop()
+    shutdown_pools()
 
 # Create FastAPI app
 app = FastAPI(
@@ -113,31 +136,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Set maximum request body size to 5GB
-from starlette.middleware.base import BaseHTTPMiddleware
+# Request body limits, enforced while the body arrives
 from starlette.requests import Request
 import starlette.status as starlette_status
 
-class MaxBodySizeMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_body_size: int = 5 * 1024 * 1024 * 1024):  # 5GB default
-        super().__init__(app)
-        self.max_body_size = max_body_size
+class RequestBodyTooLarge(Exception):
+    """Raised from receive() once a request body passes its limit"""
+    
+    def __init__(self, limit: int):
+        super().__init__(f"Request body larger than {limit} bytes")
+        self.limit = limit
 
-    async def dispatch(self, request: Request, call_next):
-        if request.method in ["POST", "PUT", "PATCH"]:
-            content_length = request.headers.get("content-length")
-            if content_length:
-                content_length = int(content_length)
-                if content_length > self.max_body_size:
-                    return JSONResponse(
-                        status_code=starlette_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        content={"detail": f"Request body too large. Maximum size is {self.max_body_size // (1024*1024)} MB"}
-                    )
-        response = await call_next(request)
-        return response
+class MaxBodySizeMiddleware:
+    """Pure ASGI body limit.
+    
+    A Content-Length over the limit is rejected before the app runs; other
+    bodies (chunked, or with a wrong length) are counted as they are
+    received and cut off at the limit, instead of after being spooled.
+    path_limits sets smaller limits for specific upload routes.
+    """
+    
+    def __init__(self, app, max_body_size: int = 5 * 1024 * 1024 * 1024,
+                 path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+        
+        limit = self.path_limits.get(scope["path"], self.max_body_size)
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    too_large = int(value) > limit
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await self._reject(send, limit)
+                    return
+        
+        received = 0
+        response_started = False
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestBodyTooLarge(limit)
+            return message
+        
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestBodyTooLarge:
+            if response_started:
+                raise
+            await self._reject(send, limit)
+    
+    async def _reject(self, send, limit: int):
+        response = JSONResponse(
+            status_code=starlette_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Request body too large. Maximum size is {limit // (1024*1024)} MB"}
+        )
+        await response({"type": "http"}, None, send)
 
 # Add the middleware
-app.add_middleware(MaxBodySizeMiddleware, max_body_size=5 * 1024 * 1024 * 1024)
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    max_body_size=settings.MAX_UPLOAD_SIZE,
+    path_limits={
+        "/api/upload/audio": settings.MAX_VOICEOVER_SIZE,
+        "/api/upload/video": settings.MAX_VIDEO_SIZE,
+    }
+)
 
 # Database setup
 # Removed: engine = create_async_engine(settings.DATABASE_URL, echo=True)
@@ -174,6 +255,18 @@ class CreateVideoRequest(BaseModel):
     create_clips: bool = Field(True, description="Create individual video clips from images")
     create_full_video: bool = Field(True, description="Create full video with voiceover")
 
+class EstimateRequest(BaseModel):
+    job_type: str = Field(..., description="ai_images, video_creation or broll")
+    features: Dict[str, float] = Field(
+        default={},
+        description="Input sizes, e.g. scene_count, voiceover_seconds, script_bytes, clip_count, clip_seconds, input_bytes"
+    )
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0, description="Total file size in bytes")
+    video_type: str = Field("broll", description="Type of video: 'broll' or 'intro'")
+
 class JobResponse(BaseModel):
     job_id: str
     status: str
@@ -191,6 +284,52 @@ class FileUploadResponse(BaseModel):
     size: int
     upload_time: datetime
 
+# Content-addressed upload store (uploads/blobs/<hash[:2]>/<hash>)
+content_store = ContentStore(str(Path(settings.UPLOAD_DIR) / settings.BLOB_DIR))
+# Resumable chunked uploads (uploads/sessions/<upload_id>/<index>.chunk)
+chunked_uploads = ChunkedUploads(str(Path(settings.UPLOAD_DIR) / settings.UPLOAD_SESSION_DIR))
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+UPLOAD_BUFFER_SIZE = 4 * 1024 * 1024  # upload bytes gathered per disk write (one thread hop each)
+MAX_FORM_FIELD_SIZE = 64 * 1024  # non-file fields of an upload form
+
+# Out-of-process job executor (JOB_EXECUTOR=local)
+local_executor = LocalExecutor(
+    workers=settings.LOCAL_WORKERS,
+    max_queued=settings.LOCAL_QUEUE_MAX,
+    max_attempts=settings.LOCAL_MAX_ATTEMPTS
+)
+
+# Blocking calls in handlers go to these pools (subprocess/cpu/io), never run on the loop
+configure_pools(**settings.get_blocking_pool_options())
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_WARN)
+
+async def dispatch_job(background_tasks: BackgroundTasks, task: str, *args, job_id: str = None) -> bool:
+    """Hand a job to the configured executor.
+    
+    With the local executor the API process only enqueues; a full queue fails the
+    job and answers 503. Jobs without a job_id (ingest) are optional work and are
+    skipped instead. Returns whether the job was dispatched.
+    """
+    if settings.JOB_EXECUTOR == "celery":
+        # Routed to the render or io queue; the task id is the job id, so DELETE can revoke it
+        await run_io(celery_app.send_task, CELERY_TASK_NAMES[task],
+                     args=list(args), task_id=job_id)
+        return True
+    
+    if not local_executor.running:
+        background_tasks.add_task(getattr(tasks, TASKS[task]), *args)
+        return True
+    
+    try:
+        await run_io(local_executor.enqueue, task, list(args), job_id)
+        return True
+    except QueueFull as e:
+        if not job_id:
+            logger.warning(f"Skipping {task}: {e}")
+            return False
+        await update_job_status(job_id, "failed", str(e))
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+
 # Utility functions
 def cleanup_old_files():
     """Clean up temporary files older than 24 hours"""
@@ -207,56 +346,113 @@ def cleanup_old_files():
                         logger.info(f"Cleaned up old file: {file_path}")
                     except Exception as e:
                         logger.error(f"Failed to delete {file_path}: {e}")
+    
+    # Resumable uploads nobody came back to
+    chunked_uploads.cleanup(settings.UPLOAD_SESSION_TTL)
 
-async def save_upload_file(upload_file: UploadFile, upload_type: str = "general") -> Dict[str, Any]:
-    """Save uploaded file and return file info"""
-    logger.info(f"=== save_upload_file called ===")
-    logger.info(f"Upload type: {upload_type}")
-    logger.info(f"Filename: {upload_file.filename}")
+async def save_upload_stream(request: Request, upload_type: str = "general", field: str = "file",
+                             extensions: Optional[Tuple[str, ...]] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Stream a multipart upload straight into the content-addressed store.
     
+    The body is parsed as it arrives: the file part is hashed and written to
+    the store's staging file in UPLOAD_BUFFER_SIZE writes, so it is written
+    to disk once (no spooled copy first). A filename without one of
+    `extensions` is rejected before its data is read.
+    Returns (file info, other form fields).
+    """
     try:
-        file_id = str(uuid.uuid4())
-        file_extension = Path(upload_file.filename).suffix
-        saved_filename = f"{file_id}{file_extension}"
-        file_path = Path(settings.UPLOAD_DIR) / upload_type / saved_filename
-        
-        logger.info(f"Target path: {file_path}")
-        
-        # Create type-specific directory
-        try:
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Directory created/verified: {file_path.parent}")
-        except Exception as e:
-            logger.error(f"Failed to create directory: {e}")
-            raise HTTPException(500, f"Failed to create upload directory: {e}")
+        parser = MultipartParser(get_boundary(request.headers.get("content-type")))
+    except MultipartError as e:
+        raise HTTPException(400, str(e))
+    
+    fields: Dict[str, str] = {}
+    writer = None
+    filename = None
+    current = None  # field name of the part being read ("" for the file)
+    value = bytearray()
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            for event, data in parser.feed(chunk):
+                if event == PART:
+                    _, options = parse_options_header(data.get("content-disposition", ""))
+                    if options.get("name") == field and "filename" in options and writer is None:
+                        filename = options["filename"]
+                        if extensions and not filename.lower().endswith(extensions):
+                            raise HTTPException(400, f"Unsupported file type. Allowed: {', '.join(extensions)}")
+                        logger.info(f"Receiving {upload_type} upload: {filename}")
+                        writer = content_store.new_writer()
+                        current = ""
+                    else:
+                        current = options.get("name")
+                        value.clear()
+                elif event == DATA:
+                    if current == "":
+                        pending += data
+                        if len(pending) >= UPLOAD_BUFFER_SIZE:
+                            buffer, pending = pending, bytearray()
+                            await run_io(writer.write, buffer)
+                    elif current:
+                        value += data
+                        if len(value) > MAX_FORM_FIELD_SIZE:
+                            raise HTTPException(413, f"Form field '{current}' too large")
+                elif event == END:
+                    if current == "" and pending:
+                        buffer, pending = pending, bytearray()
+                        await run_io(writer.write, buffer)
+                    elif current:
+                        fields[current] = value.decode('utf-8', errors='replace')
+                    current = None
         
-        # Save file by streaming in chunks to avoid memory issues
-        total_size = 0
-        try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                while chunk := await upload_file.read(8192):  # Read in 8KB chunks
-                    await f.write(chunk)
-                    total_size += len(chunk)
-            logger.info(f"File saved successfully, size: {total_size} bytes")
-        except Exception as e:
-            logger.error(f"Failed to save file: {e}")
-            logger.error(f"Error type: {type(e).__name__}")
-            raise HTTPException(500, f"Failed to save file: {e}")
+        if not parser.done:
+            raise HTTPException(400, "Upload ended before the multipart body was complete")
+        if writer is None:
+            raise HTTPException(400, f"No file in form field '{field}'")
         
-        return {
-            "file_id": file_id,
-            "filename": upload_file.filename,
-            "saved_path": str(file_path),
-            "file_type": upload_type,
-            "size": total_size,
-            "upload_time": datetime.now()
-        }
-    except HTTPException:
-        raise
+        # Hash while writing; identical content resolves to the existing blob
+        saved_path, content_hash, deduplicated = await run_io(writer.commit)
+        logger.info(f"File saved successfully, size: {writer.size} bytes, deduplicated: {deduplicated}")
     except Exception as e:
-        logger.error(f"Unexpected error in save_upload_file: {e}")
+        if writer:
+            writer.abort()
+        if isinstance(e, RequestBodyTooLarge):
+            raise HTTPException(413, f"Upload too large. Maximum size is {e.limit // (1024*1024)} MB")
+        if isinstance(e, MultipartError):
+            raise HTTPException(400, f"Malformed upload: {e}")
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Failed to save file: {e}")
         logger.error(f"Error type: {type(e).__name__}")
-        raise HTTPException(500, f"Unexpected error saving file: {e}")
+        raise HTTPException(500, f"Failed to save file: {e}")
+    
+    file_info = {
+        "file_id": str(uuid.uuid4()),
+        "filename": filename,
+        "saved_path": saved_path,
+        "file_type": upload_type,
+        "size": writer.size,
+        "upload_time": datetime.now(),
+        "content_hash": content_hash,
+        "deduplicated": deduplicated,
+        "holds_blob": True
+    }
+    return file_info, fields
+
+def release_upload(file_info: Optional[Dict[str, Any]]) -> None:
+    """Drop the upload's content store reference (once its file record exists, or it failed)"""
+    if file_info and file_info.pop("holds_blob", False):
+        content_store.release(file_info["content_hash"])
+
+async def discard_saved_upload(file_info: Dict[str, Any]) -> None:
+    """Remove the blob of a rejected upload unless another upload or file record references it"""
+    if not file_info.pop("holds_blob", False):
+        return
+    content_hash = file_info["content_hash"]
+    if file_info.get("deduplicated") or await count_files_by_hash(content_hash) > 0:
+        content_store.release(content_hash)
+        return
+    # Kept if an identical upload adopted the blob meanwhile (its record may not exist yet)
+    await run_io(content_store.discard, content_hash, file_info["saved_path"])
 
 # Helper function for database operations
 # Removed: async def get_db_session(): ...
@@ -275,7 +471,11 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now(),
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "ffmpeg": get_scheduler().stats(),
+        "executor": local_executor.stats() if local_executor.running else None,
+        "event_loop": loop_monitor.stats(),
+        "blocking_pools": pool_stats()
     }
 
 @app.post("/api/test-upload")
@@ -323,24 +523,25 @@ async def test_upload(
         )
 
 @app.post("/api/upload/script", response_model=FileUploadResponse)
-async def upload_script(
-    file: UploadFile = File(..., description="Script file (any text format: .txt, .docx, .pdf, .rtf, .odt, .html, .md, etc.)"),
-):
+async def upload_script(request: Request):
+    """Upload a script file (multipart field "file"; any text format: .txt, .docx, .pdf, .rtf, .odt, .html, .md, etc.)"""
     # Accept any file type - we'll attempt to extract text from it
-    logger.info(f"Uploading script file: {file.filename}")
-    
-    # Save file using streaming approach
-    file_info = await save_upload_file(file, "scripts")
+    # Stream the multipart body straight into the content store
+    file_info, _ = await save_upload_stream(request, "scripts")
     
     upload_time = datetime.now().isoformat()
-    await create_file(
-        file_id=file_info["file_id"],
-        filename=file_info["filename"],
-        file_type="script",
-        file_path=file_info["saved_path"],
-        size=file_info["size"],
-        upload_time=upload_time
-    )
+    try:
+        await create_file(
+            file_id=file_info["file_id"],
+            filename=file_info["filename"],
+            file_type="script",
+            file_path=file_info["saved_path"],
+            size=file_info["size"],
+            upload_time=upload_time,
+            content_hash=file_info["content_hash"]
+        )
+    finally:
+        release_upload(file_info)
     return FileUploadResponse(
         file_id=file_info["file_id"],
         filename=file_info["filename"],
@@ -350,72 +551,44 @@ async def upload_script(
     )
 
 @app.post("/api/upload/audio", response_model=FileUploadResponse)
-async def upload_audio(
-    file: UploadFile = File(..., description="Audio file (.mp3, .wav, .m4a)"),
-):
-    """Upload an audio file (voiceover)"""
+async def upload_audio(request: Request):
+    """Upload an audio file (voiceover; multipart field "file": .mp3, .wav, .m4a)"""
     logger.info(f"=== Audio Upload Request ===")
-    logger.info(f"Filename: {file.filename}")
-    logger.info(f"Content Type: {file.content_type}")
-    logger.info(f"File size (if available): {getattr(file, 'size', 'Unknown')}")
     
+    file_info = None
     try:
-        # Check file extension
-        if not file.filename:
-            logger.error("No filename provided")
-            raise HTTPException(400, "No filename provided")
-        
-        logger.info(f"Checking file extension for: '{file.filename}'")
-        logger.info(f"Filename type: {type(file.filename)}")
-        logger.info(f"Filename repr: {repr(file.filename)}")
-        
-        # Check extension case-insensitively
-        filename_lower = file.filename.lower()
-        if not filename_lower.endswith((".mp3", ".wav", ".m4a")):
-            logger.error(f"Rejected file with invalid extension: {file.filename}")
-            logger.error(f"Filename ends with: {file.filename[-4:]}")
-            raise HTTPException(400, "Only .mp3, .wav, and .m4a files are supported")
-        
-        # Check file size before processing (if available)
-        if hasattr(file, 'size') and file.size:
-            max_size = getattr(settings, 'MAX_VOICEOVER_SIZE', 1 * 1024 * 1024 * 1024)  # 1GB for voiceover files
-            if file.size > max_size:
-                logger.error(f"Voiceover file too large: {file.size} bytes (limit: {max_size} bytes)")
-                raise HTTPException(413, f"Voiceover file too large. Max allowed size is {max_size // (1024*1024)} MB.")
-        
-        # Save file using streaming approach
-        file_info = await save_upload_file(file, "audio")
+        # Stream the multipart body straight into the content store; the extension
+        # (case-insensitive) is checked before any audio data is written, and
+        # MaxBodySizeMiddleware stops the upload at MAX_VOICEOVER_SIZE
+        file_info, _ = await save_upload_stream(request, "audio", extensions=(".mp3", ".wav", ".m4a"))
         
         # Check size after saving (in case size wasn't available before)
         max_size = getattr(settings, 'MAX_VOICEOVER_SIZE', 1 * 1024 * 1024 * 1024)  # 1GB for voiceover files
         if file_info["size"] > max_size:
             logger.error(f"Voiceover file too large: {file_info['size']} bytes (limit: {max_size} bytes)")
             # Clean up the saved file
-            try:
-                os.remove(file_info["saved_path"])
-            except:
-                pass
+            await discard_saved_upload(file_info)
             raise HTTPException(413, f"Voiceover file too large. Max allowed size is {max_size // (1024*1024)} MB.")
         
-        audio_processor = AudioProcessor()
-        try:
-            duration = audio_processor.get_duration(file_info["saved_path"])
-            file_info["duration"] = duration
-            
-            # Check duration limit for voiceover files
-            max_duration = getattr(settings, 'MAX_VOICEOVER_DURATION', 3600)  # 60 minutes
-            if duration and duration > max_duration:
-                logger.error(f"Voiceover duration too long: {duration} seconds (limit: {max_duration} seconds)")
-                # Clean up the saved file
-                try:
-                    os.remove(file_info["saved_path"])
-                except:
-                    pass
-                raise HTTPException(413, f"Voiceover duration too long. Max allowed duration is {max_duration // 60} minutes.")
-                
-        except Exception as e:
-            logger.error(f"Failed to get audio duration: {e}")
-            file_info["duration"] = None
+        # Probe once at upload; jobs read this record instead of re-running FFprobe.
+        # Content seen before carries its probe record over.
+        existing = await get_file_by_hash(file_info["content_hash"])
+        file_metadata = existing.get("metadata") if existing else None
+        if not file_metadata:
+            try:
+                file_metadata = await run_subprocess(probe_media, file_info["saved_path"])
+            except Exception as e:
+                logger.error(f"Failed to probe audio file: {e}")
+        file_info["duration"] = duration_from_metadata(file_metadata)
+        
+        # Check duration limit for voiceover files
+        duration = file_info["duration"]
+        max_duration = getattr(settings, 'MAX_VOICEOVER_DURATION', 3600)  # 60 minutes
+        if duration and duration > max_duration:
+            logger.error(f"Voiceover duration too long: {duration} seconds (limit: {max_duration} seconds)")
+            # Clean up the saved file
+            await discard_saved_upload(file_info)
+            raise HTTPException(413, f"Voiceover duration too long. Max allowed duration is {max_duration // 60} minutes.")
         try:
             await create_file(
                 file_id=file_info["file_id"],
@@ -423,7 +596,8 @@ async def upload_audio(
                 file_type="audio",
                 file_path=file_info["saved_path"],
                 size=file_info["size"],
-                file_metadata={"duration": file_info.get("duration")}
+                file_metadata=file_metadata,
+                content_hash=file_info["content_hash"]
             )
         except Exception as db_exc:
             logger.error(f"Database error in create_file: {db_exc}")
@@ -439,74 +613,227 @@ async def upload_audio(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(500, f"Voiceover upload failed: {str(exc)} (Type: {type(exc).__name__})")
+    finally:
+        release_upload(file_info)
 
 @app.post("/api/upload/video", response_model=FileUploadResponse)
-async def upload_video(
-    file: UploadFile = File(..., description="Video file (.mp4, .avi, .mov, .mkv)"),
-    video_type: str = Form("broll", description="Type of video: 'broll' or 'intro'"),
-):
-    """Upload a video file for B-roll organization"""
+async def upload_video(request: Request, background_tasks: BackgroundTasks):
+    """Upload a video file for B-roll organization.
+    
+    Multipart fields: "file" (.mp4, .avi, .mov, .mkv) and "video_type" ('broll' or 'intro', default broll).
+    """
     try:
-        if not file.filename.endswith(('.mp4', '.avi', '.mov', '.mkv')):
-            raise HTTPException(400, "Unsupported video format")
-        
-        # Check file size before processing (if available)
-        if hasattr(file, 'size') and file.size:
-            max_size = getattr(settings, 'MAX_VIDEO_SIZE', 2 * 1024 * 1024 * 1024)  # 2GB for video files
-            if file.size > max_size:
-                logger.error(f"Video file too large: {file.size} bytes (limit: {max_size} bytes)")
-                raise HTTPException(413, f"Video file too large. Max allowed size is {max_size // (1024*1024*1024)} GB.")
-        
-        # Save file using streaming approach
-        file_info = await save_upload_file(file, f"videos/{video_type}")
-        
-        # Check size after saving (in case size wasn't available before)
-        max_size = getattr(settings, 'MAX_VIDEO_SIZE', 2 * 1024 * 1024 * 1024)  # 2GB for video files
-        if file_info["size"] > max_size:
-            logger.error(f"Video file too large: {file_info['size']} bytes (limit: {max_size} bytes)")
-            # Clean up the saved file
-            try:
-                os.remove(file_info["saved_path"])
-            except:
-                pass
-            raise HTTPException(413, f"Video file too large. Max allowed size is {max_size // (1024*1024*1024)} GB.")
-        
-        # Check video duration
-        video_processor = VideoProcessor()
+        # Stream the multipart body straight into the content store
+        # (MaxBodySizeMiddleware stops the upload at MAX_VIDEO_SIZE)
+        file_info, fields = await save_upload_stream(request, "videos", extensions=VIDEO_EXTENSIONS)
+        return await register_video_upload(file_info, fields.get("video_type") or "broll", background_tasks)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.error(f"Video upload failed: {exc}")
+        raise HTTPException(500, f"Video upload failed: {exc}")
+
+async def register_video_upload(file_info: Dict[str, Any], video_type: str,
+                                background_tasks: BackgroundTasks) -> FileUploadResponse:
+    """Checks, probe, file record and ingest for a video that is in the content store"""
+    try:
+        return await _register_video_upload(file_info, video_type, background_tasks)
+    finally:
+        release_upload(file_info)
+
+async def _register_video_upload(file_info: Dict[str, Any], video_type: str,
+                                 background_tasks: BackgroundTasks) -> FileUploadResponse:
+    file_info["file_type"] = f"videos/{video_type}"
+    # Check size after saving (in case size wasn't available before)
+    max_size = getattr(settings, 'MAX_VIDEO_SIZE', 2 * 1024 * 1024 * 1024)  # 2GB for video files
+    if file_info["size"] > max_size:
+        logger.error(f"Video file too large: {file_info['size']} bytes (limit: {max_size} bytes)")
+        # Clean up the saved file
+        await discard_saved_upload(file_info)
+        raise HTTPException(413, f"Video file too large. Max allowed size is {max_size // (1024*1024*1024)} GB.")
+    
+    # Probe once at upload (duration, codecs, resolution, keyframes).
+    # Content seen before carries its probe record and mezzanine copy over.
+    existing = await get_file_by_hash(file_info["content_hash"])
+    file_metadata = existing.get("metadata") if existing else None
+    normalized_path = existing.get("normalized_path") if existing else None
+    if not file_metadata:
         try:
-            duration = video_processor.get_duration(file_info["saved_path"])
-            file_info["duration"] = duration
-            
-            # Check duration limit for video files
-            max_duration = getattr(settings, 'MAX_VIDEO_DURATION', 3600)  # 60 minutes
-            if duration and duration > max_duration:
-                logger.error(f"Video duration too long: {duration} seconds (limit: {max_duration} seconds)")
-                # Clean up the saved file
-                try:
-                    os.remove(file_info["saved_path"])
-                except:
-                    pass
-                raise HTTPException(413, f"Video duration too long. Max allowed duration is {max_duration // 60} minutes.")
-                
+            file_metadata = await run_subprocess(probe_media, file_info["saved_path"])
         except Exception as e:
-            logger.error(f"Failed to get video duration: {e}")
-            file_info["duration"] = None
-        
-        # Store in database
-        await create_file(
-            file_id=file_info["file_id"],
-            filename=file_info["filename"],
-            file_type=f"video_{video_type}",
-            file_path=file_info["saved_path"],
-            size=file_info["size"],
-            file_metadata={"duration": file_info.get("duration")}
-        )
-        
-        return FileUploadResponse(**file_info)
+            logger.error(f"Failed to probe video file: {e}")
+    file_info["duration"] = duration_from_metadata(file_metadata)
+    
+    # Check duration limit for video files
+    duration = file_info["duration"]
+    max_duration = getattr(settings, 'MAX_VIDEO_DURATION', 3600)  # 60 minutes
+    if duration and duration > max_duration:
+        logger.error(f"Video duration too long: {duration} seconds (limit: {max_duration} seconds)")
+        # Clean up the saved file
+        await discard_saved_upload(file_info)
+        raise HTTPException(413, f"Video duration too long. Max allowed duration is {max_duration // 60} minutes.")
+    
+    # Store in database
+    await create_file(
+        file_id=file_info["file_id"],
+        filename=file_info["filename"],
+        file_type=f"video_{video_type}",
+        file_path=file_info["saved_path"],
+        size=file_info["size"],
+        file_metadata=file_metadata,
+        content_hash=file_info["content_hash"],
+        normalized_path=normalized_path
+    )
+    
+    # Normalize to the mezzanine profile in the background so B-roll jobs can stream-copy
+    if (settings.INGEST_NORMALIZE_VIDEOS and not normalized_path
+            and file_metadata and file_metadata.get("video_codec")):
+        await dispatch_job(background_tasks, "ingest", file_info["file_id"])
+    
+    return FileUploadResponse(**file_info)
+
+# Resumable chunked video uploads: create a session, PUT numbered chunks (in any
+# order, in parallel), GET the session to see which are missing, then commit.
+
+def upload_session_status(session: Dict[str, Any], missing: List[int]) -> Dict[str, Any]:
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": session["chunk_count"],
+        "missing": missing,
+        "missing_offsets": [index * session["chunk_size"] for index in missing],
+    }
+
+@app.post("/api/uploads")
+async def create_upload_session(request: UploadSessionRequest):
+    """Start a resumable video upload"""
+    if not request.filename.lower().endswith(VIDEO_EXTENSIONS):
+        raise HTTPException(400, "Unsupported video format")
+    if request.size > settings.MAX_VIDEO_SIZE:
+        raise HTTPException(413, f"Video file too large. Max allowed size is {settings.MAX_VIDEO_SIZE // (1024*1024*1024)} GB.")
+    
+    session = await run_io(
+        chunked_uploads.create, request.filename, request.size, settings.UPLOAD_CHUNK_SIZE,
+        {"video_type": request.video_type}
+    )
+    return upload_session_status(session, list(range(session["chunk_count"])))
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Which chunks the server still needs (for resuming after a dropped connection)"""
+    session = await run_io(chunked_uploads.get, upload_id)
+    if not session:
+        raise HTTPException(404, "Upload session not found")
+    missing = await run_io(chunked_uploads.missing, session)
+    return upload_session_status(session, missing)
+
+@app.put("/api/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request):
+    """Receive one chunk (raw body); sending a chunk again replaces it"""
+    session = await run_io(chunked_uploads.get, upload_id)
+    if not session:
+        raise HTTPException(404, "Upload session not found")
+    if not 0 <= index < session["chunk_count"]:
+        raise HTTPException(400, f"Chunk index out of range (0-{session['chunk_count'] - 1})")
+    
+    expected = chunk_length(session, index)
+    temp_path = chunked_uploads.chunk_temp_path(upload_id, index)
+    received = 0
+    try:
+        # Opening, closing and removing the file can block too: all of it goes through the pool
+        f = await run_io(open, temp_path, 'wb', buffering=0)
+        try:
+            pending = bytearray()
+            async for data in request.stream():
+                received += len(data)
+                if received > expected:
+                    raise HTTPException(413, f"Chunk {index} is larger than {expected} bytes")
+                pending += data
+                if len(pending) >= UPLOAD_BUFFER_SIZE:
+                    buffer, pending = pending, bytearray()
+                    await run_io(f.write, buffer)
+            if pending:
+                await run_io(f.write, pending)
+        finally:
+            await run_io(f.close)
+        if received != expected:
+            raise HTTPException(400, f"Chunk {index} has {received} bytes, expected {expected}")
+        await run_io(chunked_uploads.store_chunk, upload_id, index, temp_path)
+    except Exception as e:
+        await run_io(temp_path.unlink, missing_ok=True)
+        if isinstance(e, HTTPException):
+            raise
+        if isinstance(e, FileNotFoundError):
+            # Committed or expired while this chunk was arriving
+            raise HTTPException(409, "Upload session is no longer open")
+        logger.error(f"Failed to store chunk {index} of upload {upload_id}: {e}")
+        raise HTTPException(500, f"Failed to store chunk: {e}")
+    
+    return {"upload_id": upload_id, "index": index, "size": received}
+
+def assemble_upload(session: Dict[str, Any], claimed_dir: Path) -> Dict[str, Any]:
+    """Concatenate the chunks (copy_file_range) and move the result into the content store"""
+    staging_path = content_store.staging_path()
+    try:
+        size = chunked_uploads.assemble(session, claimed_dir, str(staging_path))
+        content_hash = hash_file(str(staging_path))
+        saved_path, content_hash, deduplicated = content_store.adopt(staging_path, content_hash, size)
+    except Exception:
+        if staging_path.exists():
+            staging_path.unlink()
+        raise
+    return {
+        "file_id": str(uuid.uuid4()),
+        "filename": session["filename"],
+        "saved_path": saved_path,
+        "size": size,
+        "upload_time": datetime.now(),
+        "content_hash": content_hash,
+        "deduplicated": deduplicated,
+        "holds_blob": True
+    }
+
+@app.post("/api/uploads/{upload_id}/commit", response_model=FileUploadResponse)
+async def commit_upload_session(upload_id: str, background_tasks: BackgroundTasks):
+    """Assemble a complete upload and register it like a regular video upload"""
+    session = await run_io(chunked_uploads.get, upload_id)
+    if not session:
+        raise HTTPException(404, "Upload session not found")
+    missing = await run_io(chunked_uploads.missing, session)
+    if missing:
+        raise HTTPException(409, f"{len(missing)} chunk(s) missing, first is {missing[0]}")
+    
+    claimed_dir = await run_io(chunked_uploads.claim, upload_id)
+    if not claimed_dir:
+        raise HTTPException(409, "Upload is already being committed")
+    try:
+        file_info = await run_cpu(assemble_upload, session, claimed_dir)
+    except Exception as e:
+        logger.error(f"Failed to assemble upload {upload_id}: {e}")
+        await run_io(chunked_uploads.release, upload_id, claimed_dir)
+        raise HTTPException(500, f"Failed to assemble upload: {e}")
+    await run_io(chunked_uploads.discard, claimed_dir)
+    
+    try:
+        return await register_video_upload(file_info, session["fields"].get("video_type") or "broll",
+                                           background_tasks)
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.error(f"Video upload failed: {exc}")
         raise HTTPException(500, f"Video upload failed: {exc}")
 
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """Abandon an upload and free its chunks"""
+    claimed_dir = await run_io(chunked_uploads.claim, upload_id)
+    if not claimed_dir:
+        raise HTTPException(404, "Upload session not found")
+    await run_io(chunked_uploads.discard, claimed_dir)
+    return {"message": "Upload cancelled"}
+
 @app.post("/api/generate/ai-images", response_model=JobResponse)
 async def generate_ai_images(
     background_tasks: BackgroundTasks,
@@ -547,7 +874,8 @@ async def generate_ai_images(
         if not script_text:
             try:
                 doc_processor = DocumentProcessor()
-                script_text = doc_processor.extract_text(script_file['file_path'])
+                script_text = await run_cpu(doc_processor.extract_text, script_file['file_path'],
+                                            Path(script_file['filename']).suffix)
                 logger.info(f"Successfully extracted text from script file using DocumentProcessor")
                 
                 if not script_text or script_text.strip() == "":
@@ -583,15 +911,17 @@ async def generate_ai_images(
         
         # Start task in background
         try:
-            # For now, run the task synchronously since Redis might not be available
-            background_tasks.add_task(
-                tasks.run_ai_images_task_sync,
+            await dispatch_job(
+                background_tasks,
+                "ai_images",
                 job_id,
                 {
                     "user_id": None,  # No user ID for public endpoints
                     "params": {
                         "script_path": script_file['file_path'],
+                        "script_filename": script_file['filename'],
                         "voice_path": voice_file['file_path'],
+                        "voice_file_id": voice_file_id,
                         "script_text": script_text,
                         "image_count": image_count,
                         "style": style,
@@ -599,8 +929,11 @@ async def generate_ai_images(
                         "voice_duration": voice_duration,
                         "export_options": export_options_dict
                     }
-                }
+                },
+                job_id=job_id
             )
+        except HTTPException:
+            raise
         except Exception as task_exc:
             logger.error(f"Task start error: {task_exc}")
             raise HTTPException(500, f"Task start error: {task_exc}")
@@ -612,10 +945,39 @@ async def generate_ai_images(
             progress=0,
             result_url=None
         )
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.error(f"Image generation request failed: {exc}")
         raise HTTPException(500, f"Image generation request failed: {exc}")
 
+@app.post("/api/estimate")
+async def estimate_job_time(request: EstimateRequest):
+    """Expected queue wait and processing time of a proposed job, learned from finished jobs"""
+    if request.job_type not in TIMING_FEATURES:
+        raise HTTPException(400, f"Unknown job type: {request.job_type}. Use one of: {', '.join(TIMING_FEATURES)}")
+    
+    try:
+        history = await get_stage_timings(request.job_type)
+        estimate = estimate_processing(request.job_type, request.features, history)
+        
+        counts = await count_jobs_by_status()
+        average_job_seconds = await get_average_job_seconds() or estimate['processing_seconds']
+        queue_wait = estimate_queue_wait(counts.get('pending', 0), counts.get('processing', 0),
+                                         average_job_seconds, settings.JOB_SLOTS or settings.LOCAL_WORKERS)
+    except Exception as e:
+        logger.error(f"Job time estimate failed: {e}")
+        raise HTTPException(500, f"Job time estimate failed: {e}")
+    
+    return {
+        "job_type": request.job_type,
+        "queue_wait_seconds": queue_wait,
+        "processing_seconds": estimate['processing_seconds'],
+        "total_seconds": round(queue_wait + estimate['processing_seconds'], 1),
+        "stages": estimate['stages'],
+        "features": {name: request.features.get(name, 0) for name in TIMING_FEATURES[request.job_type]},
+    }
+
 @app.post("/api/generate/video", response_model=JobResponse)
 async def create_video_from_images(
     request: CreateVideoRequest,
@@ -662,11 +1024,9 @@ async def create_video_from_images(
             job_type="video_creation"
         )
         
-        # Run task synchronously in background
-        import tasks
-        
-        background_tasks.add_task(
-            tasks.run_video_creation_task_sync,
+        await dispatch_job(
+            background_tasks,
+            "video_creation",
             job_id,
             {
                 "job_type": "video_creation",
@@ -677,7 +1037,8 @@ async def create_video_from_images(
                     "create_clips": request.create_clips,
                     "create_full_video": request.create_full_video
                 }
-            }
+            },
+            job_id=job_id
         )
         
         return JobResponse(
@@ -754,13 +1115,15 @@ async def organize_broll(
     )
     
     # Start task in background
-    background_tasks.add_task(
-        tasks.run_broll_task_sync,
+    await dispatch_job(
+        background_tasks,
+        "broll",
         job_id,
         {
             "user_id": None,  # No user ID for public endpoints
             "params": request.dict()
-        }
+        },
+        job_id=job_id
     )
     
     return JobResponse(
@@ -850,12 +1213,21 @@ async def cancel_job(
     if job['status'] not in ["pending", "processing"]:
         raise HTTPException(400, "Job cannot be cancelled")
     
-    # Cancel Celery task
-    celery_app.control.revoke(job_id, terminate=True)
-    
-    # Update job status
+    # Mark it cancelled first: workers in other processes poll this status,
+    # and the job's own status updates can no longer overwrite it
     await update_job_status(job_id, "cancelled", "Job cancelled by user")
     
+    # BackgroundTasks job in this process: stop it and kill its FFmpeg processes now.
+    # Local worker processes need nothing more: they skip queued jobs marked
+    # cancelled and running ones notice the status within a second.
+    if not request_cancel(job_id) and settings.JOB_EXECUTOR == "celery":
+        # Celery task that has not started yet (a broker call, so off the loop)
+        try:
+            await run_io(celery_app.control.revoke, job_id)
+        except Exception as e:
+            # The cancelled status still stops the task when a worker picks it up
+            logger.warning(f"Could not revoke Celery task {job_id}: {e}")
+    
     return {"message": "Job cancelled successfully"}
 
 @app.get("/api/files/{file_id}/content")
@@ -877,8 +1249,7 @@ async def get_file_content(file_id: str):
             raise HTTPException(404, f"File not found on disk: {file_path}")
         
         # Read file content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = await run_io(Path(file_path).read_text, encoding='utf-8')
         # Return as JSON response with proper content type
         return JSONResponse(content={"content": content, "file_id": file_id})
         
@@ -886,6 +1257,34 @@ async def get_file_content(file_id: str):
         logger.error(f"Error reading file content: {e}")
         raise HTTPException(500, f"Error reading file: {str(e)}")
 
+@app.get("/api/files/{file_id}/waveform")
+async def get_file_waveform(file_id: str, points: int = 800):
+    """Peak envelope, pauses and loudness of an audio file (analyzed once, then served from cache)"""
+    file_record = await get_file_by_id(file_id)
+    if not file_record:
+        raise HTTPException(404, "File not found")
+    
+    file_path = file_record.get('file_path')
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(404, "File not found on disk")
+    
+    points = max(1, min(points, 10000))
+    try:
+        analysis = await run_io(load_cached_analysis, file_path) or await run_subprocess(load_analysis, file_path)
+    except Exception as e:
+        logger.error(f"Error analyzing audio {file_id}: {e}")
+        raise HTTPException(500, f"Error analyzing audio: {str(e)}")
+    
+    peaks = downsample_peaks(analysis['peaks'], points)
+    return {
+        "file_id": file_id,
+        "duration": analysis['duration'],
+        "peaks": peaks,
+        "peaks_per_second": len(peaks) / analysis['duration'] if analysis['duration'] else 0,
+        "silences": analysis['silences'],
+        "loudness": analysis['loudness'],
+    }
+
 @app.get("/api/download/{job_id}/{filename}")
 async def download_result(
     job_id: str,
@@ -951,6 +1350,15 @@ async def serve_file(file_path: str):
         filename=full_path.name
     )
 
+API_KEY_FILE = "api_key.txt"
+
+def read_stored_api_key() -> Optional[str]:
+    """The API key saved by /api/settings/api-key, if any"""
+    api_key_file = Path(API_KEY_FILE)
+    if not api_key_file.exists():
+        return None
+    return api_key_file.read_text().strip() or None
+
 @app.post("/api/settings/api-key")
 async def set_api_key(
     api_key: str = Form(...),
@@ -961,8 +1369,7 @@ async def set_api_key(
         os.environ['OPENAI_API_KEY'] = api_key
         
         # Also store in a file for persistence
-        api_key_file = Path("api_key.txt")
-        api_key_file.write_text(api_key)
+        await run_io(Path(API_KEY_FILE).write_text, api_key)
         
         # Validate the API key by testing it
         api_manager = APIKeyManager()
@@ -985,50 +1392,72 @@ async def check_api_key():
         return {"status": "ok", "source": "environment"}
     
     # Check stored file
-    api_key_file = Path("api_key.txt")
-    if api_key_file.exists():
-        try:
-            stored_key = api_key_file.read_text().strip()
-            if stored_key:
-                # Load it into environment for this session
-                os.environ['OPENAI_API_KEY'] = stored_key
-                return {"status": "ok", "source": "file"}
-        except Exception as e:
-            logger.error(f"Error reading API key file: {e}")
+    try:
+        stored_key = await run_io(read_stored_api_key)
+        if stored_key:
+            # Load it into environment for this session
+            os.environ['OPENAI_API_KEY'] = stored_key
+            return {"status": "ok", "source": "file"}
+    except Exception as e:
+        logger.error(f"Error reading API key file: {e}")
     
     raise HTTPException(404, "API key not configured")
 
+def list_results(pointers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Result videos on disk plus the published "latest" pointers, newest first"""
+    results = []
+    results_dir = Path("results")
+    
+    if not results_dir.exists():
+        return results
+    
+    # Get all MP4 files in results directory
+    for file_path in results_dir.rglob("*.mp4"):
+        if file_path.is_file():
+            stat = file_path.stat()
+            
+            # Determine if this is a "latest" file
+            is_latest = file_path.name.startswith("latest_")
+            
+            # Get relative path from results directory
+            relative_path = file_path.relative_to(results_dir)
+            
+            results.append({
+                "name": file_path.name,
+                "path": str(relative_path),
+                "size": stat.st_size,
+                "modified": stat.st_mtime,
+                "isLatest": is_latest
+            })
+    
+    # "latest" entries are database pointers to published results
+    for pointer in pointers:
+        pointed = Path(pointer["result_path"])
+        if not pointed.is_file():
+            continue
+        try:
+            relative_path = pointed.resolve().relative_to(results_dir.resolve())
+        except ValueError:
+            continue
+        stat = pointed.stat()
+        results.append({
+            "name": f"latest_{pointer['name']}.mp4",
+            "path": str(relative_path),
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "isLatest": True
+        })
+    
+    # Sort by modification time (newest first)
+    results.sort(key=lambda x: x["modified"], reverse=True)
+    return results
+
 @app.get("/api/results")
 async def get_results():
     """Get all generated video results"""
     try:
-        results = []
-        results_dir = Path("results")
-        
-        if not results_dir.exists():
-            return {"results": []}
-        
-        # Get all MP4 files in results directory
-        for file_path in results_dir.rglob("*.mp4"):
-            if file_path.is_file():
-                stat = file_path.stat()
-                
-                # Determine if this is a "latest" file
-                is_latest = file_path.name.startswith("latest_")
-                
-                # Get relative path from results directory
-                relative_path = file_path.relative_to(results_dir)
-                
-                results.append({
-                    "name": file_path.name,
-                    "path": str(relative_path),
-                    "size": stat.st_size,
-                    "modified": stat.st_mtime,
-                    "isLatest": is_latest
-                })
-        
-        # Sort by modification time (newest first)
-        results.sort(key=lambda x: x["modified"], reverse=True)
+        # Directory scan and stats run in the io pool
+        results = await run_io(list_results, await get_latest_results())
         
         return {"results": results}
     except Exception as e:
@@ -3,6 +3,10 @@
 
 // Configuration
 const API_BASE_URL = window.location.hostname === 'localhost' ? 'http://localhost:8080' : '';
+// Chunk uploads in flight at once, across all files being uploaded
+const UPLOAD_CONCURRENCY = 4;
+// Rounds of re-sending missing chunks before a video upload gives up
+const UPLOAD_CHUNK_ATTEMPTS = 5;
 
 // Global state
 let uploadedFiles = {
@@ -392,55 +396,127 @@ async function handleVoiceUpload(files) {
     }
 }
 
-async function handleBrollUpload(files) {
-    for (const file of files) {
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('video_type', 'broll');
-        
-        try {
-            const response = await fetch(apiUrl('/api/upload/video'), {
-                method: 'POST',
-                body: formData
-            });
-            
-            if (response.ok) {
-                const data = await response.json();
-                uploadedFiles.brollClips.push(data);
-                updateBrollList();
-            }
-        } catch (error) {
-            console.error('Upload error:', error);
+// Runs at most `limit` of the queued tasks at a time
+function createLimiter(limit) {
+    let active = 0;
+    const queue = [];
+    const next = () => {
+        if (active >= limit || queue.length === 0) return;
+        active++;
+        const { task, resolve, reject } = queue.shift();
+        task().then(resolve, reject).finally(() => {
+            active--;
+            next();
+        });
+    };
+    return task => new Promise((resolve, reject) => {
+        queue.push({ task, resolve, reject });
+        next();
+    });
+}
+
+const uploadLimiter = createLimiter(UPLOAD_CONCURRENCY);
+
+async function uploadChunk(file, session, index) {
+    const start = index * session.chunk_size;
+    const response = await fetch(apiUrl(`/api/uploads/${session.upload_id}/chunks/${index}`), {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(start, Math.min(start + session.chunk_size, file.size))
+    });
+    if (!response.ok) {
+        throw new Error(`Chunk ${index} of ${file.name} failed with status ${response.status}`);
+    }
+}
+
+async function getUploadSession(uploadId) {
+    const response = await fetch(apiUrl(`/api/uploads/${uploadId}`));
+    return response.ok ? response.json() : null;
+}
+
+// Resumable upload: chunks go up in parallel, a dropped connection only costs the
+// chunks in flight, and a page reload picks the same file up where it stopped
+async function uploadVideoChunked(file, videoType) {
+    const resumeKey = `upload:${videoType}:${file.name}:${file.size}:${file.lastModified}`;
+    const savedId = localStorage.getItem(resumeKey);
+    let session = savedId ? await getUploadSession(savedId) : null;
+    
+    if (!session) {
+        const response = await fetch(apiUrl('/api/uploads'), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, video_type: videoType })
+        });
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || `Could not start upload of ${file.name}`);
         }
+        session = await response.json();
+        localStorage.setItem(resumeKey, session.upload_id);
     }
     
-    updateOrganizeButton();
-    showNotification(`Uploaded ${files.length} B-roll clips`, 'success');
+    let missing = session.missing;
+    for (let attempt = 0; missing.length > 0 && attempt < UPLOAD_CHUNK_ATTEMPTS; attempt++) {
+        await Promise.all(missing.map(index =>
+            uploadLimiter(() => uploadChunk(file, session, index))
+                .catch(error => console.warn('Chunk upload failed, will retry:', error))
+        ));
+        const status = await getUploadSession(session.upload_id);
+        if (!status) throw new Error(`Upload session of ${file.name} expired`);
+        missing = status.missing;
+    }
+    if (missing.length > 0) {
+        throw new Error(`${missing.length} chunks of ${file.name} could not be uploaded`);
+    }
+    
+    const response = await fetch(apiUrl(`/api/uploads/${session.upload_id}/commit`), { method: 'POST' });
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `Could not finish upload of ${file.name}`);
+    }
+    localStorage.removeItem(resumeKey);
+    return response.json();
 }
 
-async function handleIntroUpload(files) {
-    for (const file of files) {
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('video_type', 'intro');
-        
-        try {
-            const response = await fetch(apiUrl('/api/upload/video'), {
-                method: 'POST',
-                body: formData
-            });
-            
-            if (response.ok) {
-                const data = await response.json();
-                uploadedFiles.introClips.push(data);
-                updateIntroList();
-            }
-        } catch (error) {
-            console.error('Upload error:', error);
+// Uploads all files concurrently; results keep the order the files were selected in
+async function uploadVideos(files, videoType) {
+    const results = await Promise.allSettled(
+        Array.from(files).map(file => uploadVideoChunked(file, videoType))
+    );
+    const uploaded = [];
+    results.forEach(result => {
+        if (result.status === 'fulfilled') {
+            uploaded.push(result.value);
+        } else {
+            console.error('Upload error:', result.reason);
         }
+    });
+    return { uploaded, failed: results.length - uploaded.length };
+}
+
+async function handleBrollUpload(files) {
+    const { uploaded, failed } = await uploadVideos(files, 'broll');
+    uploadedFiles.brollClips.push(...uploaded);
+    updateBrollList();
+    updateOrganizeButton();
+    
+    if (failed) {
+        showNotification(`Uploaded ${uploaded.length} B-roll clips, ${failed} failed`, 'warning');
+    } else {
+        showNotification(`Uploaded ${uploaded.length} B-roll clips`, 'success');
     }
+}
+
+async function handleIntroUpload(files) {
+    const { uploaded, failed } = await uploadVideos(files, 'intro');
+    uploadedFiles.introClips.push(...uploaded);
+    updateIntroList();
     
-    showNotification(`Uploaded ${files.length} intro clips`, 'success');
+    if (failed) {
+        showNotification(`Uploaded ${uploaded.length} intro clips, ${failed} failed`, 'warning');
+    } else {
+        showNotification(`Uploaded ${uploaded.length} intro clips`, 'success');
+    }
 }
 
 async function handleBrollVoiceUpload(files) {
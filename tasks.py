@@ -5,91 +5,288 @@ Celery tasks for background processing
 import os
 import time
 import json
+import logging
+import functools
 # import asyncio  # Not needed for synchronous tasks
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
-from celery import Celery, Task
+from celery import Task
 from celery.result import AsyncResult
-import redis
 
 # Import core modules
 from core.video_processor import VideoProcessor
 from core.audio_processor import AudioProcessor
 from core.api_manager import APIKeyManager
 from core.openai_generator import OpenAIImageGenerator
+from core.scene_pipeline import ScenePipeline
 from core.document_processor import DocumentProcessor
+from core.media_probe import probe_media, duration_from_metadata
+from core.publisher import publish_file
+from core.ffmpeg_scheduler import configure_scheduler
+from core.timing_model import StageTimer
+from core.cancellation import JobCancelled, cancellation_scope, check_cancelled
 
 # Import database and WebSocket manager
 from db_utils import create_job, get_job_by_id, update_job_status, get_file_by_id
-from db_utils_sync import get_file_by_id_sync, update_job_status_sync
+from db_utils_sync import get_file_by_id_sync, update_job_status_sync, update_file_metadata_sync, update_file_normalized_sync
+from db_utils_sync import get_file_by_hash_sync, set_latest_result_sync, is_job_cancelled_sync, record_stage_timing_sync
 # Removed: from sqlalchemy.orm import Session
 # Removed: from sqlalchemy import create_engine
 from config import settings
 
-# Setup Celery
-celery_app = Celery(
-    'ai_video_tool',
-    broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
-)
+logger = logging.getLogger(__name__)
 
-# Configure Celery
-celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='UTC',
-    enable_utc=True,
-    task_track_started=True,
-    task_time_limit=3600,  # 1 hour timeout
-    task_soft_time_limit=3300,  # 55 minutes soft timeout
-)
+# Share one core budget between every FFmpeg process started from this process
+configure_scheduler(**settings.get_ffmpeg_scheduler_options())
+
+# Celery app, queues and routing are configured in celery_app.py
+from celery_app import celery_app
 
 # Database engine for sync operations in Celery
 # Removed: engine = create_engine(settings.DATABASE_URL.replace("sqlite+aiosqlite", "sqlite"))
 
-# Redis client for pub/sub
-try:
-    redis_client = redis.from_url(settings.REDIS_URL)
-except:
-    redis_client = None
+def run_cancellable(job_id: str, func, *args, **kwargs):
+    """Call func inside a cancellation scope for job_id.
+    
+    DELETE /api/jobs cancels the token directly when the job runs in this process;
+    otherwise the token notices the 'cancelled' status in the database within a second.
+    """
+    with cancellation_scope(job_id, poll=is_job_cancelled_sync):
+        try:
+            return func(*args, **kwargs)
+        except JobCancelled:
+            logger.info(f"Job {job_id} stopped after cancellation")
+            return {"status": "cancelled", "job_id": job_id}
+
+def cancellable_job(func):
+    """Decorator for job functions that take job_id as their first argument"""
+    @functools.wraps(func)
+    def wrapper(job_id: str, *args, **kwargs):
+        return run_cancellable(job_id, func, job_id, *args, **kwargs)
+    return wrapper
 
 class CallbackTask(Task):
-    """Base task with callbacks for progress updates"""
+    """Base task for jobs: runs each call inside the job's cancellation scope.
     
-    def __init__(self):
-        self.job_id = None
+    Celery keeps one instance per task for the whole worker, shared by every
+    thread of a -P threads pool, so nothing about the running job is stored on it.
+    """
     
-    def update_progress(self, progress: int, message: str = ""):
-        """Update job progress in database and notify via WebSocket"""
-        if not self.job_id:
-            return
-        
-        # Update job status in database
+    def __call__(self, *args, **kwargs):
+        # Every task of this kind takes job_id as its first argument
+        job_id = args[0] if args else kwargs.get('job_id')
+        return run_cancellable(job_id, super().__call__, *args, **kwargs)
+
+def get_media_duration(file_record: Dict[str, Any] = None, media_path: str = None) -> float:
+    """Duration from the probe record stored at upload; probes (and backfills) only for older rows"""
+    duration = duration_from_metadata(file_record.get('metadata') if file_record else None)
+    if duration:
+        return duration
+    
+    media_path = media_path or (file_record or {}).get('file_path')
+    if not media_path:
+        return 0.0
+    try:
+        metadata = probe_media(media_path)
+    except Exception as e:
+        logger.error(f"Failed to probe {media_path}: {e}")
+        return 0.0
+    if file_record and file_record.get('file_id'):
         try:
-            update_job_status_sync(
-                job_id=self.job_id,
-                status="processing",
-                message=message,
-                progress=progress
-            )
+            update_file_metadata_sync(file_record['file_id'], metadata)
         except Exception as e:
-            # Log error but don't fail the task
-            print(f"Failed to update job status in database: {e}")
-        
-        # Publish update to Redis for WebSocket
-        if redis_client:
-            update_data = {
-                "job_id": self.job_id,
-                "progress": progress,
-                "message": message,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            redis_client.publish("job_updates", json.dumps(update_data))
+            logger.warning(f"Could not backfill probe record for {file_record['file_id']}: {e}")
+    return duration_from_metadata(metadata) or 0.0
+
+def voiceover_silences(audio_proc: AudioProcessor, voice_path: str) -> List[List[float]]:
+    """Pauses in the voiceover for placing scene changes (empty when disabled or analysis fails)"""
+    if not settings.AUDIO_SNAP_TO_SILENCE:
+        return []
+    try:
+        return audio_proc.analyze(voice_path).get('silences') or []
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.warning(f"Audio analysis failed for {voice_path}, using evenly spaced scenes: {e}")
+        return []
+
+def is_aac_audio(file_record: Dict[str, Any] = None) -> bool:
+    """Whether a stored audio track can be muxed into MP4 without re-encoding"""
+    metadata = (file_record or {}).get('metadata') or {}
+    return metadata.get('audio_codec') == 'aac'
+
+def ensure_normalized_clip(file_record: Dict[str, Any], video_proc: VideoProcessor = None) -> str:
+    """Path of the mezzanine copy of an uploaded clip, normalizing it now if ingest has not run yet"""
+    if not settings.INGEST_NORMALIZE_VIDEOS:
+        return file_record['file_path']
+    
+    profile = settings.get_mezzanine_profile()
+    profile_key = VideoProcessor.mezzanine_profile_key(profile)
+    content_hash = file_record.get('content_hash')
+    
+    def _valid(record):
+        path = record.get('normalized_path') if record else None
+        return (path and os.path.exists(path)
+                and ((record.get('metadata') or {}).get('mezzanine') or {}).get('profile_key') == profile_key)
+    
+    if _valid(file_record):
+        return file_record['normalized_path']
+    
+    # Another upload of the same content may already have been ingested
+    if content_hash:
+        sibling = get_file_by_hash_sync(content_hash)
+        if _valid(sibling):
+            file_record['normalized_path'] = sibling['normalized_path']
+            file_record['metadata'] = sibling['metadata']
+            update_file_normalized_sync(file_record['file_id'], sibling['normalized_path'], sibling['metadata'])
+            return sibling['normalized_path']
+    
+    metadata = file_record.get('metadata') or {}
+    video_proc = video_proc or VideoProcessor()
+    try:
+        if not metadata.get('video_codec'):
+            metadata = probe_media(file_record['file_path'])
+        
+        # Artifacts are keyed by content, so every file_id sharing the blob reuses them
+        artifact_key = content_hash or file_record['file_id']
+        normalized_path = str(Path(settings.UPLOAD_DIR) / settings.NORMALIZED_DIR / f"{artifact_key}.mp4")
+        plan = video_proc.normalize_clip(file_record['file_path'], normalized_path, profile, metadata)
+        
+        mezzanine = probe_media(normalized_path)
+        mezzanine.update({"profile_key": profile_key, "plan": plan})
+        metadata['mezzanine'] = mezzanine
+        update_file_normalized_sync(file_record['file_id'], normalized_path, metadata, content_hash)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Could not normalize clip {file_record.get('file_id')}, using original: {e}")
+        return file_record['file_path']
+    
+    file_record['normalized_path'] = normalized_path
+    file_record['metadata'] = metadata
+    return normalized_path
+
+def smart_cut_options(clip_records: List[Dict[str, Any]], clip_paths: List[str]) -> Dict[str, Any]:
+    """render_broll arguments for a frame-accurate trim.
+    
+    Only possible when every clip is a mezzanine copy whose video was encoded
+    with the profile: the re-encoded tail is stream-copied next to their GOPs.
+    """
+    if not settings.SMART_CUT_ENABLED:
+        return {}
+    
+    durations = []
+    for record, path in zip(clip_records, clip_paths):
+        mezzanine = (record.get('metadata') or {}).get('mezzanine') or {}
+        duration = duration_from_metadata(mezzanine)
+        if path != record.get('normalized_path') or not duration:
+            return {}
+        if (mezzanine.get('plan') or {}).get('video') != 'encode':
+            return {}
+        durations.append(duration)
+    return {"clip_durations": durations, "smart_cut_profile": settings.get_mezzanine_profile()}
+
+def broll_features(clip_records: List[Dict[str, Any]], voice_record: Dict[str, Any] = None) -> Dict[str, float]:
+    """Size features of a B-roll job for the timing model (from stored probe records)"""
+    return {
+        "clip_count": len(clip_records),
+        "clip_seconds": sum(get_media_duration(record) for record in clip_records),
+        "voiceover_seconds": get_media_duration(voice_record) if voice_record else 0.0,
+        "input_bytes": sum(record.get('size') or 0 for record in clip_records),
+    }
+
+def generate_scene_images(openai_gen: OpenAIImageGenerator, script_segments: List[str],
+                          timestamps: List[float], duration: float, character_desc: str,
+                          style: str, output_dir: str, progress_callback=None,
+                          on_image=None) -> List[Dict[str, Any]]:
+    """Generate every scene image concurrently; returns image entries (path, timestamp, duration, cached) in scene order"""
+    scenes = [
+        {
+            "prompt": openai_gen.create_scene_prompt(segment, character_desc, style, scene_number=i+1),
+            "filename": f"scene_{i+1:03d}",
+        }
+        for i, (segment, _) in enumerate(zip(script_segments, timestamps))
+    ]
+    paths = openai_gen.generate_images(scenes, output_dir, style, progress_callback, on_image)
+    
+    generated_images = []
+    for i, image_path in enumerate(paths):
+        if not image_path:
+            continue
+        timestamp = timestamps[i]
+        generated_images.append({
+            'path': image_path,
+            'timestamp': timestamp,
+            'duration': timestamps[i+1] - timestamp if i < len(timestamps)-1 else duration - timestamp,
+            'cached': image_path in openai_gen.cache_hits
+        })
+    return generated_images
+
+def generate_scenes_pipelined(job_id: str, openai_gen: OpenAIImageGenerator, video_proc: VideoProcessor,
+                              script_segments: List[str], timestamps: List[float], duration: float,
+                              character_desc: str, style: str, output_dir: Path, voice_path: str,
+                              full_video: bool, progress_callback) -> Dict[str, Any]:
+    """Generate scene images and encode each one's clip as soon as it lands.
+    
+    Clip N encodes while image N+1 is still being generated, and the concat and
+    voiceover mux (stream copy) start as soon as the last clip is done.
+    Finished clips are published in the job result while the job runs.
+    progress_callback(progress, message) reports 20-95%.
+    Returns image entries, clip paths and the final video path.
+    """
+    clips_dir = output_dir / 'clips'
+    scene_count = len(script_segments)
+    durations = [
+        (timestamps[i+1] if i < len(timestamps)-1 else duration) - timestamps[i]
+        for i in range(scene_count)
+    ]
+    
+    def publish_clips(ready):
+        # Partial result: clips that can be previewed before the job finishes
+        update_job_status_sync(job_id, "processing", result={
+            "scene_clips": [f"{job_id}/clips/{Path(ready[i]).name}" for i in sorted(ready)],
+            "clips_ready": len(ready),
+            "scene_count": scene_count,
+        })
+    
+    with ScenePipeline(video_proc, str(clips_dir), durations, on_clip=publish_clips) as pipeline:
+        def image_progress(done, total):
+            progress_callback(20 + int(done / total * 60),
+                              f"Generated image {done} of {total}, {len(pipeline.ready)} clips encoded...")
+        
+        generated_images = generate_scene_images(
+            openai_gen, script_segments, timestamps, duration, character_desc, style,
+            str(output_dir), image_progress, on_image=pipeline.add_image
+        )
+        check_cancelled()
+        progress_callback(80, "Encoding remaining clips...")
+        clip_paths = pipeline.finish()
+    
+    video_path = None
+    if full_video:
+        check_cancelled()
+        progress_callback(85, "Muxing clips with voiceover...")
+        video_path = str(output_dir / 'final_video_with_audio.mp4')
+        video_proc.render_broll(clip_paths, video_path, audio_path=voice_path,
+                                clip_durations=pipeline.durations)
+    return {"images": generated_images, "clips": clip_paths, "video": video_path}
+
+def run_ingest_task_sync(file_id: str):
+    """Background ingest: normalize an uploaded clip to the mezzanine profile once"""
+    file_record = get_file_by_id_sync(file_id)
+    if not file_record:
+        logger.warning(f"Ingest skipped, file {file_id} not found")
+        return None
+    
+    start_time = time.time()
+    normalized_path = ensure_normalized_clip(file_record)
+    logger.info(f"Ingest of {file_id} finished in {time.time() - start_time:.1f}s: {normalized_path}")
+    return normalized_path
 
 # Synchronous task functions (no Redis required)
+@cancellable_job
 def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
     """Synchronous AI image generation task"""
     try:
@@ -101,6 +298,8 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
             progress=5
         )
         
+        timer = StageTimer(job_id, "ai_images", record_stage_timing_sync)
+        
         # Extract parameters
         params = job_data['params']
         script_path = params['script_path']
@@ -122,7 +321,7 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
         if not api_key:
             raise Exception("OpenAI API key not configured")
         
-        openai_gen = OpenAIImageGenerator(api_key)
+        openai_gen = OpenAIImageGenerator(api_key, **settings.get_image_generator_options())
         audio_proc = AudioProcessor()
         video_proc = VideoProcessor()
         
@@ -130,7 +329,7 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
         update_job_status_sync(job_id, "processing", "Reading script file...", 15)
         doc_processor = DocumentProcessor()
         try:
-            script_text = doc_processor.extract_text(script_path)
+            script_text = doc_processor.extract_text(script_path, Path(params.get('script_filename') or script_path).suffix)
             if not script_text or script_text.strip() == "":
                 script_text = params.get('script_text', 'Generate images based on the uploaded content.')
         except Exception as e:
@@ -139,48 +338,43 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
         
         # Get audio duration and timestamps
         update_job_status_sync(job_id, "processing", "Analyzing voiceover duration...", 20)
-        duration = audio_proc.get_duration(voice_path)
-        timestamps = audio_proc.generate_timestamps(duration, image_count)
+        voice_record = get_file_by_id_sync(params['voice_file_id']) if params.get('voice_file_id') else None
+        duration = get_media_duration(voice_record, voice_path)
+        timestamps = audio_proc.generate_timestamps(duration, image_count,
+                                                    voiceover_silences(audio_proc, voice_path))
         
         # Split script into segments
         script_segments = split_script(script_text, image_count)
         
-        # Generate images
-        generated_images = []
+        pipelined = export_options.get('pipeline', settings.AI_PIPELINE_DEFAULT)
+        timer.features.update(
+            scene_count=image_count, voiceover_seconds=duration, script_bytes=len(script_text.encode('utf-8')),
+            pipeline=int(bool(pipelined)), full_video=int(bool(pipelined and export_options.get('full_video', False)))
+        )
+        timer.lap("prepare")
         
-        for i, (segment, timestamp) in enumerate(zip(script_segments, timestamps)):
-            # More granular progress calculation
-            progress = 20 + int(((i + 0.5) / image_count) * 60)  # 20-80% for image generation
-            update_job_status_sync(job_id, "processing", f"Generating image {i+1} of {image_count}...", progress)
-            
-            # Create prompt
-            prompt = openai_gen.create_scene_prompt(
-                segment, 
-                character_desc, 
-                style,
-                scene_number=i+1
+        # Generate images concurrently (bounded in-flight requests, shared rate limits)
+        update_job_status_sync(job_id, "processing", f"Generating {image_count} images...", 20)
+        
+        if pipelined:
+            # Encode clips while images are still generating
+            scene_output = generate_scenes_pipelined(
+                job_id, openai_gen, video_proc, script_segments, timestamps, duration,
+                character_desc, style, output_dir, voice_path, export_options.get('full_video', False),
+                lambda progress, message: update_job_status_sync(job_id, "processing", message, progress)
             )
+            generated_images = scene_output['images']
+        else:
+            def image_progress(done, total):
+                update_job_status_sync(job_id, "processing", f"Generated image {done} of {total}...",
+                                       20 + int(done / total * 60))  # 20-80% for image generation
             
-            # Generate image
-            start_time = time.time()
-            try:
-                image_path = openai_gen.generate_and_save_image(
-                    prompt, 
-                    str(output_dir),
-                    f"scene_{i+1:03d}",
-                    style
-                )
-                generation_time = time.time() - start_time
-                
-                generated_images.append({
-                    'path': image_path,
-                    'timestamp': timestamp,
-                    'duration': timestamps[i+1] - timestamp if i < len(timestamps)-1 else duration - timestamp
-                })
-                
-            except Exception as e:
-                update_job_status_sync(job_id, "processing", f"Failed to generate image {i+1}: {str(e)}", progress)
-                continue
+            generated_images = generate_scene_images(
+                openai_gen, script_segments, timestamps, duration,
+                character_desc, style, str(output_dir), image_progress
+            )
+        
+        timer.lap("images")
         
         # Save metadata
         metadata_path = output_dir / 'generation_metadata.json'
@@ -195,8 +389,12 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
                 'job_id': job_id
             }, f, indent=2)
         
-        # Store results - only images for now
+        # Store results - images, plus clips and video when pipelined
         results = {'images': str(output_dir)}
+        if pipelined:
+            results['clips'] = str(output_dir / 'clips')
+            if scene_output['video']:
+                results['video'] = scene_output['video']
         
         # Prepare result data with image paths relative to output directory
         image_filenames = []
@@ -210,10 +408,17 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
             "script_text": script_text,
             "output_dir": str(output_dir),
             "image_count": len(generated_images),
+            "cache_hits": sum(1 for img in generated_images if img['cached']),
             "style": style,
             "character_description": character_desc
         }
         
+        if pipelined:
+            result_data['scene_clips'] = [f"{job_id}/clips/{Path(clip).name}" for clip in scene_output['clips']]
+            result_data['clips'] = results['clips']
+            if 'video' in results:
+                result_data['video'] = results['video']
+        
         # Update progress to 95% before final updates
         update_job_status_sync(job_id, "processing", "Finalizing results...", 95)
         
@@ -221,6 +426,7 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
         time.sleep(0.5)
         
         # Update job as completed with result data
+        timer.save()
         update_job_status_sync(job_id, "completed", "AI image generation completed!", 100, str(output_dir), result_data)
         
         return {
@@ -238,6 +444,7 @@ def run_ai_images_task_sync(job_id: str, job_data: Dict[str, Any]):
         update_job_status_sync(job_id, "failed", f"Error: {str(e)}", 0)
         raise
 
+@cancellable_job
 def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
     """Synchronous task to create video from previously generated images"""
     try:
@@ -249,6 +456,8 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
             progress=5
         )
         
+        timer = StageTimer(job_id, "video_creation", record_stage_timing_sync)
+        
         # Extract parameters
         params = job_data['params']
         original_result = params['original_result']
@@ -269,6 +478,10 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
         
         generated_images = metadata['images']
         voice_path = metadata['voice_path']
+        timer.features.update(
+            scene_count=len(generated_images), clip_seconds=sum(img.get('duration', 0) for img in generated_images),
+            create_clips=int(bool(create_clips)), create_full_video=int(bool(create_full_video))
+        )
         
         # Initialize processors
         update_job_status_sync(job_id, "processing", "Preparing video processors...", 10)
@@ -300,8 +513,11 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
                 else:
                     logger.warning("No clips were created")
         
+        timer.lap("clips")
+        
         # Create full video if requested
         if create_full_video:
+            check_cancelled()
             update_job_status_sync(job_id, "processing", "Creating full video with voiceover...", 75)
             final_video_path = output_dir / 'final_video_with_audio.mp4'
             video_proc.create_full_video(
@@ -313,6 +529,7 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
             
             # Update progress
             update_job_status_sync(job_id, "processing", "Finalizing video...", 90)
+        timer.lap("video")
         
         # Prepare result data with video URLs
         result_data = {
@@ -345,6 +562,7 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
                 result_data['videos']['full_video'] = results['video']
         
         # Update job as completed
+        timer.save()
         update_job_status_sync(job_id, "completed", "Video creation completed!", 100, results.get('video', str(output_dir)), result_data)
         
         return {
@@ -362,6 +580,7 @@ def run_video_creation_task_sync(job_id: str, job_data: Dict[str, Any]):
         update_job_status_sync(job_id, "failed", f"Error: {str(e)}", 0)
         raise
 
+@cancellable_job
 def run_broll_task_sync(job_id: str, job_data: Dict[str, Any]):
     """Synchronous B-roll organization task"""
     try:
@@ -373,6 +592,8 @@ def run_broll_task_sync(job_id: str, job_data: Dict[str, Any]):
             progress=5
         )
         
+        timer = StageTimer(job_id, "broll", record_stage_timing_sync)
+        
         # Extract parameters
         params = job_data['params']
         intro_clip_ids = params.get('intro_clip_ids', [])
@@ -385,68 +606,73 @@ def run_broll_task_sync(job_id: str, job_data: Dict[str, Any]):
         update_job_status_sync(job_id, "processing", "Loading video files...", 10)
         
         all_clips = []
+        clip_records = []
         
-        # Get intro clips
-        for clip_id in intro_clip_ids:
-            clip_file = get_file_by_id_sync(clip_id)
-            if clip_file:
-                all_clips.append(clip_file['file_path'])
+        video_proc = VideoProcessor()
         
-        # Get B-roll clips
-        for clip_id in broll_clip_ids:
+        # Get intro and B-roll clips (mezzanine copies, so concatenation stays a stream copy)
+        for clip_id in intro_clip_ids + broll_clip_ids:
+            check_cancelled()
             clip_file = get_file_by_id_sync(clip_id)
             if clip_file:
-                all_clips.append(clip_file['file_path'])
+                all_clips.append(ensure_normalized_clip(clip_file, video_proc))
+                clip_records.append(clip_file)
         
         if not all_clips:
             raise Exception("No valid video clips found")
         
         # Get voiceover if provided
         voiceover_path = None
+        voiceover_file = None
         if voiceover_id:
             voiceover_file = get_file_by_id_sync(voiceover_id)
             if voiceover_file:
                 voiceover_path = voiceover_file['file_path']
         
+        # Target duration comes from the stored probe record, not a new FFprobe run
+        target_duration = None
+        if sync_to_voiceover and voiceover_file:
+            target_duration = get_media_duration(voiceover_file) or None
+        timer.features.update(broll_features(clip_records, voiceover_file))
+        timer.lap("normalize")
+        
         # Create output directory
         output_dir = Path(settings.OUTPUT_DIR) / job_id
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Initialize video processor
         update_job_status_sync(job_id, "processing", "Processing video clips...", 20)
-        video_proc = VideoProcessor()
-        
-        # Concatenate clips
-        concatenated_path = output_dir / "concatenated.mp4"
-        update_job_status_sync(job_id, "processing", "Concatenating video clips...", 40)
-        video_proc.concatenate_clips(all_clips, str(concatenated_path))
         
-        # Add voiceover if provided
+        # Concatenate, trim and mux the voiceover in a single FFmpeg pass
         final_video_path = output_dir / "final_video.mp4"
-        if voiceover_path and overlay_audio:
-            update_job_status_sync(job_id, "processing", "Adding voiceover audio...", 60)
-            video_proc.add_audio_to_video(str(concatenated_path), voiceover_path, str(final_video_path))
-        else:
-            # Just copy the concatenated video as final
-            import shutil
-            shutil.copy2(str(concatenated_path), str(final_video_path))
+        mux_voiceover = bool(voiceover_path and overlay_audio)
+        update_job_status_sync(
+            job_id, "processing",
+            "Rendering video with voiceover..." if mux_voiceover else "Concatenating video clips...",
+            40
+        )
+        video_proc.render_broll(
+            all_clips,
+            str(final_video_path),
+            audio_path=voiceover_path if mux_voiceover else None,
+            target_duration=target_duration,
+            copy_audio=is_aac_audio(voiceover_file),
+            **smart_cut_options(clip_records, all_clips)
+        )
+        timer.lap("render")
         
-        # Create results directory and copy final video
+        # Publish to the results directory (hardlink/reflink, no copy of the video data)
         results_dir = Path("results")
         results_dir.mkdir(exist_ok=True)
         
-        # Create a symlink or copy to results directory
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         result_filename = f"broll_organized_{timestamp}.mp4"
         result_path = results_dir / result_filename
+        publish_file(str(final_video_path), str(result_path))
         
-        import shutil
-        shutil.copy2(str(final_video_path), str(result_path))
-        
-        # Also create a "latest" version
-        latest_path = results_dir / "latest_broll_organized.mp4"
-        shutil.copy2(str(final_video_path), str(latest_path))
+        # "latest" is a database pointer rather than another copy of the file
+        set_latest_result_sync("broll_organized", str(result_path), job_id)
         
+        timer.save()
         update_job_status_sync(
             job_id, 
             "completed", 
@@ -472,375 +698,25 @@ def run_broll_task_sync(job_id: str, job_data: Dict[str, Any]):
 @celery_app.task(bind=True, base=CallbackTask, name='tasks.generate_ai_images')
 def generate_ai_images_task(self, job_id: str, job_data: Dict[str, Any]):
     """Background task for AI image generation"""
-    self.job_id = job_id
-    
-    try:
-        # Update job status to processing
-        try:
-            update_job_status_sync(
-                job_id=job_id,
-                status="processing",
-                message="Initializing AI image generation...",
-                progress=5
-            )
-        except Exception as e:
-            print(f"Failed to update initial job status: {e}")
-        
-        self.update_progress(5, "Initializing AI image generation...")
-        
-        # Extract parameters
-        params = job_data['params']
-        script_path = params['script_path']
-        voice_path = params['voice_path']
-        image_count = params['image_count']
-        style = params['style']
-        character_desc = params['character_description']
-        export_options = params['export_options']
-        
-        # Create output directory
-        output_dir = Path(settings.OUTPUT_DIR) / job_id
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize processors
-        self.update_progress(10, "Loading API credentials...")
-        api_manager = APIKeyManager()
-        api_key = api_manager.get_api_key()
-        
-        if not api_key:
-            raise Exception("OpenAI API key not configured")
-        
-        openai_gen = OpenAIImageGenerator(api_key)
-        audio_proc = AudioProcessor()
-        video_proc = VideoProcessor()
-        
-        # Read script using DocumentProcessor
-        self.update_progress(15, "Reading script file...")
-        doc_processor = DocumentProcessor()
-        try:
-            script_text = doc_processor.extract_text(script_path)
-            if not script_text or script_text.strip() == "":
-                script_text = params.get('script_text', 'Generate images based on the uploaded content.')
-        except Exception as e:
-            logger.error(f"Failed to extract text from script: {e}")
-            script_text = params.get('script_text', 'Generate images based on the uploaded content.')
-        
-        # Get audio duration and timestamps
-        self.update_progress(20, "Analyzing voiceover duration...")
-        duration = audio_proc.get_duration(voice_path)
-        timestamps = audio_proc.generate_timestamps(duration, image_count)
-        
-        # Split script into segments
-        script_segments = split_script(script_text, image_count)
-        
-        # Generate images
-        generated_images = []
-        
-        for i, (segment, timestamp) in enumerate(zip(script_segments, timestamps)):
-            if self.is_aborted():
-                raise Exception("Task cancelled by user")
-            
-            # More granular progress calculation
-            progress = 20 + int(((i + 0.5) / image_count) * 60)  # 20-80% for image generation
-            self.update_progress(progress, f"Generating image {i+1} of {image_count}...")
-            
-            # Create prompt
-            prompt = openai_gen.create_scene_prompt(
-                segment, 
-                character_desc, 
-                style,
-                scene_number=i+1
-            )
-            
-            # Generate image
-            start_time = time.time()
-            try:
-                image_path = openai_gen.generate_and_save_image(
-                    prompt, 
-                    str(output_dir),
-                    f"scene_{i+1:03d}",
-                    style
-                )
-                generation_time = time.time() - start_time
-                
-                # Store in database
-                # Removed: with Session(engine) as db:
-                # Removed: db_image = GeneratedImage(
-                # Removed: job_id=job_id,
-                # Removed: image_path=image_path,
-                # Removed: prompt=prompt,
-                # Removed: style=style,
-                # Removed: timestamp=timestamp,
-                # Removed: scene_number=i+1,
-                # Removed: generation_time=generation_time
-                # Removed: )
-                # Removed: db.add(db_image)
-                # Removed: db.commit()
-                
-                generated_images.append({
-                    'path': image_path,
-                    'timestamp': timestamp,
-                    'duration': timestamps[i+1] - timestamp if i < len(timestamps)-1 else duration - timestamp
-                })
-                
-            except Exception as e:
-                self.update_progress(progress, f"Failed to generate image {i+1}: {str(e)}")
-                continue
-        
-        # Save metadata
-        metadata_path = output_dir / 'generation_metadata.json'
-        with open(metadata_path, 'w') as f:
-            json.dump({
-                'images': generated_images,
-                'script_path': script_path,
-                'voice_path': voice_path,
-                'total_duration': duration,
-                'character_description': character_desc,
-                'style': style,
-                'job_id': job_id
-            }, f, indent=2)
-        
-        # Store results - only images for now
-        results = {'images': str(output_dir)}
-        
-        # Prepare result data with image paths relative to output directory
-        image_filenames = []
-        for img in generated_images:
-            # Get just the filename from the full path
-            filename = Path(img['path']).name
-            image_filenames.append(f"{job_id}/{filename}")
-        
-        result_data = {
-            "images": image_filenames,
-            "script_text": script_text,
-            "output_dir": str(output_dir),
-            "image_count": len(generated_images),
-            "style": style,
-            "character_description": character_desc,
-            "metadata_path": str(metadata_path)
-        }
-        
-        if 'clips' in results:
-            result_data['clips'] = results['clips']
-        if 'video' in results:
-            result_data['video'] = results['video']
-        
-        # Update progress to 95% before final updates
-        self.update_progress(95, "Finalizing results...")
-        
-        # Update job status to completed
-        try:
-            update_job_status_sync(
-                job_id=job_id,
-                status="completed",
-                message="AI image generation completed successfully",
-                progress=100,
-                result_path=str(output_dir),
-                result=result_data
-            )
-        except Exception as e:
-            print(f"Failed to update job completion status: {e}")
-        
-        # Final progress update to ensure it reaches 100%
-        self.update_progress(100, "AI image generation completed!")
-        
-        # Small delay to ensure the update is sent
-        time.sleep(0.5)
-        
-        return {
-            "status": "success",
-            "job_id": job_id,
-            "results": results,
-            "result_data": result_data
-        }
-        
-    except Exception as e:
-        # Handle errors
-        import traceback
-        error_traceback = traceback.format_exc()
-        
-        # Removed: with Session(engine) as db:
-        # Removed: job = db.query(JobStatus).filter(JobStatus.job_id == job_id).first()
-        # Removed: job.status = "failed"
-        # Removed: job.completed_at = datetime.utcnow()
-        # Removed: job.error_message = str(e)
-        # Removed: job.error_traceback = error_traceback
-        # Removed: db.commit()
-        
-        self.update_progress(0, f"Error: {str(e)}")
-        raise
+    # CallbackTask already opened the cancellation scope for this job
+    return run_ai_images_task_sync.__wrapped__(job_id, job_data)
 
 @celery_app.task(bind=True, base=CallbackTask, name='tasks.organize_broll')
 def organize_broll_task(self, job_id: str, job_data: Dict[str, Any]):
     """Background task for B-roll organization"""
-    self.job_id = job_id
-    
-    try:
-        # Update job status to processing
-        try:
-            update_job_status_sync(
-                job_id=job_id,
-                status="processing",
-                message="Starting B-roll reorganization...",
-                progress=5
-            )
-        except Exception as e:
-            print(f"Failed to update initial job status: {e}")
-        
-        self.update_progress(5, "Starting B-roll reorganization...")
-        
-        # Extract parameters
-        params = job_data['params']
-        
-        # Get file paths from database
-        intro_paths = []
-        for file_id in params['intro_clip_ids']:
-            try:
-                file_record = get_file_by_id_sync(file_id)
-                if file_record and file_record.get('file_path'):
-                    intro_paths.append(file_record['file_path'])
-                else:
-                    raise Exception(f"Intro file {file_id} not found")
-            except Exception as e:
-                raise Exception(f"Failed to get intro file {file_id}: {e}")
-        
-        broll_paths = []
-        for file_id in params['broll_clip_ids']:
-            try:
-                file_record = get_file_by_id_sync(file_id)
-                if file_record and file_record.get('file_path'):
-                    broll_paths.append(file_record['file_path'])
-                else:
-                    raise Exception(f"B-roll file {file_id} not found")
-            except Exception as e:
-                raise Exception(f"Failed to get B-roll file {file_id}: {e}")
-        
-        voiceover_path = None
-        if params['voiceover_id']:
-            try:
-                voice_file = get_file_by_id_sync(params['voiceover_id'])
-                if voice_file and voice_file.get('file_path'):
-                    voiceover_path = voice_file['file_path']
-                else:
-                    raise Exception(f"Voiceover file {params['voiceover_id']} not found")
-            except Exception as e:
-                raise Exception(f"Failed to get voiceover file {params['voiceover_id']}: {e}")
-        
-        # Create output directory in results folder
-        results_dir = Path("results")
-        results_dir.mkdir(parents=True, exist_ok=True)
-        output_dir = results_dir / f"broll_job_{job_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize processors
-        video_proc = VideoProcessor()
-        audio_proc = AudioProcessor()
-        
-        # Get target duration if syncing with voiceover
-        target_duration = None
-        if params['sync_to_voiceover'] and voiceover_path:
-            self.update_progress(10, "Analyzing voiceover duration...")
-            try:
-                target_duration = audio_proc.get_duration(voiceover_path)
-                print(f"Voiceover duration: {target_duration} seconds")
-            except Exception as e:
-                print(f"Warning: Could not get voiceover duration: {e}")
-                target_duration = None
-        
-        # Shuffle B-roll
-        self.update_progress(20, "Shuffling B-roll clips...")
-        import random
-        shuffled_broll = broll_paths.copy()
-        random.shuffle(shuffled_broll)
-        
-        # Combine clips
-        all_clips = intro_paths + shuffled_broll
-        
-        # Create reorganized video
-        self.update_progress(30, "Creating reorganized video...")
-        output_path = output_dir / 'broll_reorganized.mp4'
-        
-        # Progress callback for video processing
-        def video_progress(p):
-            overall_progress = 30 + int(p * 50)  # 30-80%
-            self.update_progress(overall_progress, "Processing video clips...")
-        
-        video_proc.concatenate_clips(
-            all_clips, 
-            str(output_path),
-            target_duration=target_duration,
-            progress_callback=video_progress
-        )
-        
-        results = {'video': str(output_path)}
-        
-        # Overlay audio if requested
-        if params['overlay_audio'] and voiceover_path:
-            self.update_progress(85, "Overlaying voiceover...")
-            final_path = output_dir / 'broll_with_voiceover.mp4'
-            video_proc.add_audio_to_video(
-                str(output_path), 
-                voiceover_path, 
-                str(final_path)
-            )
-            results['video_with_audio'] = str(final_path)
-        
-        # Update job as completed
-        self.update_progress(100, "B-roll reorganization completed!")
-        
-        # Update job status to completed
-        try:
-            final_video_path = results.get('video_with_audio', results['video'])
-            update_job_status_sync(
-                job_id=job_id,
-                status="completed",
-                message="B-roll reorganization completed successfully",
-                progress=100,
-                result_path=str(final_video_path)
-            )
-            
-            # Also create a symlink or copy to results folder for easy access
-            final_filename = Path(final_video_path).name
-            results_link = results_dir / f"latest_broll_{final_filename}"
-            try:
-                if results_link.exists():
-                    results_link.unlink()
-                results_link.symlink_to(Path(final_video_path).absolute())
-            except Exception as link_error:
-                print(f"Could not create symlink: {link_error}")
-                # Fallback: copy the file
-                try:
-                    import shutil
-                    shutil.copy2(final_video_path, results_link)
-                except Exception as copy_error:
-                    print(f"Could not copy file: {copy_error}")
-                    
-        except Exception as e:
-            print(f"Failed to update job completion status: {e}")
-        
-        return {
-            "status": "success",
-            "job_id": job_id,
-            "results": results
-        }
-        
-    except Exception as e:
-        # Handle errors
-        import traceback
-        error_traceback = traceback.format_exc()
-        
-        # Update job status to failed
-        try:
-            update_job_status_sync(
-                job_id=job_id,
-                status="failed",
-                message=f"Job failed: {str(e)}",
-                progress=0
-            )
-        except Exception as db_error:
-            print(f"Failed to update job failure status: {db_error}")
-        
-        self.update_progress(0, f"Error: {str(e)}")
-        raise
+    # CallbackTask already opened the cancellation scope for this job
+    return run_broll_task_sync.__wrapped__(job_id, job_data)
+
+@celery_app.task(bind=True, base=CallbackTask, name='tasks.create_video')
+def create_video_task(self, job_id: str, job_data: Dict[str, Any]):
+    """Background task for creating a video from previously generated images"""
+    # CallbackTask already opened the cancellation scope for this job
+    return run_video_creation_task_sync.__wrapped__(job_id, job_data)
+
+@celery_app.task(name='tasks.ingest_video')
+def ingest_video_task(file_id: str):
+    """Background task normalizing an uploaded clip to the mezzanine profile"""
+    return run_ingest_task_sync(file_id)
 
 # Utility functions
 def split_script(script: str, num_segments: int) -> List[str]: